@@ -0,0 +1,168 @@
+import re
+from typing import Any, Callable
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import CallbackType, HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import TelegramObject
+
+
+SEPARATOR = ":"
+
+_CONVERTERS: dict[str, Callable[[str], Any]] = {"str": str, "int": int}
+# an argument in braces (which may itself contain the separator) or a literal
+_SEGMENT = re.compile(r"\{[^}]*\}|[^" + SEPARATOR + "]+")
+
+
+class _Route:
+	"""Typed arguments that follow a route's literal prefix, e.g. ``{product_id:int}:{qty:int}``.
+
+	``{name:tail}`` as the last argument takes the rest of the data, separators included.
+	"""
+
+	__slots__ = ("pattern", "handler", "params", "tail")
+
+	def __init__(self, pattern: str, handler: HandlerObject, params: list[tuple[str, Callable[[str], Any]]], tail: str | None) -> None:
+		self.pattern = pattern
+		self.handler = handler
+		self.params = params
+		self.tail = tail
+
+	def parse(self, parts: list[str], start: int) -> dict[str, Any] | None:
+		rest = len(parts) - start
+		if rest < len(self.params) or (self.tail is None and rest != len(self.params)):
+			return None
+		args: dict[str, Any] = {}
+		for i, (name, convert) in enumerate(self.params, start):
+			try:
+				args[name] = convert(parts[i])
+			except ValueError:
+				return None
+		if self.tail is not None:
+			args[self.tail] = SEPARATOR.join(parts[start + len(self.params):])
+		return args
+
+
+class _Node:
+	__slots__ = ("children", "routes")
+
+	def __init__(self) -> None:
+		self.children: dict[str, _Node] = {}
+		self.routes: list[_Route] = []
+
+
+def _compile(pattern: str) -> tuple[list[str], list[tuple[str, Callable[[str], Any]]], str | None]:
+	prefix: list[str] = []
+	params: list[tuple[str, Callable[[str], Any]]] = []
+	tail = None
+	segments = _SEGMENT.findall(pattern)
+	for i, segment in enumerate(segments):
+		if not (segment.startswith("{") and segment.endswith("}")):
+			if params:
+				raise ValueError(f"literal segment {segment!r} after an argument in {pattern!r}")
+			prefix.append(segment)
+			continue
+		name, _, kind = segment[1:-1].partition(":")
+		kind = kind or "str"
+		if kind == "tail":
+			if i != len(segments) - 1:
+				raise ValueError(f"{{{name}:tail}} must be the last segment of {pattern!r}")
+			tail = name
+		elif kind in _CONVERTERS:
+			params.append((name, _CONVERTERS[kind]))
+		else:
+			raise ValueError(f"unknown argument type {kind!r} in {pattern!r}")
+	return prefix, params, tail
+
+
+class CallbackQueryObserver(TelegramEventObserver):
+	"""Callback query observer that finds handlers through a trie of ``:``-separated data segments.
+
+	``route()`` registers a handler under the literal prefix of its pattern. A
+	callback walks the trie once along its data and only the handlers found on
+	that path are checked, the most specific prefix first, with their typed
+	arguments parsed and passed to the handler as keyword arguments. Other
+	filters (FSM state etc.) still apply. Handlers registered the usual way are
+	checked after the routed ones, in registration order.
+	"""
+
+	def __init__(self, router: Router, event_name: str) -> None:
+		super().__init__(router=router, event_name=event_name)
+		self._root = _Node()
+		self._routes: list[_Route] = []
+		self._plain: list[HandlerObject] = []
+
+	def register(self, callback: CallbackType, *filters: CallbackType, flags: dict[str, Any] | None = None, **kwargs: Any) -> CallbackType:
+		super().register(callback, *filters, flags=flags, **kwargs)
+		self._plain.append(self.handlers[-1])
+		return callback
+
+	def route(self, pattern: str, *filters: CallbackType, flags: dict[str, Any] | None = None) -> Callable[[CallbackType], CallbackType]:
+		prefix, params, tail = _compile(pattern)
+
+		def wrapper(callback: CallbackType) -> CallbackType:
+			TelegramEventObserver.register(self, callback, *filters, flags=flags)
+			node = self._root
+			for segment in prefix:
+				node = node.children.setdefault(segment, _Node())
+			route = _Route(pattern, self.handlers[-1], params, tail)
+			node.routes.append(route)
+			self._routes.append(route)
+			return callback
+
+		return wrapper
+
+	def routes(self) -> list[tuple[str, HandlerObject]]:
+		"""Routed handlers with their patterns, in registration order."""
+		return [(route.pattern, route.handler) for route in self._routes]
+
+	def match(self, data: str) -> list[tuple[HandlerObject, dict[str, Any]]]:
+		parts = data.split(SEPARATOR)
+		path: list[tuple[_Node, int]] = []
+		node = self._root
+		for depth, segment in enumerate(parts):
+			node = node.children.get(segment)  # type: ignore[assignment]
+			if node is None:
+				break
+			path.append((node, depth + 1))
+		found = []
+		for node, start in reversed(path):
+			for route in node.routes:
+				args = route.parse(parts, start)
+				if args is not None:
+					found.append((route.handler, args))
+		return found
+
+	async def trigger(self, event: TelegramObject, **kwargs: Any) -> Any:
+		# expanded ~token data from CallbackTokenMiddleware, if any
+		data = kwargs.get("callback_payload") or getattr(event, "data", None)
+		candidates = self.match(data) if data is not None else []
+		candidates.extend((handler, {}) for handler in self._plain)
+		for handler, args in candidates:
+			kwargs["handler"] = handler
+			result, extra = await handler.check(event, **kwargs, **args)
+			if result:
+				call_data = {**kwargs, **args, **extra}
+				try:
+					wrapped_inner = self.outer_middleware.wrap_middlewares(self._resolve_middlewares(), handler.call)
+					return await wrapped_inner(event, call_data)
+				except SkipHandler:
+					continue
+		return UNHANDLED
+
+
+class CallbackRouter(Router):
+	"""Router whose callback queries are dispatched by ``CallbackQueryObserver``.
+
+	    @router.callback("cart:add:{product_id:int}:{qty:int}")
+	    async def cart_add(callback: CallbackQuery, product_id: int, qty: int) -> None: ...
+	"""
+
+	def __init__(self, *, name: str | None = None) -> None:
+		super().__init__(name=name)
+		self.callback_query = CallbackQueryObserver(router=self, event_name="callback_query")
+		self.observers["callback_query"] = self.callback_query
+
+	def callback(self, pattern: str, *filters: CallbackType, flags: dict[str, Any] | None = None) -> Callable[[CallbackType], CallbackType]:
+		return self.callback_query.route(pattern, *filters, flags=flags)
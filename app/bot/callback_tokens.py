@@ -0,0 +1,71 @@
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from app.core.config import settings
+
+
+TOKEN_PREFIX = "~"
+# Telegram rejects callback_data longer than this many bytes
+MAX_CALLBACK_DATA = 64
+
+
+class TokenEntry(NamedTuple):
+	data: str
+	context: dict[str, Any]
+	expires_at: float
+
+
+class CallbackTokenStore:
+	"""Maps short ``~token`` callback_data to full callback data plus typed context, with a TTL.
+
+	``pack()`` returns the data as is when tokens are off, and a token when they
+	are on or the data does not fit Telegram's 64 bytes. The context (the
+	catalog items a card was rendered for, a review total, ...) is handed to the
+	handler as keyword arguments next to the ones parsed from the data; handlers
+	must still work without it. Tokens
+	live in this process only: with several workers behind one webhook a press
+	may land on a worker that never issued the token and gets "button expired".
+	"""
+
+	def __init__(self, enabled: bool, ttl: float, max_size: int) -> None:
+		self.enabled = enabled
+		self._ttl = ttl
+		self._max_size = max_size
+		# insertion order is expiry order, since every entry gets the same ttl
+		self._entries: OrderedDict[str, TokenEntry] = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def pack(self, data: str, **context: Any) -> str:
+		if not self.enabled and len(data.encode()) <= MAX_CALLBACK_DATA:
+			return data
+		now = time.monotonic()
+		self._prune(now)
+		token = secrets.token_urlsafe(8)
+		self._entries[token] = TokenEntry(data, context, now + self._ttl)
+		return TOKEN_PREFIX + token
+
+	def resolve(self, callback_data: str) -> TokenEntry | None:
+		entry = self._entries.get(callback_data[len(TOKEN_PREFIX):])
+		if entry is None or entry.expires_at < time.monotonic():
+			return None
+		return entry
+
+	def _prune(self, now: float) -> None:
+		entries = self._entries
+		while entries and (len(entries) >= self._max_size or next(iter(entries.values())).expires_at < now):
+			entries.popitem(last=False)
+
+
+def is_token(callback_data: str | None) -> bool:
+	return callback_data is not None and callback_data.startswith(TOKEN_PREFIX)
+
+
+callback_tokens = CallbackTokenStore(
+	enabled=settings.callback_tokens,
+	ttl=settings.callback_token_ttl,
+	max_size=settings.callback_token_max,
+)
@@ -0,0 +1,57 @@
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.bot.outbound import OutboundScheduler, is_limited
+from app.utils.metrics import registry
+
+
+API_DURATION = registry.histogram("telegram_api_request_duration_seconds", "Bot API call latency", ["method"])
+API_ERRORS = registry.counter("telegram_api_errors_total", "Bot API calls that failed", ["method", "error"])
+API_RETRY_AFTER = registry.counter("telegram_api_retry_after_total", "Bot API calls rejected with 429 Too Many Requests", ["method"])
+
+
+class InstrumentedSession(AiohttpSession):
+	"""``AiohttpSession`` that records latency and failures per Bot API method."""
+
+	async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None) -> TelegramType:
+		name = method.__api_method__
+		started = time.perf_counter()
+		try:
+			return await super().make_request(bot, method, timeout)
+		except TelegramRetryAfter:
+			API_RETRY_AFTER.inc(method=name)
+			API_ERRORS.inc(method=name, error="TelegramRetryAfter")
+			raise
+		except Exception as e:
+			API_ERRORS.inc(method=name, error=type(e).__name__)
+			raise
+		finally:
+			API_DURATION.observe(time.perf_counter() - started, method=name)
+
+
+class ScheduledSession(InstrumentedSession):
+	"""Queues sends through an ``OutboundScheduler`` and retries them after a 429."""
+
+	def __init__(self, scheduler: OutboundScheduler, **kwargs) -> None:
+		super().__init__(**kwargs)
+		self.scheduler = scheduler
+
+	async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None) -> TelegramType:
+		if not is_limited(method.__api_method__):
+			return await super().make_request(bot, method, timeout)
+		chat_id = getattr(method, "chat_id", None)
+		retries = 0
+		while True:
+			await self.scheduler.acquire(chat_id)
+			try:
+				return await super().make_request(bot, method, timeout)
+			except TelegramRetryAfter as e:
+				retries += 1
+				if retries > self.scheduler.max_retries or e.retry_after > self.scheduler.max_retry_after:
+					raise
+				self.scheduler.retry_after(chat_id, e.retry_after)
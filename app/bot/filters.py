@@ -0,0 +1,13 @@
+from aiogram.filters import Filter
+from aiogram.types import TelegramObject
+
+
+class IsAdmin(Filter):
+	"""Passes admins and managers; relies on ``is_admin`` from ``RoleMiddleware``.
+
+	Set on the admin routers' observers, so no admin handler checks access itself:
+	``router.message.filter(IsAdmin())``.
+	"""
+
+	async def __call__(self, event: TelegramObject, is_admin: bool = False) -> bool:
+		return is_admin
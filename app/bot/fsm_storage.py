@@ -0,0 +1,229 @@
+import asyncio
+import json
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from datetime import datetime, timedelta
+from typing import Any, Mapping, NamedTuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseStorage, StateType, StorageKey
+from loguru import logger
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.bot.services.invalidation import FULL_RESYNC, ChangeEvent, InvalidationBus
+from app.models.fsm import FsmState
+
+
+_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def encode_key(key: StorageKey) -> str:
+	parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+	if key.thread_id:
+		parts.append(f"t{key.thread_id}")
+	if key.business_connection_id:
+		parts.append(f"b{key.business_connection_id}")
+	if key.destiny != DEFAULT_DESTINY:
+		parts.append(f"d{key.destiny}")
+	return ":".join(parts)
+
+
+def encode_data(data: Mapping[str, Any]) -> str | None:
+	return json.dumps(data, ensure_ascii=False, separators=(",", ":")) if data else None
+
+
+class _Record(NamedTuple):
+	state: str | None
+	# compact JSON, None when empty
+	data: str | None
+	# None when there is no row
+	expires_at: datetime | None
+
+
+_EMPTY = _Record(None, None, None)
+
+# key -> [record in the database, record to write] for the writes of the current update
+_Batch = dict[StorageKey, list[_Record]]
+
+
+class SqlStorage(BaseStorage):
+	"""FSM storage in the ``fsm_states`` table (Postgres, or SQLite for a single node).
+
+	Reads go through a per-process LRU of ``cache_size`` keys, absent keys
+	included, so the state lookup aiogram makes on every update costs one SELECT
+	per user until the entry is evicted; ``cache_size=0`` reads every time. A write
+	that changes nothing is skipped, and an empty state with empty data deletes
+	the row. Between ``batch()`` and
+	``flush()`` (``FsmBatchMiddleware`` wraps every update in them) writes are held
+	and then stored as one statement per key, so ``update_data`` + ``set_state``
+	or ``clear()`` cost a single round trip; outside a batch they are stored right
+	away. Every stored write publishes ``ChangeEvent("fsm", user_id)`` so other
+	workers drop their cached copy. Rows not written for ``ttl`` seconds read as
+	empty and are deleted by ``start()``'s sweeper, ``expire_batch`` rows per
+	statement.
+	"""
+
+	def __init__(
+		self,
+		engine: AsyncEngine,
+		bus: InvalidationBus,
+		ttl: float,
+		cache_size: int,
+		expire_interval: float,
+		expire_batch: int,
+	) -> None:
+		dialect = engine.dialect.name
+		if dialect not in _INSERTS:
+			raise ValueError(f"SQL FSM storage supports postgresql and sqlite, not {dialect}")
+		self._engine = engine
+		self._insert = _INSERTS[dialect]
+		self._bus = bus
+		self._ttl = timedelta(seconds=ttl)
+		self._cache_size = cache_size
+		self._expire_interval = expire_interval
+		self._expire_batch = expire_batch
+		self._cache: OrderedDict[StorageKey, _Record] = OrderedDict()
+		self._by_user: dict[int, set[StorageKey]] = {}
+		self._version = 0
+		self._task: asyncio.Task | None = None
+		self._batch: ContextVar[_Batch | None] = ContextVar("fsm_batch", default=None)
+
+	async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+		state = state.state if isinstance(state, State) else state
+		current = await self._get(key)
+		await self._put(key, current, state, current.data)
+
+	async def get_state(self, key: StorageKey) -> str | None:
+		return (await self._get(key)).state
+
+	async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+		current = await self._get(key)
+		await self._put(key, current, current.state, encode_data(data))
+
+	async def get_data(self, key: StorageKey) -> dict[str, Any]:
+		# decoded per call: handlers mutate what they get (e.g. the flavors list)
+		data = (await self._get(key)).data
+		return json.loads(data) if data else {}
+
+	async def _get(self, key: StorageKey) -> _Record:
+		batch = self._batch.get()
+		if batch is not None and key in batch:
+			return batch[key][1]
+		record = self._cache.get(key)
+		if record is None:
+			version = self._version
+			async with self._engine.connect() as conn:
+				res = await conn.execute(
+					select(FsmState.state, FsmState.data, FsmState.expires_at).where(FsmState.key == encode_key(key))
+				)
+				row = res.first()
+			record = _Record(*row) if row else _EMPTY
+			# a write or invalidation that landed meanwhile wins over what we read
+			if key not in self._cache and version == self._version:
+				self._remember(key, record)
+		else:
+			self._cache.move_to_end(key)
+		if record.expires_at is not None and record.expires_at <= datetime.utcnow():
+			return _EMPTY
+		return record
+
+	async def _put(self, key: StorageKey, current: _Record, state: str | None, data: str | None) -> None:
+		if state == current.state and data == current.data:
+			return
+		record = _EMPTY if state is None and data is None else _Record(state, data, datetime.utcnow() + self._ttl)
+		batch = self._batch.get()
+		if batch is None:
+			await self._write(key, record)
+		elif key in batch:
+			batch[key][1] = record
+		else:
+			batch[key] = [current, record]
+
+	def batch(self) -> Token:
+		return self._batch.set({})
+
+	async def flush(self, token: Token) -> None:
+		batch = self._batch.get()
+		self._batch.reset(token)
+		for key, (stored, record) in (batch or {}).items():
+			if record.state != stored.state or record.data != stored.data:
+				await self._write(key, record)
+
+	async def _write(self, key: StorageKey, record: _Record) -> None:
+		async with self._engine.begin() as conn:
+			if record is _EMPTY:
+				await conn.execute(delete(FsmState).where(FsmState.key == encode_key(key)))
+			else:
+				stmt = self._insert(FsmState).values(
+					key=encode_key(key), state=record.state, data=record.data, expires_at=record.expires_at
+				)
+				await conn.execute(
+					stmt.on_conflict_do_update(
+						index_elements=[FsmState.key],
+						set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "expires_at": stmt.excluded.expires_at},
+					)
+				)
+		# drops our own entry too, so remember the new record afterwards
+		await self._bus.publish(ChangeEvent("fsm", key.user_id))
+		self._remember(key, record)
+
+	def _remember(self, key: StorageKey, record: _Record) -> None:
+		self._cache[key] = record
+		self._cache.move_to_end(key)
+		self._by_user.setdefault(key.user_id, set()).add(key)
+		while len(self._cache) > self._cache_size:
+			old, _ = self._cache.popitem(last=False)
+			self._forget_user_key(old)
+
+	def _forget_user_key(self, key: StorageKey) -> None:
+		keys = self._by_user.get(key.user_id)
+		if keys is not None:
+			keys.discard(key)
+			if not keys:
+				del self._by_user[key.user_id]
+
+	def on_change(self, event: ChangeEvent) -> None:
+		if event == FULL_RESYNC or (event.entity == "fsm" and event.id is None):
+			self._version += 1
+			self._cache.clear()
+			self._by_user.clear()
+		elif event.entity == "fsm":
+			self._version += 1
+			for key in self._by_user.pop(event.id, ()):
+				self._cache.pop(key, None)
+
+	async def expire(self) -> int:
+		"""Delete rows past their TTL in batches; returns how many were deleted."""
+		deleted = 0
+		while True:
+			expired = select(FsmState.key).where(FsmState.expires_at <= datetime.utcnow()).limit(self._expire_batch)
+			async with self._engine.begin() as conn:
+				res = await conn.execute(delete(FsmState).where(FsmState.key.in_(expired)))
+			deleted += res.rowcount
+			if res.rowcount < self._expire_batch:
+				return deleted
+
+	def start(self) -> None:
+		if self._task is None or self._task.done():
+			self._task = asyncio.create_task(self._run(), name="fsm-expire")
+
+	async def _run(self) -> None:
+		while True:
+			try:
+				deleted = await self.expire()
+				if deleted:
+					logger.info("Expired {} abandoned FSM states", deleted)
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				logger.exception("FSM state expiry failed")
+			await asyncio.sleep(self._expire_interval)
+
+	async def close(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			await asyncio.gather(self._task, return_exceptions=True)
+			self._task = None
@@ -0,0 +1,56 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from app.bot.filters import IsAdmin
+from app.core.config import settings
+from app.db.pool import WAIT_BUCKETS, pool_snapshot
+from app.db.profiler import profiler
+from app.db.session import engine
+
+
+router = Router(name="admin_diagnostics")
+router.message.filter(IsAdmin())
+router.callback_query.filter(IsAdmin())
+
+
+def _ms(seconds: float | None) -> str:
+	if seconds is None:
+		return "—"
+	if seconds == float("inf"):
+		return f"> {WAIT_BUCKETS[-1] * 1000:.0f} мс"
+	return f"≤ {seconds * 1000:.0f} мс"
+
+
+@router.message(Command("pool"))
+async def pool_status(message: Message) -> None:
+	s = pool_snapshot(engine)
+	lines = [
+		"🗄 <b>Пул соединений БД</b>",
+		"",
+		f"Размер: {s.size} + overflow до {s.max_overflow}",
+		f"Выдано: {s.checked_out}",
+		f"Свободно: {s.checked_in}",
+		f"Overflow: {s.overflow}",
+		"",
+		f"Выдач: {s.checkouts}",
+		f"Ожидание p50: {_ms(s.wait_p50)}",
+		f"Ожидание p95: {_ms(s.wait_p95)}",
+		f"Ожидание p99: {_ms(s.wait_p99)}",
+		f"Таймауты: {s.timeouts}",
+		f"Ошибки подключения: {s.errors}",
+	]
+	await message.answer("\n".join(lines))
+
+
+@router.message(Command("sqlprofile"))
+async def sql_profile(message: Message, command: CommandObject) -> None:
+	if settings.sql_profile == "off":
+		await message.answer("Профилировщик SQL выключен (SQL_PROFILE=dev или sample)")
+		return
+	if (command.args or "").strip() == "reset":
+		profiler.reset()
+		await message.answer("Статистика SQL сброшена")
+		return
+	head = f"🐢 <b>SQL по обработчикам</b> (режим {settings.sql_profile}, лимит {profiler.budget} запросов)\n\n"
+	await message.answer(head + profiler.report())
@@ -1,19 +1,24 @@
-from aiogram import Router, F
+from aiogram import F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
 from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy import select, update, delete
-from app.core.config import settings
-from app.db.session import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.product import Category, Product
 from app.models.flavor import Flavor
 from app.models.order import OrderItem
-from app.bot.keyboards.inline import admin_categories_keyboard, admin_menu_keyboard, admin_flavors_keyboard
+from app.bot.callback_router import CallbackRouter
+from app.bot.filters import IsAdmin
+from app.bot.keyboards.inline import ADMIN_MENU_MARKUP, admin_categories_keyboard, admin_flavors_keyboard
+from app.bot.services.broadcast import broadcaster
+from app.bot.services.invalidation import ChangeEvent, invalidation_bus
 
 
-router = Router(name="admin_products")
+router = CallbackRouter(name="admin_products")
+router.message.filter(IsAdmin())
+router.callback_query.filter(IsAdmin())
 
 
 async def _safe_edit_cb(callback: CallbackQuery, text: str, reply_markup=None) -> None:
@@ -31,18 +36,8 @@ async def _safe_answer(callback: CallbackQuery) -> None:
 		pass  # Ignore old query errors
 
 
-def _is_admin(user_id: int) -> bool:
-	if not settings.admin_ids:
-		return False
-	admin_id_set = {int(x.strip()) for x in settings.admin_ids.split(",") if x.strip()}
-	return user_id in admin_id_set
-
-
 @router.message(Command("addproduct"))
 async def add_product(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		await message.answer("Нет доступа")
-		return
 	await state.clear()
 	await state.set_state(ProductCreateStates.title)
 	await message.answer("Введите название товара")
@@ -50,40 +45,27 @@ async def add_product(message: Message, state: FSMContext) -> None:
 
 @router.message(Command("deleteproduct"))
 async def delete_product(message: Message) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		await message.answer("Нет доступа")
-		return
-	await message.answer("Удаление товара: пока заглушка.", reply_markup=admin_menu_keyboard().as_markup())
+	await message.answer("Удаление товара: пока заглушка.", reply_markup=ADMIN_MENU_MARKUP)
 
 
 @router.message(Command("sendall"))
 async def send_all(message: Message) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		await message.answer("Нет доступа")
-		return
-	await message.answer("Рассылка: пока заглушка.", reply_markup=admin_menu_keyboard().as_markup())
+	await message.answer("Рассылка: пока заглушка.", reply_markup=ADMIN_MENU_MARKUP)
 
 
-@router.callback_query(F.data == "admin:open")
+@router.callback("admin:open")
 async def admin_open(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
 	# answer early to avoid stale query problems
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	from app.bot.keyboards.inline import admin_menu_keyboard as _kb  # local import
-	await _safe_edit_cb(callback, "Админ меню", reply_markup=_kb().as_markup())
+	await _safe_edit_cb(callback, "Админ меню", reply_markup=ADMIN_MENU_MARKUP)
 	# already answered above
 
 
-@router.callback_query(F.data == "admin:product:add")
+@router.callback("admin:product:add")
 async def admin_product_add_from_menu(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
 	try:
 		await _safe_answer(callback)
 	except Exception:
@@ -95,32 +77,25 @@ async def admin_product_add_from_menu(callback: CallbackQuery, state: FSMContext
 
 
 @router.message(Command("addcat"))
-async def add_category(message: Message) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		await message.answer("Нет доступа")
-		return
+async def add_category(message: Message, session: AsyncSession) -> None:
 	parts = [p.strip() for p in (message.text or "").split(maxsplit=1)]
 	if len(parts) < 2:
-		await message.answer("Использование: /addcat НазваниеКатегории", reply_markup=admin_menu_keyboard().as_markup())
+		await message.answer("Использование: /addcat НазваниеКатегории", reply_markup=ADMIN_MENU_MARKUP)
 		return
 	name = parts[1]
-	async with SessionLocal() as session:
-		async with session.begin():
-			existing = await session.execute(select(Category).where(Category.name == name))
-			if existing.scalars().first():
-				await message.answer("Такая категория уже существует", reply_markup=admin_menu_keyboard().as_markup())
-				return
-			category = Category(name=name)
-			session.add(category)
-		await session.commit()
-	await message.answer("Категория добавлена", reply_markup=admin_menu_keyboard().as_markup())
-
-
-@router.callback_query(F.data == "admin:category:add")
-async def admin_category_add_open(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
+	existing = await session.execute(select(Category).where(Category.name == name))
+	if existing.scalars().first():
+		await message.answer("Такая категория уже существует", reply_markup=ADMIN_MENU_MARKUP)
 		return
+	category = Category(name=name)
+	session.add(category)
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("category", category.id))
+	await message.answer("Категория добавлена", reply_markup=ADMIN_MENU_MARKUP)
+
+
+@router.callback("admin:category:add")
+async def admin_category_add_open(callback: CallbackQuery, state: FSMContext) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
@@ -131,32 +106,24 @@ async def admin_category_add_open(callback: CallbackQuery, state: FSMContext) ->
 
 
 @router.message(Command("listcat"))
-async def list_categories(message: Message) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		await message.answer("Нет доступа")
-		return
-	async with SessionLocal() as session:
-		result = await session.execute(select(Category).order_by(Category.name))
-		cats = list(result.scalars().all())
+async def list_categories(message: Message, session: AsyncSession) -> None:
+	result = await session.execute(select(Category).order_by(Category.name))
+	cats = list(result.scalars().all())
 	if not cats:
-		await message.answer("Категорий нет", reply_markup=admin_menu_keyboard().as_markup())
+		await message.answer("Категорий нет", reply_markup=ADMIN_MENU_MARKUP)
 		return
 	text = "\n".join(f"{c.id}: {c.name}" for c in cats)
-	await message.answer(text, reply_markup=admin_menu_keyboard().as_markup())
+	await message.answer(text, reply_markup=ADMIN_MENU_MARKUP)
 
 
-@router.callback_query(F.data == "admin:category:list")
-async def admin_category_list(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:category:list")
+async def admin_category_list(callback: CallbackQuery, session: AsyncSession) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	async with SessionLocal() as session:
-		result = await session.execute(select(Category).order_by(Category.name))
-		cats = list(result.scalars().all())
+	result = await session.execute(select(Category).order_by(Category.name))
+	cats = list(result.scalars().all())
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	builder = InlineKeyboardBuilder()
 	if not cats:
@@ -197,37 +164,30 @@ class AdminFlavorStates(StatesGroup):
 
 
 @router.message(AdminCategoryStates.name)
-async def admin_category_create_name(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
+async def admin_category_create_name(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	name = (message.text or "").strip()
 	if not name:
 		await message.answer("Название не может быть пустым. Введите ещё раз")
 		return
-	async with SessionLocal() as session:
-		async with session.begin():
-			existing = await session.execute(select(Category).where(Category.name == name))
-			if existing.scalars().first():
-				await message.answer("Такая категория уже существует", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			category = Category(name=name)
-			session.add(category)
-		await session.commit()
+	existing = await session.execute(select(Category).where(Category.name == name))
+	if existing.scalars().first():
+		await message.answer("Такая категория уже существует", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	category = Category(name=name)
+	session.add(category)
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("category", category.id))
 	await state.clear()
-	await message.answer("Категория добавлена", reply_markup=admin_menu_keyboard().as_markup())
+	await message.answer("Категория добавлена", reply_markup=ADMIN_MENU_MARKUP)
 
 
-@router.callback_query(F.data.startswith("admin:category:open:"))
-async def admin_category_open(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:category:open:{cid:int}")
+async def admin_category_open(callback: CallbackQuery, cid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	cid = int((callback.data or "").rsplit(":", 1)[-1])
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	builder = InlineKeyboardBuilder()
 	builder.button(text="✏️ Переименовать", callback_data=f"admin:category:rename:{cid}")
@@ -237,76 +197,61 @@ async def admin_category_open(callback: CallbackQuery) -> None:
 	await _safe_edit_cb(callback, f"Категория ID {cid}", reply_markup=builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:category:rename:"))
-async def admin_category_rename_start(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:category:rename:{cid:int}")
+async def admin_category_rename_start(callback: CallbackQuery, state: FSMContext, cid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	cid = int((callback.data or "").rsplit(":", 1)[-1])
 	await state.set_state(AdminCategoryEditStates.rename)
 	await state.update_data(category_id=cid)
 	await _safe_edit_cb(callback, "Отправьте новое название категории")
 
 
 @router.message(AdminCategoryEditStates.rename)
-async def admin_category_rename_save(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
+async def admin_category_rename_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	new_name = (message.text or "").strip()
 	if not new_name:
 		await message.answer("Название не может быть пустым. Введите ещё раз")
 		return
 	data = await state.get_data()
 	cid = int(data.get("category_id"))
-	async with SessionLocal() as session:
-		async with session.begin():
-			# check duplicate
-			exists = await session.execute(select(Category).where(Category.name == new_name))
-			if exists.scalars().first():
-				await message.answer("Такая категория уже существует", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			res = await session.execute(select(Category).where(Category.id == cid))
-			cat = res.scalars().first()
-			if not cat:
-				await message.answer("Категория не найдена", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			cat.name = new_name
-		await session.commit()
+	# check duplicate
+	exists = await session.execute(select(Category).where(Category.name == new_name))
+	if exists.scalars().first():
+		await message.answer("Такая категория уже существует", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	res = await session.execute(select(Category).where(Category.id == cid))
+	cat = res.scalars().first()
+	if not cat:
+		await message.answer("Категория не найдена", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	cat.name = new_name
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("category", cid))
 	await state.clear()
-	await message.answer("Категория переименована", reply_markup=admin_menu_keyboard().as_markup())
+	await message.answer("Категория переименована", reply_markup=ADMIN_MENU_MARKUP)
 
 
-@router.callback_query(F.data.startswith("admin:category:delete:"))
-async def admin_category_delete(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:category:delete:{cid:int}")
+async def admin_category_delete(callback: CallbackQuery, session: AsyncSession, cid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	cid = int((callback.data or "").rsplit(":", 1)[-1])
-	async with SessionLocal() as session:
-		async with session.begin():
-			# detach products
-			await session.execute(update(Product).where(Product.category_id == cid).values(category_id=None))
-			# delete category
-			await session.execute(delete(Category).where(Category.id == cid))
-		await session.commit()
-	from app.bot.keyboards.inline import admin_menu_keyboard as _kb
-	await _safe_edit_cb(callback, "Категория удалена", reply_markup=_kb().as_markup())
+	# detach products
+	await session.execute(update(Product).where(Product.category_id == cid).values(category_id=None))
+	# delete category
+	await session.execute(delete(Category).where(Category.id == cid))
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("category", cid))
+	await _safe_edit_cb(callback, "Категория удалена", reply_markup=ADMIN_MENU_MARKUP)
 
 
 @router.message(ProductCreateStates.title, F.text)
 async def pc_title(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	await state.update_data(title=message.text)
 	await state.set_state(ProductCreateStates.description)
 	await message.answer("Введите описание (или отправьте '-' чтобы пропустить)")
@@ -314,8 +259,6 @@ async def pc_title(message: Message, state: FSMContext) -> None:
 
 @router.message(ProductCreateStates.description)
 async def pc_description(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	desc = None if (message.text or "").strip() == "-" else message.text
 	await state.update_data(description=desc)
 	
@@ -333,11 +276,8 @@ async def pc_description(message: Message, state: FSMContext) -> None:
 	await message.answer("Хотите добавить вкусы к товару? Это полезно для одноразок и других товаров с вариантами.", reply_markup=builder.as_markup())
 
 
-@router.callback_query(ProductCreateStates.flavors, F.data == "admin:product:add_flavors")
+@router.callback("admin:product:add_flavors", ProductCreateStates.flavors)
 async def pc_add_flavors(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
 	try:
 		await _safe_answer(callback)
 	except Exception:
@@ -350,8 +290,6 @@ async def pc_add_flavors(callback: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(ProductCreateStates.flavors, F.text)
 async def pc_flavors_name(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	
 	text = (message.text or "").strip()
 	
@@ -385,11 +323,8 @@ async def pc_flavors_name(message: Message, state: FSMContext) -> None:
 
 
 
-@router.callback_query(ProductCreateStates.flavors, F.data == "admin:product:skip_flavors")
+@router.callback("admin:product:skip_flavors", ProductCreateStates.flavors)
 async def pc_skip_flavors(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
 	try:
 		await _safe_answer(callback)
 	except Exception:
@@ -405,43 +340,34 @@ async def pc_skip_flavors(callback: CallbackQuery, state: FSMContext) -> None:
 
 # --- Appended: products list and edit handlers ---
 from app.bot.keyboards.inline import admin_products_keyboard, admin_product_edit_keyboard
-from app.bot.keyboards.inline import admin_menu_keyboard as _admin_menu_kb
 from aiogram.types import InlineKeyboardButton
 
 
-@router.callback_query(F.data == "admin:products")
-async def admin_products(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:products")
+async def admin_products(callback: CallbackQuery, session: AsyncSession) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	async with SessionLocal() as session:
-		# Show only active products (not in archive)
-		res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == False).order_by(Product.title))
-		prods = list(res.scalars().all())
+	# Show only active products (not in archive)
+	res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == False).order_by(Product.title))
+	prods = list(res.scalars().all())
 	if not prods:
-		await _safe_edit_cb(callback, "Товаров нет", reply_markup=admin_menu_keyboard().as_markup())
+		await _safe_edit_cb(callback, "Товаров нет", reply_markup=ADMIN_MENU_MARKUP)
 		return
 	kb = admin_products_keyboard([(p.id, p.title) for p in prods])
 	await _safe_edit_cb(callback, "Выберите товар для редактирования:", reply_markup=kb.as_markup())
 	# already answered above
-@router.callback_query(F.data == "admin:products:archived")
-async def admin_products_archived(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:products:archived")
+async def admin_products_archived(callback: CallbackQuery, session: AsyncSession) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	async with SessionLocal() as session:
-		res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == True).order_by(Product.title))
-		prods = list(res.scalars().all())
+	res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == True).order_by(Product.title))
+	prods = list(res.scalars().all())
 	if not prods:
-		await _safe_edit_cb(callback, "Архив пуст", reply_markup=_admin_menu_kb().as_markup())
+		await _safe_edit_cb(callback, "Архив пуст", reply_markup=ADMIN_MENU_MARKUP)
 		return
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	builder = InlineKeyboardBuilder()
@@ -452,16 +378,12 @@ async def admin_products_archived(callback: CallbackQuery) -> None:
 	await _safe_edit_cb(callback, "Архив товаров", reply_markup=builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:arch:open:"))
-async def admin_archived_open(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:arch:open:{pid:int}")
+async def admin_archived_open(callback: CallbackQuery, pid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	pid = int((callback.data or "").rsplit(":", 1)[-1])
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	builder = InlineKeyboardBuilder()
 	builder.row(InlineKeyboardButton(text="♻️ Восстановить", callback_data=f"admin:arch:restore:{pid}"))
@@ -470,52 +392,42 @@ async def admin_archived_open(callback: CallbackQuery) -> None:
 	await _safe_edit_cb(callback, f"Товар #{pid} в архиве", reply_markup=builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:arch:restore:"))
-async def admin_archived_restore(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:arch:restore:{pid:int}")
+async def admin_archived_restore(callback: CallbackQuery, session: AsyncSession, pid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	pid = int((callback.data or "").rsplit(":", 1)[-1])
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await _safe_edit_cb(callback, "Товар не найден", reply_markup=_admin_menu_kb().as_markup())
-				return
-			prod.is_deleted = False  # type: ignore[attr-defined]
-			# не включаем автоматически в продажу, админ решит сам
-	await _safe_edit_cb(callback, "Товар восстановлен", reply_markup=_admin_menu_kb().as_markup())
-
-
-@router.callback_query(F.data.startswith("admin:arch:delete:"))
-async def admin_archived_delete_permanently(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await _safe_edit_cb(callback, "Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
 		return
+	prod.is_deleted = False  # type: ignore[attr-defined]
+	# не включаем автоматически в продажу, админ решит сам
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
+	await _safe_edit_cb(callback, "Товар восстановлен", reply_markup=ADMIN_MENU_MARKUP)
+
+
+@router.callback("admin:arch:delete:{pid:int}")
+async def admin_archived_delete_permanently(callback: CallbackQuery, session: AsyncSession, pid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	pid = int((callback.data or "").rsplit(":", 1)[-1])
 	from sqlalchemy import delete as sa_delete
-	async with SessionLocal() as session:
-		async with session.begin():
-			# удалить связанные вкусы, чтобы не нарушить FK
-			await session.execute(sa_delete(Flavor).where(Flavor.product_id == pid))
-			# удалить связанные позиции заказов, чтобы не нарушить FK
-			await session.execute(sa_delete(OrderItem).where(OrderItem.product_id == pid))
-			# удалить сам товар
-			await session.execute(sa_delete(Product).where(Product.id == pid))
-		await session.commit()
+	# удалить связанные вкусы, чтобы не нарушить FK
+	await session.execute(sa_delete(Flavor).where(Flavor.product_id == pid))
+	# удалить связанные позиции заказов, чтобы не нарушить FK
+	await session.execute(sa_delete(OrderItem).where(OrderItem.product_id == pid))
+	# удалить сам товар
+	await session.execute(sa_delete(Product).where(Product.id == pid))
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	# вернуться к списку архива
-	async with SessionLocal() as session:
-		res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == True).order_by(Product.title))
-		prods = list(res.scalars().all())
+	res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == True).order_by(Product.title))
+	prods = list(res.scalars().all())
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	builder = InlineKeyboardBuilder()
 	if not prods:
@@ -529,18 +441,12 @@ async def admin_archived_delete_permanently(callback: CallbackQuery) -> None:
 	await _safe_edit_cb(callback, "Товар удалён навсегда", reply_markup=builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("adminprod:"))
-async def admin_product_open(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
-	_, pid = callback.data.split(":", 1)  # type: ignore[union-attr]
-	product_id = int(pid)
+@router.callback("adminprod:{product_id:int}")
+async def admin_product_open(callback: CallbackQuery, session: AsyncSession, product_id: int) -> None:
 	kb = admin_product_edit_keyboard(product_id)
 	# try show product photo with caption
-	async with SessionLocal() as session:
-		res = await session.execute(select(Product).where(Product.id == product_id))
-		prod = res.scalars().first()
+	res = await session.execute(select(Product).where(Product.id == product_id))
+	prod = res.scalars().first()
 	if prod and getattr(prod, "photo_file_id", None):
 		caption_lines = [f"<b>{prod.title}</b>"]
 		if prod.description:
@@ -555,43 +461,32 @@ async def admin_product_open(callback: CallbackQuery) -> None:
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("admin:product:delete:"))
-async def admin_product_delete(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:product:delete:{pid:int}")
+async def admin_product_delete(callback: CallbackQuery, session: AsyncSession, pid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	pid_str = (callback.data or "").rsplit(":", 1)[-1]
-	try:
-		pid = int(pid_str)
-	except ValueError:
-		await _safe_edit_cb(callback, "Некорректный ID товара", reply_markup=admin_menu_keyboard().as_markup())
-		return
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await _safe_edit_cb(callback, "Товар не найден", reply_markup=admin_menu_keyboard().as_markup())
-				return
-			# мягкое удаление: помечаем как удалённый
-			if hasattr(prod, "is_deleted"):
-				setattr(prod, "is_deleted", True)
-			else:
-				# если поля нет, просто скрываем из наличия
-				if hasattr(prod, "in_stock"):
-					setattr(prod, "in_stock", False)
-		await session.commit()
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await _safe_edit_cb(callback, "Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		return
+	# мягкое удаление: помечаем как удалённый
+	if hasattr(prod, "is_deleted"):
+		setattr(prod, "is_deleted", True)
+	else:
+		# если поля нет, просто скрываем из наличия
+		if hasattr(prod, "in_stock"):
+			setattr(prod, "in_stock", False)
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	# после удаления вернёмся к списку товаров
-	async with SessionLocal() as session:
-		res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == False).order_by(Product.title))
-		prods = list(res.scalars().all())
+	res = await session.execute(select(Product).where(getattr(Product, "is_deleted", False) == False).order_by(Product.title))
+	prods = list(res.scalars().all())
 	from app.bot.keyboards.inline import admin_products_keyboard as _prods_kb
 	if not prods:
-		await _safe_edit_cb(callback, "Товар удалён. Товаров нет", reply_markup=admin_menu_keyboard().as_markup())
+		await _safe_edit_cb(callback, "Товар удалён. Товаров нет", reply_markup=ADMIN_MENU_MARKUP)
 		return
 	kb = _prods_kb([(p.id, p.title) for p in prods])
 	await _safe_edit_cb(callback, "Товар удалён", reply_markup=kb.as_markup())
@@ -612,14 +507,8 @@ class NotifyStates(StatesGroup):
 	notify_text = State()
 
 
-def _parse_edit(data: str) -> tuple[str, int]:
-	parts = data.split(":")
-	return parts[2], int(parts[3])
-
-
-@router.callback_query(F.data.startswith("admin:edit:title:"))
-async def edit_title_start(callback: CallbackQuery, state: FSMContext) -> None:
-	_, pid = _parse_edit(callback.data or "")
+@router.callback("admin:edit:title:{pid:int}")
+async def edit_title_start(callback: CallbackQuery, state: FSMContext, pid: int) -> None:
 	await state.set_state(ProductEditStates.edit_title)
 	await state.update_data(product_id=pid)
 	await _safe_edit_cb(callback, "Введите новое название")
@@ -627,27 +516,25 @@ async def edit_title_start(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(ProductEditStates.edit_title)
-async def edit_title_save(message: Message, state: FSMContext) -> None:
+async def edit_title_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	pid = int(data.get("product_id"))
 	new_title = (message.text or "").strip()
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await message.answer("Товар не найден", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			prod.title = new_title
-		await session.commit()
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await message.answer("Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	prod.title = new_title
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	await state.clear()
 	await message.answer("Название обновлено", reply_markup=admin_product_edit_keyboard(pid).as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:edit:desc:"))
-async def edit_desc_start(callback: CallbackQuery, state: FSMContext) -> None:
-	_, pid = _parse_edit(callback.data or "")
+@router.callback("admin:edit:desc:{pid:int}")
+async def edit_desc_start(callback: CallbackQuery, state: FSMContext, pid: int) -> None:
 	await state.set_state(ProductEditStates.edit_desc)
 	await state.update_data(product_id=pid)
 	await _safe_edit_cb(callback, "Отправьте новое описание (или '-' чтобы очистить)")
@@ -655,28 +542,26 @@ async def edit_desc_start(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(ProductEditStates.edit_desc)
-async def edit_desc_save(message: Message, state: FSMContext) -> None:
+async def edit_desc_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	pid = int(data.get("product_id"))
 	text = (message.text or "").strip()
 	new_desc = None if text == "-" else text
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await message.answer("Товар не найден", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			prod.description = new_desc
-		await session.commit()
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await message.answer("Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	prod.description = new_desc
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	await state.clear()
 	await message.answer("Описание обновлено", reply_markup=admin_product_edit_keyboard(pid).as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:edit:price:"))
-async def edit_price_start(callback: CallbackQuery, state: FSMContext) -> None:
-	_, pid = _parse_edit(callback.data or "")
+@router.callback("admin:edit:price:{pid:int}")
+async def edit_price_start(callback: CallbackQuery, state: FSMContext, pid: int) -> None:
 	await state.set_state(ProductEditStates.edit_price)
 	await state.update_data(product_id=pid)
 	await _safe_edit_cb(callback, "Введите новую цену, например 199.99")
@@ -684,7 +569,7 @@ async def edit_price_start(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(ProductEditStates.edit_price)
-async def edit_price_save(message: Message, state: FSMContext) -> None:
+async def edit_price_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	pid = int(data.get("product_id"))
 	price_text = (message.text or "").replace(",", ".").strip()
@@ -693,23 +578,58 @@ async def edit_price_save(message: Message, state: FSMContext) -> None:
 	except ValueError:
 		await message.answer("Неверная цена. Введите ещё раз, например 199.99")
 		return
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await message.answer("Товар не найден", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			prod.price = new_price
-		await session.commit()
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await message.answer("Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	prod.price = new_price
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	await state.clear()
 	await message.answer("Цена обновлена", reply_markup=admin_product_edit_keyboard(pid).as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:edit:photo:"))
-async def edit_photo_start(callback: CallbackQuery, state: FSMContext) -> None:
-	_, pid = _parse_edit(callback.data or "")
+@router.callback("admin:edit:stock:{pid:int}")
+async def edit_stock_start(callback: CallbackQuery, state: FSMContext, session: AsyncSession, pid: int) -> None:
+	current = (await session.execute(select(Product.stock_qty).where(Product.id == pid))).scalar()
+	await state.set_state(ProductEditStates.edit_stock)
+	await state.update_data(product_id=pid)
+	shown = "не учитывается" if current is None else f"{current} шт."
+	await _safe_edit_cb(callback, f"Сейчас на складе: {shown}\n\nВведите остаток (число) или «-», чтобы не учитывать остаток")
+	await _safe_answer(callback)
+
+
+@router.message(ProductEditStates.edit_stock)
+async def edit_stock_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
+	data = await state.get_data()
+	pid = int(data.get("product_id"))
+	stock_text = (message.text or "").strip()
+	if stock_text == "-":
+		values = {"stock_qty": None}
+	else:
+		try:
+			qty = int(stock_text)
+		except ValueError:
+			qty = -1
+		if qty < 0:
+			await message.answer("Неверное количество. Введите целое число ≥ 0 или «-»")
+			return
+		values = {"stock_qty": qty, "in_stock": qty > 0}
+	res = await session.execute(update(Product).where(Product.id == pid).values(**values).returning(Product.id))
+	if res.scalar() is None:
+		await message.answer("Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
+	await state.clear()
+	await message.answer("Остаток обновлён", reply_markup=admin_product_edit_keyboard(pid).as_markup())
+
+
+@router.callback("admin:edit:photo:{pid:int}")
+async def edit_photo_start(callback: CallbackQuery, state: FSMContext, pid: int) -> None:
 	await state.set_state(ProductEditStates.edit_photo)
 	await state.update_data(product_id=pid)
 	await _safe_edit_cb(callback, "Отправьте новое фото товара (как фото, не как файл)")
@@ -717,34 +637,31 @@ async def edit_photo_start(callback: CallbackQuery, state: FSMContext) -> None:
 
 
 @router.message(ProductEditStates.edit_photo, F.photo)
-async def edit_photo_save(message: Message, state: FSMContext) -> None:
+async def edit_photo_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	pid = int(data.get("product_id"))
 	file_id = message.photo[-1].file_id  # type: ignore[index]
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await message.answer("Товар не найден", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				return
-			prod.photo_file_id = file_id
-		await session.commit()
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await message.answer("Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		return
+	prod.photo_file_id = file_id
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	await state.clear()
 	await message.answer("Фото обновлено", reply_markup=admin_product_edit_keyboard(pid).as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:edit:category:"))
-async def edit_category_start(callback: CallbackQuery, state: FSMContext) -> None:
-	_, pid = _parse_edit(callback.data or "")
+@router.callback("admin:edit:category:{pid:int}")
+async def edit_category_start(callback: CallbackQuery, state: FSMContext, session: AsyncSession, pid: int) -> None:
 	await state.set_state(ProductEditStates.edit_category)
 	await state.update_data(product_id=pid)
-	async with SessionLocal() as session:
-		res = await session.execute(select(Category).order_by(Category.name))
-		cats = list(res.scalars().all())
+	res = await session.execute(select(Category).order_by(Category.name))
+	cats = list(res.scalars().all())
 	if not cats:
-		await _safe_edit_cb(callback, "Сначала создайте категорию", reply_markup=admin_menu_keyboard().as_markup())
+		await _safe_edit_cb(callback, "Сначала создайте категорию", reply_markup=ADMIN_MENU_MARKUP)
 		await state.clear()
 		await _safe_answer(callback)
 		return
@@ -753,33 +670,27 @@ async def edit_category_start(callback: CallbackQuery, state: FSMContext) -> Non
 	await _safe_answer(callback)
 
 
-@router.callback_query(ProductEditStates.edit_category, F.data.startswith("admincat:"))
-async def edit_category_save(callback: CallbackQuery, state: FSMContext) -> None:
-	parts = (callback.data or "").split(":")  # type: ignore[union-attr]
-	cid = int(parts[-1])
+@router.callback("admincat:{cid:int}", ProductEditStates.edit_category)
+async def edit_category_save(callback: CallbackQuery, state: FSMContext, session: AsyncSession, cid: int) -> None:
 	data = await state.get_data()
 	pid = int(data.get("product_id"))
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Product).where(Product.id == pid))
-			prod = res.scalars().first()
-			if not prod:
-				await _safe_edit_cb(callback, "Товар не найден", reply_markup=admin_menu_keyboard().as_markup())
-				await state.clear()
-				await _safe_answer(callback)
-				return
-			prod.category_id = cid
-		await session.commit()
+	res = await session.execute(select(Product).where(Product.id == pid))
+	prod = res.scalars().first()
+	if not prod:
+		await _safe_edit_cb(callback, "Товар не найден", reply_markup=ADMIN_MENU_MARKUP)
+		await state.clear()
+		await _safe_answer(callback)
+		return
+	prod.category_id = cid
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", pid))
 	await state.clear()
 	await _safe_edit_cb(callback, "Категория обновлена", reply_markup=admin_product_edit_keyboard(pid).as_markup())
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data == "admin:notify")
+@router.callback("admin:notify")
 async def admin_notify_open_callback(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
 	try:
 		await _safe_answer(callback)
 	except Exception:
@@ -791,32 +702,19 @@ async def admin_notify_open_callback(callback: CallbackQuery, state: FSMContext)
 
 @router.message(NotifyStates.notify_text)
 async def admin_notify_send(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	text = (message.text or "").strip()
 	if not text:
 		await message.answer("Текст пуст. Отправьте текст уведомления")
 		return
-	from app.models.user import User as AppUser
-	async with SessionLocal() as session:
-		res = await session.execute(select(AppUser.id))
-		user_ids = [row[0] for row in res.all()]
-	sent = 0
-	errors = 0
-	for uid in user_ids:
-		try:
-			await message.bot.send_message(uid, text)
-			sent += 1
-		except Exception:
-			errors += 1
 	await state.clear()
-	await message.answer(f"Отправлено: {sent}. Ошибок: {errors}", reply_markup=admin_menu_keyboard().as_markup())
+	# the broadcaster keeps editing this message with progress
+	progress = await message.answer("📣 Рассылка запущена…")
+	job_id = await broadcaster.start(message.bot, message.chat.id, progress.message_id, text)
+	await message.answer(f"Рассылка #{job_id} идёт в фоне", reply_markup=ADMIN_MENU_MARKUP)
 
 
 @router.message(ProductCreateStates.photo, F.photo)
 async def pc_photo(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	file_id = message.photo[-1].file_id  # type: ignore[index]
 	await state.update_data(photo_file_id=file_id)
 	await state.set_state(ProductCreateStates.price)
@@ -825,8 +723,6 @@ async def pc_photo(message: Message, state: FSMContext) -> None:
 
 @router.message(ProductCreateStates.photo, F.text)
 async def pc_photo_skip(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	if (message.text or "").strip() == "-":
 		await state.update_data(photo_file_id=None)
 		await state.set_state(ProductCreateStates.price)
@@ -837,8 +733,6 @@ async def pc_photo_skip(message: Message, state: FSMContext) -> None:
 
 @router.message(ProductCreateStates.price, F.text)
 async def pc_price(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	price_text = (message.text or "").replace(",", ".").strip()
 	try:
 		price = float(price_text)
@@ -856,24 +750,19 @@ async def pc_price(message: Message, state: FSMContext) -> None:
 	await message.answer("Товар в наличии?", reply_markup=kb.as_markup())
 
 
-@router.callback_query(ProductCreateStates.availability, F.data.startswith("admin:availability:"))
-async def pc_availability(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:availability:{answer}", ProductCreateStates.availability)
+async def pc_availability(callback: CallbackQuery, state: FSMContext, session: AsyncSession, answer: str) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	parts = (callback.data or "").split(":")  # type: ignore[union-attr]
-	in_stock = parts[-1] == "yes"
+	in_stock = answer == "yes"
 	await state.update_data(in_stock=in_stock)
 	# proceed to category selection
-	async with SessionLocal() as session:
-		res = await session.execute(select(Category).order_by(Category.name))
-		cats = list(res.scalars().all())
+	res = await session.execute(select(Category).order_by(Category.name))
+	cats = list(res.scalars().all())
 	if not cats:
-		await callback.message.edit_text("Сначала создайте категорию: /addcat Название", reply_markup=admin_menu_keyboard().as_markup())
+		await callback.message.edit_text("Сначала создайте категорию: /addcat Название", reply_markup=ADMIN_MENU_MARKUP)
 		await state.clear()
 		await _safe_answer(callback)
 		return
@@ -884,95 +773,78 @@ async def pc_availability(callback: CallbackQuery, state: FSMContext) -> None:
 	# already answered above
 
 
-@router.callback_query(ProductCreateStates.category, F.data.startswith("admincat:"))
-async def pc_category(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admincat:{cid:int}", ProductCreateStates.category)
+async def pc_category(callback: CallbackQuery, state: FSMContext, session: AsyncSession, cid: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	_, cid = callback.data.split(":", 1)  # type: ignore[union-attr]
-	await state.update_data(category_id=int(cid))
+	await state.update_data(category_id=cid)
 	
 	# Create product immediately after category selection
 	data = await state.get_data()
 	
-	async with SessionLocal() as session:
-		async with session.begin():
-			# Create product
-			product = Product(
-				title=data.get('title'),
-				description=data.get('description'),
-				price=float(data.get('price', 0)),
-				category_id=int(data.get('category_id')),
-				photo_file_id=data.get('photo_file_id'),
-				in_stock=bool(data.get('in_stock', True)),
-			)
-			session.add(product)
-			await session.flush()  # Get product ID
+	# Create product
+	product = Product(
+		title=data.get('title'),
+		description=data.get('description'),
+		price=float(data.get('price', 0)),
+		category_id=int(data.get('category_id')),
+		photo_file_id=data.get('photo_file_id'),
+		in_stock=bool(data.get('in_stock', True)),
+	)
+	session.add(product)
+	await session.flush()  # Get product ID
 			
-			# Create flavors if any
-			flavors = data.get('flavors', [])
-			if flavors:
-				from app.models.flavor import Flavor
-				for flavor_name in flavors:
-					flavor = Flavor(
-						name=flavor_name,
-						product_id=product.id,
-						is_available=True
-					)
-					session.add(flavor)
+	# Create flavors if any
+	flavors = data.get('flavors', [])
+	if flavors:
+		from app.models.flavor import Flavor
+		for flavor_name in flavors:
+			flavor = Flavor(
+				name=flavor_name,
+				product_id=product.id,
+				is_available=True
+			)
+			session.add(flavor)
 			
-			await session.commit()
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", product.id))
 	
 	await state.clear()
-	await _safe_edit_cb(callback, f"✅ Товар '{data.get('title')}' успешно создан!", reply_markup=admin_menu_keyboard().as_markup())
+	await _safe_edit_cb(callback, f"✅ Товар '{data.get('title')}' успешно создан!", reply_markup=ADMIN_MENU_MARKUP)
 
 
 # --- Flavor management handlers ---
 
-@router.callback_query(F.data.startswith("admin:edit:flavors:"))
-async def admin_edit_flavors(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:edit:flavors:{product_id:int}")
+async def admin_edit_flavors(callback: CallbackQuery, session: AsyncSession, product_id: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
 	
-	product_id = int((callback.data or "").rsplit(":", 1)[-1])
-	
-	async with SessionLocal() as session:
-		res = await session.execute(select(Flavor).where(Flavor.product_id == product_id).order_by(Flavor.name))
-		flavors = list(res.scalars().all())
+	res = await session.execute(select(Flavor).where(Flavor.product_id == product_id).order_by(Flavor.name))
+	flavors = list(res.scalars().all())
 	
 	kb = admin_flavors_keyboard(product_id, flavors)
 	await _safe_edit_cb(callback, f"🍃 Управление вкусами товара", reply_markup=kb.as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:flavor:add:"))
-async def admin_flavor_add_start(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:flavor:add:{product_id:int}")
+async def admin_flavor_add_start(callback: CallbackQuery, state: FSMContext, product_id: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
 	
-	product_id = int((callback.data or "").rsplit(":", 1)[-1])
 	await state.set_state(AdminFlavorStates.add_name)
 	await state.update_data(product_id=product_id)
 	await _safe_edit_cb(callback, "Введите название нового вкуса")
 
 
 @router.message(AdminFlavorStates.add_name)
-async def admin_flavor_add_save(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
+async def admin_flavor_add_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	
 	flavor_name = (message.text or "").strip()
 	if not flavor_name:
@@ -982,85 +854,70 @@ async def admin_flavor_add_save(message: Message, state: FSMContext) -> None:
 	data = await state.get_data()
 	product_id = int(data.get("product_id"))
 	
-	async with SessionLocal() as session:
-		async with session.begin():
-			# Check if flavor already exists for this product
-			existing = await session.execute(
-				select(Flavor).where(
-					Flavor.product_id == product_id,
-					Flavor.name == flavor_name
-				)
-			)
-			if existing.scalars().first():
-				await message.answer("Такой вкус уже существует для этого товара", reply_markup=admin_flavors_keyboard(product_id, []).as_markup())
-				await state.clear()
-				return
+	# Check if flavor already exists for this product
+	existing = await session.execute(
+		select(Flavor).where(
+			Flavor.product_id == product_id,
+			Flavor.name == flavor_name
+		)
+	)
+	if existing.scalars().first():
+		await message.answer("Такой вкус уже существует для этого товара", reply_markup=admin_flavors_keyboard(product_id, []).as_markup())
+		await state.clear()
+		return
 			
-			# Create new flavor
-			flavor = Flavor(
-				name=flavor_name,
-				product_id=product_id,
-				is_available=True
-			)
-			session.add(flavor)
-			await session.commit()
+	# Create new flavor
+	flavor = Flavor(
+		name=flavor_name,
+		product_id=product_id,
+		is_available=True
+	)
+	session.add(flavor)
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("flavor", flavor.id))
 	
 	await state.clear()
 	await message.answer(f"✅ Вкус '{flavor_name}' добавлен!", reply_markup=admin_flavors_keyboard(product_id, []).as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:flavor:toggle:"))
-async def admin_flavor_toggle(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:flavor:toggle:{product_id:int}:{flavor_id:int}")
+async def admin_flavor_toggle(callback: CallbackQuery, session: AsyncSession, product_id: int, flavor_id: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
+
 	
-	parts = (callback.data or "").split(":")
-	product_id = int(parts[-2])
-	flavor_id = int(parts[-1])
-	
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(Flavor).where(Flavor.id == flavor_id))
-			flavor = res.scalars().first()
-			if not flavor:
-				await _safe_edit_cb(callback, "Вкус не найден", reply_markup=admin_menu_keyboard().as_markup())
-				return
+	res = await session.execute(select(Flavor).where(Flavor.id == flavor_id))
+	flavor = res.scalars().first()
+	if not flavor:
+		await _safe_edit_cb(callback, "Вкус не найден", reply_markup=ADMIN_MENU_MARKUP)
+		return
 			
-			# Toggle availability
-			flavor.is_available = not flavor.is_available
-			await session.commit()
+	# Toggle availability
+	flavor.is_available = not flavor.is_available
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("flavor", flavor_id))
 	
 	# Refresh flavors list
-	async with SessionLocal() as session:
-		res = await session.execute(select(Flavor).where(Flavor.product_id == product_id).order_by(Flavor.name))
-		flavors = list(res.scalars().all())
+	res = await session.execute(select(Flavor).where(Flavor.product_id == product_id).order_by(Flavor.name))
+	flavors = list(res.scalars().all())
 	
 	kb = admin_flavors_keyboard(product_id, flavors)
 	await _safe_edit_cb(callback, f"🍃 Управление вкусами товара", reply_markup=kb.as_markup())
 
 
-@router.callback_query(F.data.startswith("admin:flavor:delete:"))
-async def admin_flavor_delete_all(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:flavor:delete:{product_id:int}")
+async def admin_flavor_delete_all(callback: CallbackQuery, session: AsyncSession, product_id: int) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
 	
-	product_id = int((callback.data or "").rsplit(":", 1)[-1])
-	
-	async with SessionLocal() as session:
-		async with session.begin():
-			# Delete all flavors for this product
-			await session.execute(delete(Flavor).where(Flavor.product_id == product_id))
-			await session.commit()
+	# Delete all flavors for this product
+	await session.execute(delete(Flavor).where(Flavor.product_id == product_id))
+	await session.commit()
+	await invalidation_bus.publish(ChangeEvent("product", product_id))
 	
 	await _safe_edit_cb(callback, "🗑 Все вкусы товара удалены", reply_markup=admin_flavors_keyboard(product_id, []).as_markup())
 
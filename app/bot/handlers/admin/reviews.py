@@ -1,18 +1,24 @@
-from aiogram import Router, F
+from aiogram import F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
 from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from aiogram.exceptions import TelegramBadRequest
 
-from app.core.config import settings
-from app.db.session import SessionLocal
 from app.models.review import Review
-from app.bot.keyboards.inline import admin_menu_keyboard
+from app.bot.callback_router import CallbackRouter
+from app.bot.filters import IsAdmin
+from app.bot.callback_tokens import callback_tokens
+from app.bot.keyboards.inline import ADMIN_MENU_MARKUP
+
+
+router = CallbackRouter(name="admin_reviews")
+router.message.filter(IsAdmin())
+router.callback_query.filter(IsAdmin())
 
 
-router = Router(name="admin_reviews")
 async def _safe_edit_cb(callback: CallbackQuery, text: str, reply_markup=None) -> None:
 	try:
 		await callback.message.edit_text(text, reply_markup=reply_markup)
@@ -28,23 +34,13 @@ async def _safe_answer(callback: CallbackQuery) -> None:
 		pass  # Ignore old query errors
 
 
-def _is_admin(user_id: int) -> bool:
-	if not settings.admin_ids:
-		return False
-	admin_id_set = {int(x.strip()) for x in settings.admin_ids.split(",") if x.strip()}
-	return user_id in admin_id_set
-
-
 class ReviewStates(StatesGroup):
 	wait_media = State()
 	wait_caption = State()
 
 
-@router.callback_query(F.data == "admin:review:add")
+@router.callback("admin:review:add")
 async def review_add_open(callback: CallbackQuery, state: FSMContext) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
 	try:
 		await _safe_answer(callback)
 	except Exception:
@@ -57,8 +53,6 @@ async def review_add_open(callback: CallbackQuery, state: FSMContext) -> None:
 
 @router.message(ReviewStates.wait_media, F.photo | F.video)
 async def review_capture_media(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
 	if message.photo:
 		file_id = message.photo[-1].file_id  # type: ignore[index]
 		media_type = "photo"
@@ -71,42 +65,36 @@ async def review_capture_media(message: Message, state: FSMContext) -> None:
 
 
 @router.message(ReviewStates.wait_caption)
-async def review_save(message: Message, state: FSMContext) -> None:
-	if not _is_admin(message.from_user.id):  # type: ignore[union-attr]
-		return
+async def review_save(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	data = await state.get_data()
 	caption = None if (message.text or "").strip() == "-" else message.text
-	async with SessionLocal() as session:
-		async with session.begin():
-			rev = Review(media_type=data["media_type"], file_id=data["file_id"], caption=caption)
-			session.add(rev)
-		await session.commit()
+	session.add(Review(media_type=data["media_type"], file_id=data["file_id"], caption=caption))
+	await session.commit()
 	await state.clear()
-	await message.answer("Отзыв добавлен", reply_markup=admin_menu_keyboard().as_markup())
+	await message.answer("Отзыв добавлен", reply_markup=ADMIN_MENU_MARKUP)
 
 
-async def _show_review_page(callback: CallbackQuery, offset: int) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+async def _show_review_page(callback: CallbackQuery, session: AsyncSession, offset: int, total: int | None = None) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	async with SessionLocal() as session:
-		# total count
+	# total count, unless the button carried it (callback tokens)
+	if total is None:
 		cnt_res = await session.execute(select(func.count(Review.id)))
 		total = int(cnt_res.scalar() or 0)
-		if total == 0:
-			await _safe_edit_cb(callback, "Пока нет отзывов", reply_markup=admin_menu_keyboard().as_markup())
-			return
-		# clamp offset
-		offset = max(0, min(offset, max(0, total - 1)))
-		# load one review by offset
-		rev_res = await session.execute(
-			select(Review).order_by(Review.created_at.desc()).offset(offset).limit(1)
-		)
-		rev = rev_res.scalars().first()
+	if total == 0:
+		await _safe_edit_cb(callback, "Пока нет отзывов", reply_markup=ADMIN_MENU_MARKUP)
+		return
+	# clamp offset
+	offset = max(0, min(offset, max(0, total - 1)))
+	# load one review by offset
+	rev_res = await session.execute(
+		select(Review).order_by(Review.created_at.desc()).offset(offset).limit(1)
+	)
+	rev = rev_res.scalars().first()
+	# end the transaction before the Telegram round-trips below
+	await session.commit()
 	
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	from aiogram.types import InlineKeyboardButton
@@ -115,12 +103,12 @@ async def _show_review_page(callback: CallbackQuery, offset: int) -> None:
 	prev_off = max(0, offset - 1)
 	next_off = min(total - 1, offset + 1)
 	if offset > 0:
-		b.button(text="◀️ Пред", callback_data=f"admin:reviews:page:{prev_off}")
+		b.button(text="◀️ Пред", callback_data=callback_tokens.pack(f"admin:reviews:page:{prev_off}", total=total))
 	if offset < total - 1:
-		b.button(text="▶️ След", callback_data=f"admin:reviews:page:{next_off}")
+		b.button(text="▶️ След", callback_data=callback_tokens.pack(f"admin:reviews:page:{next_off}", total=total))
 	b.adjust(2)
 	# delete + back
-	b.row(InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:review:del:{getattr(rev,'id',0)}:{offset}"))
+	b.row(InlineKeyboardButton(text="🗑 Удалить", callback_data=callback_tokens.pack(f"admin:review:del:{getattr(rev,'id',0)}:{offset}", total=total)))
 	b.row(InlineKeyboardButton(text="↩️ Назад", callback_data="admin:open"))
 
 	# render
@@ -136,35 +124,27 @@ async def _show_review_page(callback: CallbackQuery, offset: int) -> None:
 		await _safe_edit_cb(callback, caption or "Отзыв", reply_markup=b.as_markup())
 
 
-@router.callback_query(F.data == "admin:reviews")
-async def admin_reviews_open(callback: CallbackQuery) -> None:
-	await _show_review_page(callback, 0)
+@router.callback("admin:reviews")
+async def admin_reviews_open(callback: CallbackQuery, session: AsyncSession) -> None:
+	await _show_review_page(callback, session, 0)
 
 
-@router.callback_query(F.data.startswith("admin:reviews:page:"))
-async def admin_reviews_page(callback: CallbackQuery) -> None:
-	parts = (callback.data or "").split(":")
-	offset = int(parts[-1]) if parts and parts[-1].isdigit() else 0
-	await _show_review_page(callback, offset)
+@router.callback("admin:reviews:page:{offset:int}")
+async def admin_reviews_page(callback: CallbackQuery, session: AsyncSession, offset: int, total: int | None = None) -> None:
+	await _show_review_page(callback, session, offset, total)
 	# already answered above
 
 
-@router.callback_query(F.data.startswith("admin:review:del:"))
-async def admin_review_delete(callback: CallbackQuery) -> None:
-	if not _is_admin(callback.from_user.id):  # type: ignore[union-attr]
-		await _safe_answer(callback)
-		return
+@router.callback("admin:review:del:{review_id:int}:{offset:int}")
+async def admin_review_delete(callback: CallbackQuery, session: AsyncSession, review_id: int, offset: int, total: int | None = None) -> None:
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	parts = (callback.data or "").split(":")
-	review_id = int(parts[-2]) if len(parts) >= 2 else 0
-	offset = int(parts[-1]) if parts and parts[-1].isdigit() else 0
-	async with SessionLocal() as session:
-		await session.execute(delete(Review).where(Review.id == review_id))
-		await session.commit()
+	res = await session.execute(delete(Review).where(Review.id == review_id))
+	if total is not None:
+		total -= res.rowcount
 	# After delete, stay on the same offset index (now shows next item automatically)
-	await _show_review_page(callback, max(0, offset))
+	await _show_review_page(callback, session, max(0, offset), total)
 
 
@@ -1,31 +1,36 @@
-from aiogram import Router, F
+from aiogram import F
 from aiogram.filters import CommandStart
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from aiogram.exceptions import TelegramBadRequest
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.bot.callback_router import CallbackRouter
+from app.bot.callback_tokens import callback_tokens
 from app.bot.keyboards.inline import (
-	catalog_keyboard,
-	categories_keyboard,
-	products_keyboard,
-	product_qty_keyboard,
-	categories_keyboard_with_nav,
-	products_keyboard_with_nav,
-	product_view_keyboard,
-    main_menu_keyboard,
-    info_menu_keyboard,
-    flavor_selection_keyboard,
+	CART_ACTIONS_MARKUP,
+	INFO_ITEM_MARKUP,
+	INFO_MENU_MARKUP,
+	MAIN_MENU_MARKUP,
+	main_menu_markup,
 )
-from app.db.session import SessionLocal
+from app.bot.services.branding import branding_cache
+from app.bot.services.cards import card_cache, unit_price
+from app.bot.services.catalog import FlavorItem, ProductItem, catalog_cache
+from app.bot.services.invalidation import ChangeEvent, invalidation_bus
+from app.bot.services.menus import catalog_menus
+from app.bot.services.outbox import enqueue as outbox_enqueue, outbox
+from app.bot.services.roles import roles
+from app.bot.services.stepper import stepper
+from app.repositories.cart import add_to_cart
 from app.models.order import Order, OrderItem
-from app.models.product import Category, Product
+from app.models.product import Product
 from app.models.user import User
 from app.core.config import settings
 
 
-router = Router(name="user_catalog")
+router = CallbackRouter(name="user_catalog")
 
 
 async def _safe_edit(callback: CallbackQuery, text: str, reply_markup=None) -> None:
@@ -43,231 +48,112 @@ async def _safe_answer(callback: CallbackQuery) -> None:
 		pass  # Ignore old query errors
 
 
+# Callback tokens carry the catalog items their buttons were rendered for and the
+# catalog version; while no change has arrived since, they are used as they are.
+
+async def _product(product_id: int, product: ProductItem | None, catalog_version: int | None) -> ProductItem | None:
+	if product is not None and catalog_cache.unchanged_since(catalog_version):
+		return product
+	return (await catalog_cache.get()).products_by_id.get(product_id)
+
+
+async def _product_flavor(
+	product_id: int, flavor_id: int, product: ProductItem | None, flavor: FlavorItem | None, catalog_version: int | None
+) -> tuple[ProductItem | None, FlavorItem | None]:
+	if product is not None and flavor is not None and catalog_cache.unchanged_since(catalog_version):
+		return product, flavor
+	snapshot = await catalog_cache.get()
+	return snapshot.products_by_id.get(product_id), snapshot.flavor(product_id, flavor_id)
+
+
 @router.message(CommandStart())
-async def start(message: Message) -> None:
+async def start(message: Message, session: AsyncSession, is_admin: bool = False) -> None:
 	user_id = message.from_user.id
-	from app.core.config import settings as _settings 
-	is_admin = False
-	if _settings.admin_ids:
-		try:
-			is_admin = user_id in {int(x.strip()) for x in _settings.admin_ids.split(",") if x.strip()}
-		except Exception:
-			is_admin = False
 	# ensure user exists in DB
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(User).where(User.id == user_id))
-			if res.scalars().first() is None:
-				session.add(User(
-					id=user_id,
-					first_name=message.from_user.first_name if message.from_user else None, last_name=message.from_user.last_name if message.from_user else None,
-				))
-	from app.core.config import settings as __settings
-	from sqlalchemy import select as _select
-	from app.models.branding import Branding as _Branding
-	logo_id = __settings.logo_file_id
-	welcome_text = __settings.welcome_text or "Добро пожаловать! Выберите раздел ниже, чтобы начать покупки."
-	try:
-		async with SessionLocal() as session:
-			res = await session.execute(_select(_Branding).where(_Branding.id == 1))
-			b = res.scalars().first()
-			if b:
-				logo_id = b.logo_file_id or logo_id
-				welcome_text = b.welcome_text or welcome_text
-	except Exception:
-		pass
+	res = await session.execute(select(User).where(User.id == user_id))
+	if res.scalars().first() is None:
+		session.add(User(
+			id=user_id,
+			first_name=message.from_user.first_name if message.from_user else None, last_name=message.from_user.last_name if message.from_user else None,
+		))
+		await session.commit()
+	branding = await branding_cache.get(session)
+	logo_id, welcome_text = branding.logo_file_id, branding.welcome_text
 	if logo_id:
 		try:
-			await message.answer_photo(logo_id, caption=welcome_text, reply_markup=main_menu_keyboard(is_admin).as_markup())
+			await message.answer_photo(logo_id, caption=welcome_text, reply_markup=main_menu_markup(is_admin))
 		except Exception:
-			await message.answer(welcome_text, reply_markup=main_menu_keyboard(is_admin).as_markup())
+			await message.answer(welcome_text, reply_markup=main_menu_markup(is_admin))
 	else:
-		await message.answer(welcome_text, reply_markup=main_menu_keyboard(is_admin).as_markup())
+		await message.answer(welcome_text, reply_markup=main_menu_markup(is_admin))
 
 
-@router.callback_query(F.data == "catalog:open")
+@router.callback("catalog:open")
 async def open_catalog(callback: CallbackQuery) -> None:
-	async with SessionLocal() as session:
-		categories = await _load_categories(session)
-	if not categories:
+	snapshot = await catalog_cache.get()
+	if not snapshot.categories:
 		await _safe_edit(callback, "Категории пока не добавлены.")
 	else:
-		kb = categories_keyboard_with_nav([(c.id, c.name) for c in categories])
-		await _safe_edit(callback, "Выберите категорию:", reply_markup=kb.as_markup())
+		await _safe_edit(callback, "Выберите категорию:", reply_markup=catalog_menus.categories(snapshot))
 	await _safe_answer(callback)
 
 
-async def _load_categories(session: AsyncSession) -> list[Category]:
-	result = await session.execute(select(Category).order_by(Category.name))
-	return list(result.scalars().all())
-
-
-@router.callback_query(F.data.startswith("category:"))
-async def open_category(callback: CallbackQuery) -> None:
-	# data format: category:<category_id>
-	parts = (callback.data or "").split(":")
-	category_id = int(parts[1])
-	async with SessionLocal() as session:
-		products = await _load_products_by_category(session, category_id)
+@router.callback("category:{category_id:int}")
+async def open_category(callback: CallbackQuery, category_id: int) -> None:
+	snapshot = await catalog_cache.get()
+	products = snapshot.products_in_category(category_id, in_stock_only=True)
 	if not products:
 		await _safe_edit(callback, "В этой категории пока нет товаров.")
 	else:
-		kb = products_keyboard_with_nav([(p.id, p.title) for p in products], category_id)
-		await _safe_edit(callback, "Выберите товар:", reply_markup=kb.as_markup())
+		kb = catalog_menus.products(snapshot, category_id, in_stock_only=True)
+		await _safe_edit(callback, "Выберите товар:", reply_markup=kb)
 	await _safe_answer(callback)
 
 
-async def _load_products_by_category(session: AsyncSession, category_id: int) -> list[Product]:
-	result = await session.execute(
-		select(Product).where(
-			Product.category_id == category_id,
-			Product.in_stock == True,
-			getattr(Product, "is_deleted", False) == False
-		).order_by(Product.title)
-	)
-	return list(result.scalars().all())
-
-
-@router.callback_query(F.data.startswith("product:"))
-async def open_product(callback: CallbackQuery) -> None:
-	# data format: product:<product_id>
-	parts = (callback.data or "").split(":")
-	product_id = int(parts[1])
-	async with SessionLocal() as session:
-		product = await _load_product(session, product_id)
+@router.callback("product:{product_id:int}")
+async def open_product(callback: CallbackQuery, product_id: int) -> None:
+	product = (await catalog_cache.get()).products_by_id.get(product_id)
 	if not product:
 		await _safe_edit(callback, "Товар не найден.")
 		await _safe_answer(callback)
 		return
-	
-	# Check if product has flavors
-	from app.models.flavor import Flavor
-	flavors_res = await session.execute(select(Flavor).where(Flavor.product_id == product_id, Flavor.is_available == True))
-	flavors = list(flavors_res.scalars().all())
-	
-	qty = 1
-	text_lines = _product_text(product, qty)
-	
-	# Add flavors info right after description
-	if flavors:
-		text_lines.insert(3, "")  # Add empty line after description
-		text_lines.insert(4, "🍃 <b>Доступные вкусы:</b>")
-		for flavor in flavors:
-			text_lines.insert(5, f"• {flavor.name}")
-		text_lines.insert(5 + len(flavors), "")  # Add empty line after flavors
-		text_lines.insert(6 + len(flavors), "Выберите вкус и количество, затем добавьте в корзину")
-	
-	kb = product_view_keyboard(product.id, product.category_id, qty, enabled=getattr(product, "in_stock", True), has_flavors=bool(flavors))
+	card = card_cache.get(product)
+	text, kb = card.text, card.markup()
 	if product.photo_file_id:
 		try:
 			await callback.message.delete()
-			await callback.message.answer_photo(product.photo_file_id, caption="\n".join(text_lines), reply_markup=kb.as_markup())
+			await callback.message.answer_photo(product.photo_file_id, caption=text, reply_markup=kb)
 		except TelegramBadRequest:
-			await callback.message.edit_text("\n".join(text_lines), reply_markup=kb.as_markup())
+			await callback.message.edit_text(text, reply_markup=kb)
 	else:
-		await callback.message.edit_text("\n".join(text_lines), reply_markup=kb.as_markup())
+		await callback.message.edit_text(text, reply_markup=kb)
 	await _safe_answer(callback)
 
 
-def _calc_price(product: Product, qty: int) -> float:
-	base_price = float(product.price)
-	if product.bulk_threshold and product.bulk_price and qty >= product.bulk_threshold:
-		return float(product.bulk_price)
-	return base_price
-
-
-def _product_text(product: Product, qty: int) -> list[str]:
-	lines = [f"<b>{product.title}</b>", ""]
-	if product.description:
-		lines.append(product.description)
-		lines.append("")
-	
-	# Add flavors info if available (this will be populated by the calling function)
-	# The flavors are added by the open_product function after calling this function
-	
-	unit_price = _calc_price(product, qty)
-	lines.append(f"Цена: <b>{unit_price:.2f}</b>")
-	if qty > 1:
-		lines.append(f"Итого: <b>{unit_price*qty:.2f}</b>")
-	avail = "Есть" if getattr(product, "in_stock", True) else "Нет"
-	lines.extend(["", f"Наличие: <b>{avail}</b>"])
-	return lines
-
-
-def _product_with_flavor_text(product: Product, flavor, qty: int) -> list[str]:
-	"""Generate product text with selected flavor information"""
-	lines = [f"<b>{product.title}</b>", ""]
-	if product.description:
-		lines.append(product.description)
-		lines.append("")
-	
-	# Add selected flavor info
-	lines.append("🍃 <b>Выбранный вкус:</b>")
-	lines.append(f"• {flavor.name}")
-	lines.append("")
-	
-	unit_price = _calc_price(product, qty)
-	lines.append(f"Цена: <b>{unit_price:.2f}</b>")
-	if qty > 1:
-		lines.append(f"Итого: <b>{unit_price*qty:.2f}</b>")
-	avail = "Есть" if getattr(product, "in_stock", True) else "Нет"
-	lines.extend(["", f"Наличие: <b>{avail}</b>"])
-	lines.append("")
-	lines.append("Выберите количество и добавьте в корзину:")
-	return lines
-
-
-@router.callback_query(F.data.startswith("cart:add:"))
-async def cart_add(callback: CallbackQuery) -> None:
-	# data format: cart:add:<product_id>:<qty>
-	parts = (callback.data or "").split(":")
-	product_id = int(parts[2])
-	qty = int(parts[3]) if len(parts) > 3 else 1
+@router.callback("cart:add:{product_id:int}:{qty:int}")
+async def cart_add(
+	callback: CallbackQuery,
+	session: AsyncSession,
+	product_id: int,
+	qty: int,
+	product: ProductItem | None = None,
+	catalog_version: int | None = None,
+) -> None:
 	user_id = callback.from_user.id 
-	async with SessionLocal() as session:
-		async with session.begin():
-			res_user = await session.execute(select(User).where(User.id == user_id))
-			if res_user.scalars().first() is None:
-				session.add(User(id=user_id))
-		result = await session.execute(
-			select(Order).where(Order.user_id == user_id, Order.status == "new")
-		)
-		order = result.scalars().first()
-		if not order:
-			order = Order(user_id=user_id, status="new")
-			session.add(order)
-			await session.flush()
-		# add or update item
-		prod_res = await session.execute(select(Product).where(Product.id == product_id))
-		product = prod_res.scalars().first()
-		if not product:
-			await callback.answer("Товар не найден", show_alert=True)
-			return
-		
-		# Check if product has flavors - if yes, don't allow adding without flavor
-		from app.models.flavor import Flavor
-		flavors_res = await session.execute(select(Flavor).where(Flavor.product_id == product_id, Flavor.is_available == True))
-		flavors = list(flavors_res.scalars().all())
-		
-		if flavors:
-			await callback.answer("Для этого товара необходимо выбрать вкус!", show_alert=True)
-			return
-		
-		item_res = await session.execute(
-			select(OrderItem).where(OrderItem.order_id == order.id, OrderItem.product_id == product_id, OrderItem.flavor_id.is_(None))
-		)
-		item = item_res.scalars().first()
-		if item:
-			# If item already exists without flavor, check if product now has flavors
-			if flavors:
-				await callback.answer("Для этого товара необходимо выбрать вкус! Удалите товар из корзины и добавьте заново с выбором вкуса.", show_alert=True)
-				return
-			item.quantity += qty
-		else:
-			unit = _calc_price(product, qty)
-			item = OrderItem(order_id=order.id, product_id=product_id, quantity=qty, unit_price=unit)
-			session.add(item)
-		await session.commit()
+	product = await _product(product_id, product, catalog_version)
+	if not product:
+		await callback.answer("Товар не найден", show_alert=True)
+		return
+	# products with flavors can only be added through flavor:add
+	if product.flavors:
+		await callback.answer("Для этого товара необходимо выбрать вкус!", show_alert=True)
+		return
+	added = await add_to_cart(session, user_id, product_id, None, qty)
+	# the "go to cart" button may be pressed before this handler returns
+	await session.commit()
+	if added is None:
+		await callback.answer("Товар не найден", show_alert=True)
+		return
 	
 	# Show confirmation message with "Go to cart" button
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -283,81 +169,33 @@ async def cart_add(callback: CallbackQuery) -> None:
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("qty:"))
-async def qty_change(callback: CallbackQuery) -> None:
-	# data: qty:<inc|dec>:<product_id>:<qty>
-	parts = (callback.data or "").split(":")
-	action = parts[1]
-	product_id = int(parts[2])
-	qty = int(parts[3]) if len(parts) > 3 else 1
-	qty = qty + 1 if action == "inc" else max(1, qty - 1)
-	
-	async with SessionLocal() as session:
-		product = await _load_product(session, product_id)
-		if not product:
-			await callback.answer("Товар не найден", show_alert=True)
-			return
-		
-		# Check if product has flavors
-		from app.models.flavor import Flavor
-		flavors_res = await session.execute(select(Flavor).where(Flavor.product_id == product_id, Flavor.is_available == True))
-		flavors = list(flavors_res.scalars().all())
-		has_flavors = bool(flavors)
-	
-	text_lines = _product_text(product, qty)
-	
-	# Add flavors info right after description (same logic as in open_product)
-	if has_flavors:
-		# Find the right position to insert flavors info
-		# If there's a description, insert after it; otherwise, insert after title
-		if product.description:
-			insert_pos = 3  # After description
-		else:
-			insert_pos = 2  # After title
-		
-		text_lines.insert(insert_pos, "")  # Add empty line
-		text_lines.insert(insert_pos + 1, "🍃 <b>Доступные вкусы:</b>")
-		for flavor in flavors:
-			text_lines.insert(insert_pos + 2, f"• {flavor.name}")
-		text_lines.insert(insert_pos + 2 + len(flavors), "")  # Add empty line after flavors
-		text_lines.insert(insert_pos + 3 + len(flavors), "Выберите вкус и количество, затем добавьте в корзину")
-	
-	kb = product_view_keyboard(product.id, product.category_id, qty, enabled=getattr(product, "in_stock", True), has_flavors=has_flavors)
-	
-	try:
-		await callback.message.edit_caption(caption="\n".join(text_lines), reply_markup=kb.as_markup())
-	except TelegramBadRequest:
-		await _safe_edit(callback, "\n".join(text_lines), reply_markup=kb.as_markup())
+@router.callback("qty:{action}:{product_id:int}:{qty:int}")
+async def qty_change(
+	callback: CallbackQuery,
+	action: str,
+	product_id: int,
+	qty: int,
+	product: ProductItem | None = None,
+	catalog_version: int | None = None,
+) -> None:
+	# served from the catalog snapshot: only the keyboard changes, coalesced per message
+	product = await _product(product_id, product, catalog_version)
+	if not product:
+		await callback.answer("Товар не найден", show_alert=True)
+		return
+	stepper.step(callback, action, qty, card_cache.get(product).markup)
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data == "nav:home")
-async def nav_home(callback: CallbackQuery) -> None:
+@router.callback("nav:home")
+async def nav_home(callback: CallbackQuery, is_admin: bool = False) -> None:
 	# Answer early to avoid "query is too old" if subsequent ops take time
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	user_id = callback.from_user.id  
-	is_admin = False
-	if settings.admin_ids:
-		try:
-			is_admin = user_id in {int(x.strip()) for x in settings.admin_ids.split(",") if x.strip()}
-		except Exception:
-			is_admin = False	
-	from app.core.config import settings as __settings
-	from app.models.branding import Branding as _Branding
-	logo_id = __settings.logo_file_id
-	welcome_text = __settings.welcome_text or "Добро пожаловать! Выберите раздел ниже, чтобы начать покупки."
-	try:
-		async with SessionLocal() as session:
-			res = await session.execute(select(_Branding).where(_Branding.id == 1))
-			b = res.scalars().first()
-			if b:
-				logo_id = b.logo_file_id or logo_id
-				welcome_text = b.welcome_text or welcome_text
-	except Exception:
-		pass
+	branding = await branding_cache.get()
+	logo_id, welcome_text = branding.logo_file_id, branding.welcome_text
 	if logo_id:
 		# Always ensure the main screen shows the logo image
 		try:
@@ -365,23 +203,21 @@ async def nav_home(callback: CallbackQuery) -> None:
 		except Exception:
 			pass
 		try:
-			await callback.message.answer_photo(logo_id, caption=welcome_text, reply_markup=main_menu_keyboard(is_admin).as_markup())
+			await callback.message.answer_photo(logo_id, caption=welcome_text, reply_markup=main_menu_markup(is_admin))
 		except TelegramBadRequest:
-			await _safe_edit(callback, welcome_text, reply_markup=main_menu_keyboard(is_admin).as_markup())
+			await _safe_edit(callback, welcome_text, reply_markup=main_menu_markup(is_admin))
 	else:
-		await _safe_edit(callback, welcome_text, reply_markup=main_menu_keyboard(is_admin).as_markup())
+		await _safe_edit(callback, welcome_text, reply_markup=main_menu_markup(is_admin))
 
 
-@router.callback_query(F.data == "info:open")
+@router.callback("info:open")
 async def info_open(callback: CallbackQuery) -> None:
-	await _safe_edit(callback, "Раздел: ℹ️ О нас\n\nВыберите тему:", reply_markup=info_menu_keyboard().as_markup())
+	await _safe_edit(callback, "Раздел: ℹ️ О нас\n\nВыберите тему:", reply_markup=INFO_MENU_MARKUP)
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("info:item:"))
-async def info_item(callback: CallbackQuery) -> None:
-	key = (callback.data or "").split(":", 2)[-1]  # type: ignore[union-attr]
-	from app.bot.keyboards.inline import info_item_keyboard
+@router.callback("info:item:{key:tail}")
+async def info_item(callback: CallbackQuery, session: AsyncSession, key: str) -> None:
 	texts: dict[str, str] = {
 		"about": (
 			"<b>О нас</b>\n\n"
@@ -407,14 +243,11 @@ async def info_item(callback: CallbackQuery) -> None:
 		),
 	}
 	if key == "reviews":
-		from sqlalchemy import select
-		from app.db.session import SessionLocal
 		from app.models.review import Review
-		async with SessionLocal() as session:
-			res = await session.execute(select(Review).order_by(Review.created_at.desc()).limit(10))
-			reviews = list(res.scalars().all())
+		res = await session.execute(select(Review).order_by(Review.created_at.desc()).limit(10))
+		reviews = list(res.scalars().all())
 		if not reviews:
-			await _safe_edit(callback, "Пока нет отзывов", reply_markup=info_item_keyboard().as_markup())
+			await _safe_edit(callback, "Пока нет отзывов", reply_markup=INFO_ITEM_MARKUP)
 			await _safe_answer(callback)
 			return
 		for r in reviews:
@@ -425,55 +258,41 @@ async def info_item(callback: CallbackQuery) -> None:
 					await callback.message.answer_video(r.file_id, caption=r.caption or "")
 			except Exception:
 				pass
-		await callback.message.answer("Это последние отзывы", reply_markup=info_item_keyboard().as_markup())
+		await callback.message.answer("Это последние отзывы", reply_markup=INFO_ITEM_MARKUP)
 		await _safe_answer(callback)
 		return
 	text = texts.get(key, "Раздел не найден")
-	await _safe_edit(callback, text, reply_markup=info_item_keyboard().as_markup())
+	await _safe_edit(callback, text, reply_markup=INFO_ITEM_MARKUP)
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data == "nav:categories")
+@router.callback("nav:categories")
 async def nav_categories(callback: CallbackQuery) -> None:
-	async with SessionLocal() as session:
-		categories = await _load_categories(session)
-	if not categories:
+	snapshot = await catalog_cache.get()
+	if not snapshot.categories:
 		await _safe_edit(callback, "Категории пока не добавлены.")
 		await _safe_answer(callback)
 		return
-	kb = categories_keyboard_with_nav([(c.id, c.name) for c in categories])
-	await _safe_edit(callback, "Выберите категорию:", reply_markup=kb.as_markup())
+	await _safe_edit(callback, "Выберите категорию:", reply_markup=catalog_menus.categories(snapshot))
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("nav:category:"))
-async def nav_category(callback: CallbackQuery) -> None:
+@router.callback("nav:category:{category_id:int}")
+async def nav_category(callback: CallbackQuery, category_id: int) -> None:
 	# answer early so the spinner stops immediately
 	try:
 		await _safe_answer(callback)
 	except Exception:
 		pass
-	parts = (callback.data or "").split(":")  # type: ignore[union-attr]
-	category_id = int(parts[-1])
-	async with SessionLocal() as session:
-		# Get category name first
-		cat_res = await session.execute(select(Category).where(Category.id == category_id))
-		category = cat_res.scalars().first()
-		if not category:
-			await _safe_edit(callback, "Категория не найдена.")
-			try:
-				await _safe_answer(callback)
-			except TelegramBadRequest:
-				pass
-			return
-		
-		# Get products
-		res = await session.execute(
-			select(Product)
-			.where(Product.category_id == category_id, Product.is_deleted == False)
-			.order_by(Product.title)
-		)
-		products = list(res.scalars().all())
+	snapshot = await catalog_cache.get()
+	if category_id not in snapshot.categories_by_id:
+		await _safe_edit(callback, "Категория не найдена.")
+		try:
+			await _safe_answer(callback)
+		except TelegramBadRequest:
+			pass
+		return
+	products = snapshot.products_in_category(category_id)
 	
 	if not products:
 		await _safe_edit(callback, "В этой категории пока нет товаров.")
@@ -483,62 +302,54 @@ async def nav_category(callback: CallbackQuery) -> None:
 			pass  # Ignore old query errors
 		return
 	
-	from app.bot.keyboards.inline import products_keyboard_with_nav as _kb
-	kb = _kb([(p.id, p.title) for p in products], category_id)
+	kb = catalog_menus.products(snapshot, category_id)
 	# If current message is a photo (product view), always replace with a text message
 	if callback.message.photo:
 		try:
 			await callback.message.delete()
 		except Exception:
 			pass
-		await callback.message.answer("Выберите товар:", reply_markup=kb.as_markup())
+		await callback.message.answer("Выберите товар:", reply_markup=kb)
 	else:
-		await _safe_edit(callback, "Выберите товар:", reply_markup=kb.as_markup())
+		await _safe_edit(callback, "Выберите товар:", reply_markup=kb)
 	try:
 		await _safe_answer(callback)
 	except TelegramBadRequest:
 		pass  # Ignore old query errors
 
 
-async def _load_product(session: AsyncSession, product_id: int) -> Product | None:
-	result = await session.execute(select(Product).where(Product.id == product_id, getattr(Product, "is_deleted", False) == False))
-	return result.scalars().first()
-
-
 # --- Cart view and clear ---
-from app.bot.keyboards.inline import cart_actions_keyboard
 
 
-@router.callback_query(F.data == "cart:view")
-async def cart_view(callback: CallbackQuery) -> None:
+@router.callback("cart:view")
+async def cart_view(callback: CallbackQuery, session: AsyncSession) -> None:
 	user_id = callback.from_user.id  # type: ignore[union-attr]
-	async with SessionLocal() as session:
-		res = await session.execute(select(Order).where(Order.user_id == user_id, Order.status == "new"))
-		order = res.scalars().first()
-		if not order:
-			await _safe_edit(callback, "Корзина пуста", reply_markup=cart_actions_keyboard().as_markup())
-			await _safe_answer(callback)
-			return
+	res = await session.execute(select(Order).where(Order.user_id == user_id, Order.status == "new"))
+	order = res.scalars().first()
+	if not order:
+		await _safe_edit(callback, "Корзина пуста", reply_markup=CART_ACTIONS_MARKUP)
+		await _safe_answer(callback)
+		return
 		
-		# Load order items with products and flavors
-		from app.models.flavor import Flavor
-		res_items = await session.execute(
-			select(OrderItem, Product, Flavor)
-			.join(Product, Product.id == OrderItem.product_id)
-			.outerjoin(Flavor, Flavor.id == OrderItem.flavor_id)
-			.where(OrderItem.order_id == order.id)
-		)
-		pairs = list(res_items.all())
+	# Load order items with products and flavors
+	from app.models.flavor import Flavor
+	res_items = await session.execute(
+		select(OrderItem, Product, Flavor)
+		.join(Product, Product.id == OrderItem.product_id)
+		.outerjoin(Flavor, Flavor.id == OrderItem.flavor_id)
+		.where(OrderItem.order_id == order.id)
+	)
+	pairs = list(res_items.all())
 		
-		# Create list of (OrderItem, Product, Flavor) tuples
-		items_with_flavors = []
-		for item, product, flavor in pairs:
-			if flavor:
-				item.flavor = flavor
-			items_with_flavors.append((item, product))
+	# Create list of (OrderItem, Product, Flavor) tuples
+	items_with_flavors = []
+	for item, product, flavor in pairs:
+		if flavor:
+			item.flavor = flavor
+		items_with_flavors.append((item, product))
 		
-		text = _format_cart(order, items_with_flavors)
-	await _safe_edit(callback, text, reply_markup=cart_actions_keyboard().as_markup())
+	text = _format_cart(order, items_with_flavors)
+	await _safe_edit(callback, text, reply_markup=CART_ACTIONS_MARKUP)
 	await _safe_answer(callback)
 
 
@@ -547,7 +358,7 @@ def _format_cart(order: Order, items: list[tuple[OrderItem, Product]]) -> str:
 	lines: list[str] = ["🛒 <b>КОРЗИНА</b>", ""]
 	
 	for i, (item, product) in enumerate(items, 1):
-		unit = _calc_price(product, item.quantity)
+		unit = unit_price(product, item.quantity)
 		sum_ = unit * item.quantity
 		total += sum_
 		
@@ -575,16 +386,15 @@ def _format_cart(order: Order, items: list[tuple[OrderItem, Product]]) -> str:
 	return "\n".join(lines)
 
 
-@router.callback_query(F.data == "cart:clear")
-async def cart_clear(callback: CallbackQuery) -> None:
+@router.callback("cart:clear")
+async def cart_clear(callback: CallbackQuery, session: AsyncSession) -> None:
 	user_id = callback.from_user.id  # type: ignore[union-attr]
-	async with SessionLocal() as session:
-		res = await session.execute(select(Order.id).where(Order.user_id == user_id, Order.status == "new"))
-		order_id = res.scalars().first()
-		if order_id is not None:
-			await session.execute(delete(OrderItem).where(OrderItem.order_id == order_id))
-			await session.commit()
-	await _safe_edit(callback, "Корзина очищена", reply_markup=cart_actions_keyboard().as_markup())
+	res = await session.execute(select(Order.id).where(Order.user_id == user_id, Order.status == "new"))
+	order_id = res.scalars().first()
+	if order_id is not None:
+		await session.execute(delete(OrderItem).where(OrderItem.order_id == order_id))
+		await session.commit()
+	await _safe_edit(callback, "Корзина очищена", reply_markup=CART_ACTIONS_MARKUP)
 	await _safe_answer(callback)
 
 
@@ -593,7 +403,7 @@ class CheckoutStates(StatesGroup):
 	confirm = State()
 
 
-@router.callback_query(F.data == "cart:checkout")
+@router.callback("cart:checkout")
 async def checkout_start(callback: CallbackQuery, state: FSMContext) -> None:
 	await state.clear()
 	await state.set_state(CheckoutStates.phone)
@@ -618,7 +428,7 @@ async def checkout_phone_contact(message: Message, state: FSMContext) -> None:
 
 
 @router.message(CheckoutStates.phone)
-async def checkout_phone(message: Message, state: FSMContext) -> None:
+async def checkout_phone(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	phone = (message.text or "").strip()
 	if not phone:
 		await message.answer("Введите телефон")
@@ -626,140 +436,190 @@ async def checkout_phone(message: Message, state: FSMContext) -> None:
 	await state.update_data(phone=phone)
 	user_id = message.from_user.id  # type: ignore[union-attr]
 	# save phone to user profile
-	async with SessionLocal() as session:
-		async with session.begin():
-			res = await session.execute(select(User).where(User.id == user_id))
-			u = res.scalars().first()
-			if u:
-				u.first_name = message.from_user.first_name if message.from_user else u.first_name  # type: ignore[union-attr]
-				u.last_name = message.from_user.last_name if message.from_user else u.last_name  # type: ignore[union-attr]
-				u.phone = phone
+	res = await session.execute(select(User).where(User.id == user_id))
+	u = res.scalars().first()
+	if u:
+		u.first_name = message.from_user.first_name if message.from_user else u.first_name  # type: ignore[union-attr]
+		u.last_name = message.from_user.last_name if message.from_user else u.last_name  # type: ignore[union-attr]
+		u.phone = phone
 	await state.set_state(CheckoutStates.confirm)
 	await message.answer("Подтвердите оформление заказа: отправьте 'Да' или 'Нет'", reply_markup=ReplyKeyboardRemove())
 
 
+async def _reserve_stock(session: AsyncSession, rows: list) -> list[int] | None:
+	"""Take tracked stock for every cart line; returns the products that sold out, or None if a line can't be satisfied."""
+	demand: dict[int, int] = {}
+	for row in rows:
+		if row.stock_qty is not None:
+			demand[row.product_id] = demand.get(row.product_id, 0) + int(row.quantity)
+	if any(row.stock_qty is not None and row.stock_qty < demand[row.product_id] for row in rows):
+		return None
+	sold_out: list[int] = []
+	# in id order, so concurrent checkouts lock products in the same order
+	for pid in sorted(demand):
+		qty = demand[pid]
+		left = (await session.execute(
+			update(Product)
+				.where(Product.id == pid, Product.stock_qty >= qty)
+				.values(stock_qty=Product.stock_qty - qty, in_stock=Product.stock_qty - qty > 0)
+				.returning(Product.stock_qty)
+				.execution_options(synchronize_session=False)
+		)).scalar()
+		if left is None:
+			# someone else bought it since the items were read
+			return None
+		if left == 0:
+			sold_out.append(pid)
+	return sold_out
+
+
+async def _checkout_short(message: Message, state: FSMContext, session: AsyncSession, rows: list) -> None:
+	# nothing of this checkout is kept: the order stays in the cart
+	await session.rollback()
+	res = await session.execute(
+		select(Product.id, Product.stock_qty).where(Product.id.in_({row.product_id for row in rows if row.stock_qty is not None}))
+	)
+	left = dict(res.all())
+	demand: dict[int, int] = {}
+	for row in rows:
+		demand[row.product_id] = demand.get(row.product_id, 0) + int(row.quantity)
+	lines = ["Недостаточно товара на складе:"]
+	for pid, title in {row.product_id: row.title for row in rows}.items():
+		if pid in left and left[pid] is not None and left[pid] < demand[pid]:
+			lines.append(f"• {title}: в корзине {demand[pid]}, осталось {left[pid]}")
+	lines.append("")
+	lines.append("Измените количество в корзине и оформите заказ снова")
+	await state.clear()
+	await message.answer("\n".join(lines), reply_markup=MAIN_MENU_MARKUP)
+
+
 @router.message(CheckoutStates.confirm)
-async def checkout_confirm(message: Message, state: FSMContext) -> None:
+async def checkout_confirm(message: Message, state: FSMContext, session: AsyncSession) -> None:
 	if (message.text or "").strip().lower() not in {"да", "yes", "y", "ok"}:
 		await message.answer("Отменено")
 		await state.clear()
 		return
 	data = await state.get_data()
 	user_id = message.from_user.id  # type: ignore[union-attr]
-	async with SessionLocal() as session:
-		# load cart
-		res = await session.execute(select(Order).where(Order.user_id == user_id, Order.status == "new"))
-		order = res.scalars().first()
-		if not order:
-			await message.answer("Корзина пуста")
-			await state.clear()
-			return
-		res_items = await session.execute(
-			select(OrderItem, Product)
-				.join(Product, Product.id == OrderItem.product_id)
-				.where(OrderItem.order_id == order.id)
+	# submit the open cart; the row lock makes a second confirm wait and then find nothing
+	open_cart = (
+		select(Order.id)
+			.where(Order.user_id == user_id, Order.status == "new")
+			.order_by(Order.id)
+			.limit(1)
+			.with_for_update()
+			.scalar_subquery()
+	)
+	order_id = (await session.execute(
+		update(Order)
+			.where(Order.id == open_cart)
+			.values(status="submitted", customer_name=None, customer_phone=data.get("phone"))
+			.returning(Order.id)
+			.execution_options(synchronize_session=False)
+	)).scalar()
+	if order_id is None:
+		await message.answer("Корзина пуста")
+		await state.clear()
+		return
+	from app.models.flavor import Flavor
+	line_total = OrderItem.unit_price * OrderItem.quantity
+	res_items = await session.execute(
+		select(
+			Product.id.label("product_id"),
+			Product.title,
+			Product.stock_qty,
+			Flavor.name.label("flavor"),
+			OrderItem.quantity,
+			OrderItem.unit_price,
+			line_total.label("line_total"),
+			func.sum(line_total).over().label("order_total"),
 		)
-		pairs = list(res_items.all())
-		if not pairs:
-			await message.answer("Корзина пуста")
-			await state.clear()
-			return
-		order.status = "submitted"
-		order.customer_name = None  # type: ignore[assignment]
-		order.customer_phone = data.get("phone")  # type: ignore[assignment]
-		await session.commit()
-	await state.clear()
-	from app.bot.keyboards.inline import main_menu_keyboard as _main_kb
-	await message.answer("Заказ оформлен ✅", reply_markup=_main_kb(is_admin=False).as_markup())
+			.join(Product, Product.id == OrderItem.product_id)
+			.outerjoin(Flavor, Flavor.id == OrderItem.flavor_id)
+			.where(OrderItem.order_id == order_id)
+			.order_by(OrderItem.id)
+	)
+	rows = list(res_items.all())
+	if not rows:
+		await session.rollback()
+		await message.answer("Корзина пуста")
+		await state.clear()
+		return
+	sold_out = await _reserve_stock(session, rows)
+	if sold_out is None:
+		await _checkout_short(message, state, session, rows)
+		return
 
 	# Build manager-friendly summary
 	client_name = (message.from_user.first_name or "") if message.from_user else ""
 	client_last = (message.from_user.last_name or "") if message.from_user else ""
 	fullname = (client_name + (" " + client_last if client_last else "")).strip() or "Клиент"
 
-	# Reload items with optional flavor for nicer formatting
-	from app.models.flavor import Flavor
-	async with SessionLocal() as session:
-		res_items = await session.execute(
-			select(OrderItem, Product, Flavor)
-				.join(Product, Product.id == OrderItem.product_id)
-				.outerjoin(Flavor, Flavor.id == OrderItem.flavor_id)
-				.where(OrderItem.order_id == order.id)
-		)
-		triples = list(res_items.all())
-
-	total_sum = 0.0
 	text_lines: list[str] = [
-		f"🆕 <b>Новый заказ #{order.id}</b>",
+		f"🆕 <b>Новый заказ #{order_id}</b>",
 		"",
 		f"👤 Клиент: {fullname} (id: {user_id})",
 		f"📞 Телефон: {data.get('phone')}",
 		"",
 		"📦 <b>Товары</b>:",
 	]
-	for idx, (item, product, flavor) in enumerate(triples, 1):
-		unit = float(item.unit_price)
-		sum_ = unit * int(item.quantity)
-		total_sum += sum_
-		text_lines.append(f"<b>{idx}.</b> {product.title}")
-		if flavor:
-			text_lines.append(f"   🍃 Вкус: {flavor.name}")
-		text_lines.append(f"   Кол-во: {item.quantity}")
-		text_lines.append(f"   Цена за шт: {unit:.2f}")
-		text_lines.append(f"   Сумма: {sum_:.2f}")
-		if idx < len(triples):
+	for idx, row in enumerate(rows, 1):
+		text_lines.append(f"<b>{idx}.</b> {row.title}")
+		if row.flavor:
+			text_lines.append(f"   🍃 Вкус: {row.flavor}")
+		text_lines.append(f"   Кол-во: {row.quantity}")
+		text_lines.append(f"   Цена за шт: {float(row.unit_price):.2f}")
+		text_lines.append(f"   Сумма: {float(row.line_total):.2f}")
+		if idx < len(rows):
 			text_lines.append("")
 	text_lines.append("")
 	text_lines.append("━━━━━━━━━━━━━━━━━━━━━━━━━━")
-	text_lines.append(f"<b>ИТОГО: {total_sum:.2f}</b>")
+	text_lines.append(f"<b>ИТОГО: {float(rows[0].order_total):.2f}</b>")
 	text = "\n".join(text_lines)
-	from app.models.manager import Manager
-	async with SessionLocal() as session:
-		res = await session.execute(select(Manager.user_id))
-		manager_ids = [row[0] for row in res.all()]
+	manager_ids = list(await roles.managers(session))
 	if not manager_ids and getattr(settings, "manager_chat_id", None):
 		manager_ids = [int(settings.manager_chat_id)]
 	from app.bot.keyboards.inline import manager_order_keyboard
-	kb = manager_order_keyboard(user_id)
+	kb = manager_order_keyboard(user_id).as_markup()
+	# notifications commit with the order and are delivered in the background
 	for mid in manager_ids:
-		try:
-			await message.bot.send_message(mid, text, reply_markup=kb.as_markup())
-		except Exception:
-			pass
-
-
-@router.callback_query(F.data.startswith("flavor:select:"))
-async def flavor_select(callback: CallbackQuery) -> None:
-	# data format: flavor:select:<product_id>:<qty>
-	parts = (callback.data or "").split(":")
-	product_id = int(parts[2])
-	qty = int(parts[3]) if len(parts) > 3 else 1
-	
-	async with SessionLocal() as session:
-		product = await _load_product(session, product_id)
-		if not product:
-			await _safe_edit(callback, "Товар не найден.")
-			await _safe_answer(callback)
-			return
-		
-		# Get available flavors
-		from app.models.flavor import Flavor
-		flavors_res = await session.execute(select(Flavor).where(Flavor.product_id == product_id, Flavor.is_available == True))
-		flavors = list(flavors_res.scalars().all())
-		
-		if not flavors:
-			await _safe_edit(callback, "Вкусы не найдены.")
-			await _safe_answer(callback)
-			return
+		outbox_enqueue(session, mid, text, reply_markup=kb)
+	await session.commit()
+	outbox.wake()
+	if sold_out:
+		await invalidation_bus.publish(*(ChangeEvent("product", pid) for pid in sold_out))
+	await state.clear()
+	await message.answer("Заказ оформлен ✅", reply_markup=MAIN_MENU_MARKUP)
+
+
+@router.callback("flavor:select:{product_id:int}:{qty:int}")
+async def flavor_select(
+	callback: CallbackQuery,
+	product_id: int,
+	qty: int,
+	product: ProductItem | None = None,
+	catalog_version: int | None = None,
+) -> None:
+	product = await _product(product_id, product, catalog_version)
+	if not product:
+		await _safe_edit(callback, "Товар не найден.")
+		await _safe_answer(callback)
+		return
+	if not product.flavors:
+		await _safe_edit(callback, "Вкусы не найдены.")
+		await _safe_answer(callback)
+		return
 	
 	# Create flavor selection keyboard
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
 	from aiogram.types import InlineKeyboardButton
 	
 	builder = InlineKeyboardBuilder()
-	for flavor in flavors:
+	version = catalog_cache.version_of(product)
+	for flavor in product.flavors:
 		# Pass current quantity to preserve it when selecting flavor
-		builder.row(InlineKeyboardButton(text=f"🍃 {flavor.name}", callback_data=f"flavor:choose:{product_id}:{flavor.id}:{qty}"))
+		data = callback_tokens.pack(f"flavor:choose:{product_id}:{flavor.id}:{qty}", product=product, flavor=flavor, catalog_version=version)
+		builder.row(InlineKeyboardButton(text=f"🍃 {flavor.name}", callback_data=data))
 	
 	builder.row(InlineKeyboardButton(text="⬅️ Назад к товару", callback_data=f"product:{product_id}"))
 	
@@ -767,34 +627,30 @@ async def flavor_select(callback: CallbackQuery) -> None:
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("flavor:choose:"))
-async def flavor_choose(callback: CallbackQuery) -> None:
-	# data format: flavor:choose:<product_id>:<flavor_id>:<qty>
-	parts = (callback.data or "").split(":")
-	product_id = int(parts[2])
-	flavor_id = int(parts[3])
-	qty = int(parts[4]) if len(parts) > 4 else 1
-	
-	async with SessionLocal() as session:
-		# Get product and flavor
-		product = await _load_product(session, product_id)
-		from app.models.flavor import Flavor
-		flavor_res = await session.execute(select(Flavor).where(Flavor.id == flavor_id, Flavor.product_id == product_id))
-		flavor = flavor_res.scalars().first()
-		
-		if not product or not flavor:
-			await callback.answer("Товар или вкус не найден", show_alert=True)
-			return
+@router.callback("flavor:choose:{product_id:int}:{flavor_id:int}:{qty:int}")
+async def flavor_choose(
+	callback: CallbackQuery,
+	product_id: int,
+	flavor_id: int,
+	qty: int,
+	product: ProductItem | None = None,
+	flavor: FlavorItem | None = None,
+	catalog_version: int | None = None,
+) -> None:
+	product, flavor = await _product_flavor(product_id, flavor_id, product, flavor, catalog_version)
+	if not product or not flavor:
+		await callback.answer("Товар или вкус не найден", show_alert=True)
+		return
 	
 	# Show product with selected flavor and quantity controls
-	text_lines = _product_with_flavor_text(product, flavor, qty)
-	kb = flavor_selection_keyboard(product_id, flavor_id, qty=qty, enabled=getattr(product, "in_stock", True))
+	card = card_cache.get(product)
+	text, kb = card.flavor_text(flavor), card.flavor_markup(flavor, qty)
 	
 	# Check if message has photo or just text
 	if callback.message.photo:
 		# If message has photo, update caption
 		try:
-			await callback.message.edit_caption(caption="\n".join(text_lines), reply_markup=kb.as_markup())
+			await callback.message.edit_caption(caption=text, reply_markup=kb)
 		except TelegramBadRequest:
 			# If edit_caption fails, try to send new photo message
 			try:
@@ -804,11 +660,11 @@ async def flavor_choose(callback: CallbackQuery) -> None:
 				await callback.message.bot.send_photo(
 					chat_id=callback.message.chat.id,
 					photo=photo_to_use, 
-					caption="\n".join(text_lines), 
-					reply_markup=kb.as_markup()
+					caption=text, 
+					reply_markup=kb
 				)
 			except Exception:
-				await _safe_edit(callback, "\n".join(text_lines), reply_markup=kb.as_markup())
+				await _safe_edit(callback, text, reply_markup=kb)
 	else:
 		# If message is just text, but product has photo, send photo message
 		if product.photo_file_id:
@@ -817,137 +673,61 @@ async def flavor_choose(callback: CallbackQuery) -> None:
 				await callback.message.bot.send_photo(
 					chat_id=callback.message.chat.id,
 					photo=product.photo_file_id, 
-					caption="\n".join(text_lines), 
-					reply_markup=kb.as_markup()
+					caption=text, 
+					reply_markup=kb
 				)
 			except Exception:
-				await _safe_edit(callback, "\n".join(text_lines), reply_markup=kb.as_markup())
+				await _safe_edit(callback, text, reply_markup=kb)
 		else:
 			# If message is just text, update text
-			await _safe_edit(callback, "\n".join(text_lines), reply_markup=kb.as_markup())
+			await _safe_edit(callback, text, reply_markup=kb)
 	
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("flavor:qty:"))
-async def flavor_qty_change(callback: CallbackQuery) -> None:
-	# data: flavor:qty:<inc|dec>:<product_id>:<flavor_id>:<qty>
-	parts = (callback.data or "").split(":")
-	action = parts[2]
-	product_id = int(parts[3])
-	flavor_id = int(parts[4])
-	qty = int(parts[5])
-	
-	if action == "inc":
-		qty += 1
-	elif action == "dec":
-		qty = max(1, qty - 1)
-	
-	async with SessionLocal() as session:
-		product = await _load_product(session, product_id)
-		from app.models.flavor import Flavor
-		flavor_res = await session.execute(select(Flavor).where(Flavor.id == flavor_id, Flavor.product_id == product_id))
-		flavor = flavor_res.scalars().first()
-		
-		if not product or not flavor:
-			await callback.answer("Товар или вкус не найден", show_alert=True)
-			return
-	
-	# Update keyboard with new quantity
-	text_lines = _product_with_flavor_text(product, flavor, qty)
-	kb = flavor_selection_keyboard(product_id, flavor_id, qty=qty, enabled=getattr(product, "in_stock", True))
-	
-	# Check if message has photo or just text
-	if callback.message.photo:
-		# If message has photo, update caption
-		try:
-			await callback.message.edit_caption(caption="\n".join(text_lines), reply_markup=kb.as_markup())
-		except TelegramBadRequest:
-			# If edit_caption fails, try to send new photo message
-			try:
-				await callback.message.delete()
-				# Use product photo if available, otherwise use current message photo
-				photo_to_use = product.photo_file_id if product.photo_file_id else callback.message.photo[-1].file_id
-				await callback.message.bot.send_photo(
-					chat_id=callback.message.chat.id,
-					photo=photo_to_use, 
-					caption="\n".join(text_lines), 
-					reply_markup=kb.as_markup()
-				)
-			except Exception:
-				await _safe_edit(callback, "\n".join(text_lines), reply_markup=kb.as_markup())
-	else:
-		# If message is just text, update text
-		try:
-			await callback.message.edit_text("\n".join(text_lines), reply_markup=kb.as_markup())
-		except TelegramBadRequest:
-			await _safe_edit(callback, "\n".join(text_lines), reply_markup=kb.as_markup())
-	
+@router.callback("flavor:qty:{action}:{product_id:int}:{flavor_id:int}:{qty:int}")
+async def flavor_qty_change(
+	callback: CallbackQuery,
+	action: str,
+	product_id: int,
+	flavor_id: int,
+	qty: int,
+	product: ProductItem | None = None,
+	flavor: FlavorItem | None = None,
+	catalog_version: int | None = None,
+) -> None:
+	# served from the catalog snapshot: only the keyboard changes, coalesced per message
+	product, flavor = await _product_flavor(product_id, flavor_id, product, flavor, catalog_version)
+	if not product or not flavor:
+		await callback.answer("Товар или вкус не найден", show_alert=True)
+		return
+	card = card_cache.get(product)
+	stepper.step(callback, action, qty, lambda q: card.flavor_markup(flavor, q))
 	await _safe_answer(callback)
 
 
-@router.callback_query(F.data.startswith("flavor:add:"))
-async def flavor_add_to_cart(callback: CallbackQuery) -> None:
-	# data format: flavor:add:<product_id>:<flavor_id>:<qty>
-	parts = (callback.data or "").split(":")
-	product_id = int(parts[2])
-	flavor_id = int(parts[3])
-	qty = int(parts[4]) if len(parts) > 4 else 1
+@router.callback("flavor:add:{product_id:int}:{flavor_id:int}:{qty:int}")
+async def flavor_add_to_cart(
+	callback: CallbackQuery,
+	session: AsyncSession,
+	product_id: int,
+	flavor_id: int,
+	qty: int,
+	product: ProductItem | None = None,
+	flavor: FlavorItem | None = None,
+	catalog_version: int | None = None,
+) -> None:
+	
+	product, flavor = await _product_flavor(product_id, flavor_id, product, flavor, catalog_version)
+	if not product or not flavor:
+		await callback.answer("Товар или вкус не найден", show_alert=True)
+		return
 	
-	async with SessionLocal() as session:
-		# Get product and flavor
-		product = await _load_product(session, product_id)
-		from app.models.flavor import Flavor
-		flavor_res = await session.execute(select(Flavor).where(Flavor.id == flavor_id, Flavor.product_id == product_id))
-		flavor = flavor_res.scalars().first()
-		
-		if not product or not flavor:
-			await callback.answer("Товар или вкус не найден", show_alert=True)
-			return
-		
-		# Add to cart with flavor
-		user_id = callback.from_user.id
-		
-		# Check if user exists, create if not
-		res_user = await session.execute(select(User).where(User.id == user_id))
-		if res_user.scalars().first() is None:
-			session.add(User(id=user_id))
-			await session.flush()
-		
-		# Get or create order
-		result = await session.execute(
-			select(Order).where(Order.user_id == user_id, Order.status == "new")
-		)
-		order = result.scalars().first()
-		if not order:
-			order = Order(user_id=user_id, status="new")
-			session.add(order)
-			await session.flush()
-		
-		# Check if item with same product and flavor already exists
-		item_res = await session.execute(
-			select(OrderItem).where(
-				OrderItem.order_id == order.id, 
-				OrderItem.product_id == product_id,
-				OrderItem.flavor_id == flavor_id
-			)
-		)
-		item = item_res.scalars().first()
-		
-		if item:
-			item.quantity += qty
-		else:
-			unit = _calc_price(product, qty)
-			item = OrderItem(
-				order_id=order.id, 
-				product_id=product_id, 
-				flavor_id=flavor_id,
-				quantity=qty, 
-				unit_price=unit
-			)
-			session.add(item)
-		
-		await session.commit()
+	added = await add_to_cart(session, callback.from_user.id, product_id, flavor_id, qty)
+	await session.commit()
+	if added is None:
+		await callback.answer("Товар или вкус не найден", show_alert=True)
+		return
 	
 	# Show confirmation message
 	from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -1,5 +1,10 @@
+from typing import Any, Iterable, NoReturn
+
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.types import InlineKeyboardButton
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import ConfigDict
+
+from app.bot.callback_tokens import callback_tokens
 
 
 def catalog_keyboard() -> InlineKeyboardBuilder:
@@ -9,20 +14,6 @@ def catalog_keyboard() -> InlineKeyboardBuilder:
 
 
 
-def product_qty_keyboard(product_id: int, qty: int = 1, enabled: bool = True) -> InlineKeyboardBuilder:
-	builder = InlineKeyboardBuilder()
-	builder.row(
-		InlineKeyboardButton(text="➖", callback_data=f"qty:dec:{product_id}:{qty}"),
-		InlineKeyboardButton(text=f"{qty}", callback_data="noop"),
-		InlineKeyboardButton(text="➕", callback_data=f"qty:inc:{product_id}:{qty}"),
-	)
-	btn_text = "🛒 В корзину" if enabled else "❌ Нет в наличии"
-	btn_cb = f"cart:add:{product_id}:{qty}" if enabled else "noop"
-	builder.row(InlineKeyboardButton(text=btn_text, callback_data=btn_cb))
-	return builder
-
-
-
 def categories_keyboard(categories: list[tuple[int, str]]) -> InlineKeyboardBuilder:
 	builder = InlineKeyboardBuilder()
 	for category_id, category_name in categories:
@@ -114,61 +105,94 @@ def products_keyboard_with_nav(products: list[tuple[int, str]], category_id: int
 
 
 
-def product_view_keyboard(product_id: int, category_id: int | None, qty: int = 1, enabled: bool = True, has_flavors: bool = False) -> InlineKeyboardBuilder:
-	builder = InlineKeyboardBuilder()
-	
-	# Add quantity controls
-	builder.row(
-		InlineKeyboardButton(text="➖", callback_data=f"qty:dec:{product_id}:{qty}"),
-		InlineKeyboardButton(text=f"{qty}", callback_data="noop"),
-		InlineKeyboardButton(text="➕", callback_data=f"qty:inc:{product_id}:{qty}"),
-	)
+def product_stepper_rows(
+	product_id: int,
+	qty: int,
+	enabled: bool = True,
+	has_flavors: bool = False,
+	qty_label: str | None = None,
+	context: dict[str, Any] | None = None,
+) -> list[list[InlineKeyboardButton]]:
+	"""Rows of the product card that depend on the quantity; ``context`` goes with every token."""
+	context = context or {}
+	rows = [[
+		InlineKeyboardButton(text="➖", callback_data=callback_tokens.pack(f"qty:dec:{product_id}:{qty}", **context)),
+		InlineKeyboardButton(text=qty_label or f"{qty}", callback_data="noop"),
+		InlineKeyboardButton(text="➕", callback_data=callback_tokens.pack(f"qty:inc:{product_id}:{qty}", **context)),
+	]]
 	
 	# If product has flavors, show flavor selection first and disable add to cart
 	if has_flavors:
-		builder.row(InlineKeyboardButton(text="🍃 Выбрать вкус", callback_data=f"flavor:select:{product_id}:{qty}"))
+		rows.append([InlineKeyboardButton(text="🍃 Выбрать вкус", callback_data=callback_tokens.pack(f"flavor:select:{product_id}:{qty}", **context))])
 		# Add to cart button is disabled until flavor is selected
-		builder.row(InlineKeyboardButton(text="❌ Сначала выберите вкус", callback_data="noop"))
+		rows.append([InlineKeyboardButton(text="❌ Сначала выберите вкус", callback_data="noop")])
 	else:
 		# Standard add to cart button for products without flavors
 		btn_text = "🛒 В корзину" if enabled else "❌ Нет в наличии"
-		btn_cb = f"cart:add:{product_id}:{qty}" if enabled else "noop"
-		builder.row(InlineKeyboardButton(text=btn_text, callback_data=btn_cb))
-	
+		btn_cb = callback_tokens.pack(f"cart:add:{product_id}:{qty}", **context) if enabled else "noop"
+		rows.append([InlineKeyboardButton(text=btn_text, callback_data=btn_cb)])
+	return rows
+
+
+def product_nav_row(category_id: int | None) -> list[InlineKeyboardButton]:
 	if category_id is not None:
-		builder.row(
+		return [
 			InlineKeyboardButton(text="⬅️ К товарам", callback_data=f"nav:category:{category_id}"),
 			InlineKeyboardButton(text="🏠 Главная", callback_data="nav:home"),
-		)
-	else:
-		builder.row(
-			InlineKeyboardButton(text="⬅️ К категориям", callback_data="nav:categories"),
-			InlineKeyboardButton(text="🏠 Главная", callback_data="nav:home"),
-		)
+		]
+	return [
+		InlineKeyboardButton(text="⬅️ К категориям", callback_data="nav:categories"),
+		InlineKeyboardButton(text="🏠 Главная", callback_data="nav:home"),
+	]
+
+
+def product_view_keyboard(product_id: int, category_id: int | None, qty: int = 1, enabled: bool = True, has_flavors: bool = False, qty_label: str | None = None) -> InlineKeyboardBuilder:
+	builder = InlineKeyboardBuilder()
+	for row in product_stepper_rows(product_id, qty, enabled, has_flavors, qty_label):
+		builder.row(*row)
+	builder.row(*product_nav_row(category_id))
 	return builder
 
 
 
-def flavor_selection_keyboard(product_id: int, flavor_id: int, qty: int = 1, enabled: bool = True) -> InlineKeyboardBuilder:
-	builder = InlineKeyboardBuilder()
-	
+def flavor_stepper_rows(
+	product_id: int,
+	flavor_id: int,
+	qty: int,
+	enabled: bool = True,
+	qty_label: str | None = None,
+	context: dict[str, Any] | None = None,
+) -> list[list[InlineKeyboardButton]]:
+	"""Rows of the product-with-flavor card that depend on the quantity; ``context`` goes with every token."""
+	context = context or {}
 	# Add quantity controls
-	builder.row(
-		InlineKeyboardButton(text="➖", callback_data=f"flavor:qty:dec:{product_id}:{flavor_id}:{qty}"),
-		InlineKeyboardButton(text=f"{qty}", callback_data="noop"),
-		InlineKeyboardButton(text="➕", callback_data=f"flavor:qty:inc:{product_id}:{flavor_id}:{qty}"),
-	)
+	rows = [[
+		InlineKeyboardButton(text="➖", callback_data=callback_tokens.pack(f"flavor:qty:dec:{product_id}:{flavor_id}:{qty}", **context)),
+		InlineKeyboardButton(text=qty_label or f"{qty}", callback_data="noop"),
+		InlineKeyboardButton(text="➕", callback_data=callback_tokens.pack(f"flavor:qty:inc:{product_id}:{flavor_id}:{qty}", **context)),
+	]]
 	
 	# Add to cart button with flavor
 	btn_text = "🛒 В корзину" if enabled else "❌ Нет в наличии"
-	btn_cb = f"flavor:add:{product_id}:{flavor_id}:{qty}" if enabled else "noop"
-	builder.row(InlineKeyboardButton(text=btn_text, callback_data=btn_cb))
+	btn_cb = callback_tokens.pack(f"flavor:add:{product_id}:{flavor_id}:{qty}", **context) if enabled else "noop"
+	rows.append([InlineKeyboardButton(text=btn_text, callback_data=btn_cb)])
 	
 	# Change flavor button
-	builder.row(InlineKeyboardButton(text="🍃 Изменить вкус", callback_data=f"flavor:select:{product_id}:{qty}"))
+	rows.append([InlineKeyboardButton(text="🍃 Изменить вкус", callback_data=callback_tokens.pack(f"flavor:select:{product_id}:{qty}", **context))])
+	return rows
+
+
+def flavor_back_row(product_id: int) -> list[InlineKeyboardButton]:
+	return [InlineKeyboardButton(text="⬅️ Назад к товару", callback_data=f"product:{product_id}")]
+
+
+def flavor_selection_keyboard(product_id: int, flavor_id: int, qty: int = 1, enabled: bool = True, qty_label: str | None = None) -> InlineKeyboardBuilder:
+	builder = InlineKeyboardBuilder()
+	for row in flavor_stepper_rows(product_id, flavor_id, qty, enabled, qty_label):
+		builder.row(*row)
 	
 	# Back to product button
-	builder.row(InlineKeyboardButton(text="⬅️ Назад к товару", callback_data=f"product:{product_id}"))
+	builder.row(*flavor_back_row(product_id))
 	
 	return builder
 
@@ -210,6 +234,7 @@ def admin_product_edit_keyboard(product_id: int) -> InlineKeyboardBuilder:
 	)
 	builder.row(
 		InlineKeyboardButton(text="🏷 Категория", callback_data=f"admin:edit:category:{product_id}"),
+		InlineKeyboardButton(text="📦 Остаток", callback_data=f"admin:edit:stock:{product_id}"),
 	)
 	builder.row(
 		InlineKeyboardButton(text="🍃 Вкусы", callback_data=f"admin:edit:flavors:{product_id}"),
@@ -289,3 +314,53 @@ def admin_flavors_keyboard(product_id: int, flavors: list) -> InlineKeyboardBuil
 	)
 	
 	return builder
+
+
+
+class _ReadOnlyList(list):
+	def _read_only(self, *args: Any, **kwargs: Any) -> NoReturn:
+		raise TypeError("shared keyboards are read-only, build a new one instead")
+
+	append = extend = insert = remove = pop = clear = sort = reverse = _read_only
+	__setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+	def __reduce_ex__(self, protocol: Any) -> Any:
+		# copies (e.g. model_copy(deep=True)) are plain, editable lists
+		return list, (list(self),)
+
+
+class _FrozenButton(InlineKeyboardButton):
+	model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+	model_config = ConfigDict(frozen=True)
+
+
+def freeze_row(row: Iterable[InlineKeyboardButton]) -> list[InlineKeyboardButton]:
+	return _ReadOnlyList(
+		button if isinstance(button, _FrozenButton) else _FrozenButton.model_construct(button.model_fields_set, **dict(button))
+		for button in row
+	)
+
+
+def freeze(markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+	"""Read-only copy of ``markup`` to share between updates: changing its rows or buttons raises."""
+	return FrozenInlineKeyboardMarkup.model_construct(
+		inline_keyboard=_ReadOnlyList(freeze_row(row) for row in markup.inline_keyboard)
+	)
+
+
+# Keyboards without per-request data are built once, at import, and shared by
+# every update; they are frozen, so a handler can't change them for everyone.
+CATALOG_MARKUP = freeze(catalog_keyboard().as_markup())
+MAIN_MENU_MARKUP = freeze(main_menu_keyboard(is_admin=False).as_markup())
+ADMIN_MAIN_MENU_MARKUP = freeze(main_menu_keyboard(is_admin=True).as_markup())
+ADMIN_MENU_MARKUP = freeze(admin_menu_keyboard().as_markup())
+CART_ACTIONS_MARKUP = freeze(cart_actions_keyboard().as_markup())
+INFO_MENU_MARKUP = freeze(info_menu_keyboard().as_markup())
+INFO_ITEM_MARKUP = freeze(info_item_keyboard().as_markup())
+
+
+def main_menu_markup(is_admin: bool) -> InlineKeyboardMarkup:
+	return ADMIN_MAIN_MENU_MARKUP if is_admin else MAIN_MENU_MARKUP
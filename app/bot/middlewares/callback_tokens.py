@@ -0,0 +1,38 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, TelegramObject
+
+from app.bot.callback_tokens import CallbackTokenStore, is_token
+
+
+class CallbackTokenMiddleware(BaseMiddleware):
+	"""Outer callback_query middleware that expands ``~token`` callback data.
+
+	Puts the stored data in ``callback_payload``, which ``CallbackRouter``
+	routes on instead of ``callback.data``, and the stored context into the
+	handler data. An unknown or expired token is answered here and not routed.
+	"""
+
+	def __init__(self, store: CallbackTokenStore) -> None:
+		self._store = store
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		if not isinstance(event, CallbackQuery) or not is_token(event.data):
+			return await handler(event, data)
+		entry = self._store.resolve(event.data)  # type: ignore[arg-type]
+		if entry is None:
+			try:
+				await event.answer("Кнопка устарела, откройте меню заново", show_alert=True)
+			except TelegramBadRequest:
+				pass
+			return None
+		data["callback_payload"] = entry.data
+		data.update(entry.context)
+		return await handler(event, data)
@@ -0,0 +1,37 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class DbSessionMiddleware(BaseMiddleware):
+	"""Lends one ``AsyncSession`` per update to handlers as ``session``.
+
+	The session only checks out a connection on its first statement, so updates
+	served from caches never touch the pool. The transaction is committed when the
+	handler returns and rolled back if it raises. Handlers that must make a write
+	visible before talking to Telegram or publishing an invalidation event call
+	``session.commit()`` themselves; the session simply autobegins again if used
+	afterwards.
+	"""
+
+	def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+		self._session_factory = session_factory
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		async with self._session_factory() as session:
+			data["session"] = session
+			try:
+				result = await handler(event, data)
+			except Exception:
+				await session.rollback()
+				raise
+			if session.in_transaction():
+				await session.commit()
+			return result
@@ -0,0 +1,30 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.bot.fsm_storage import SqlStorage
+
+
+class FsmBatchMiddleware(BaseMiddleware):
+	"""Stores the FSM writes an update makes once its handler is done, one statement per key.
+
+	Registered before ``DbSessionMiddleware``, so a state change is stored after
+	the update's transaction commits. Writes made before a handler raised are
+	still stored, as they would be with the in-memory storage.
+	"""
+
+	def __init__(self, storage: SqlStorage) -> None:
+		self._storage = storage
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		token = self._storage.batch()
+		try:
+			return await handler(event, data)
+		finally:
+			await self._storage.flush(token)
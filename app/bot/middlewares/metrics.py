@@ -0,0 +1,110 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.pool import prometheus_lines as pool_lines
+from app.utils.metrics import registry
+
+
+STATEMENT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32)
+
+UPDATES_IN_FLIGHT = registry.gauge("bot_updates_in_flight", "Updates accepted but not finished (queue depth)")
+UPDATE_DURATION = registry.histogram("bot_update_duration_seconds", "Time to process one update", ["update_type"])
+UPDATE_ERRORS = registry.counter("bot_update_errors_total", "Updates whose handler raised", ["update_type"])
+UPDATE_STATEMENTS = registry.histogram(
+	"bot_db_statements_per_update", "DB statements executed while processing one update", ["update_type"], STATEMENT_BUCKETS
+)
+HANDLER_DURATION = registry.histogram("bot_handler_duration_seconds", "Handler latency", ["handler"])
+DB_STATEMENTS = registry.counter("db_statements_total", "DB statements executed")
+
+
+class UpdateStats:
+	__slots__ = ("statements", "handler")
+
+	def __init__(self) -> None:
+		self.statements = 0
+		self.handler: str | None = None
+
+
+# set for the duration of an update; SQLAlchemy runs statements in the same context
+current_update: ContextVar[UpdateStats | None] = ContextVar("current_update", default=None)
+
+
+def handler_name(data: dict[str, Any]) -> str:
+	handler: HandlerObject | None = data.get("handler")
+	if handler is None:
+		return "unknown"
+	router = data.get("event_router")
+	prefix = f"{router.name}:" if router is not None else ""
+	return prefix + getattr(handler.callback, "__name__", repr(handler.callback))
+
+
+def _count_statement(*_args) -> None:
+	DB_STATEMENTS.inc()
+	stats = current_update.get()
+	if stats is not None:
+		stats.statements += 1
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+	"""Outer update middleware: in-flight gauge, update latency, DB statements per update."""
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+		stats = UpdateStats()
+		token = current_update.set(stats)
+		UPDATES_IN_FLIGHT.inc()
+		started = time.perf_counter()
+		try:
+			return await handler(event, data)
+		except Exception:
+			UPDATE_ERRORS.inc(update_type=update_type)
+			raise
+		finally:
+			UPDATE_DURATION.observe(time.perf_counter() - started, update_type=update_type)
+			UPDATE_STATEMENTS.observe(stats.statements, update_type=update_type)
+			UPDATES_IN_FLIGHT.dec()
+			current_update.reset(token)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+	"""Inner middleware: latency of the handler that matched, labelled router:function."""
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		name = handler_name(data)
+		stats = current_update.get()
+		if stats is not None:
+			stats.handler = name
+		started = time.perf_counter()
+		try:
+			return await handler(event, data)
+		finally:
+			HANDLER_DURATION.observe(time.perf_counter() - started, handler=name)
+
+
+def setup_metrics(dp: Dispatcher, engine: AsyncEngine) -> None:
+	dp.update.outer_middleware(UpdateMetricsMiddleware())
+	handler_metrics = HandlerMetricsMiddleware()
+	for name, observer in dp.observers.items():
+		if name not in ("update", "error"):
+			# inner middlewares on the dispatcher also wrap handlers of included routers
+			observer.middleware(handler_metrics)
+	if not event.contains(engine.sync_engine, "before_cursor_execute", _count_statement):
+		event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+		registry.collector(lambda: pool_lines(engine))
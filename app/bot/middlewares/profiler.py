@@ -0,0 +1,51 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+
+from app.bot.middlewares.metrics import handler_name
+from app.db.profiler import QueryProfiler, current_profile
+
+
+class SqlProfilerMiddleware(BaseMiddleware):
+	"""Outer update middleware: opens a profile for the update and closes it into the report."""
+
+	def __init__(self, profiler: QueryProfiler) -> None:
+		self._profiler = profiler
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		profile = self._profiler.begin()
+		token = current_profile.set(profile)
+		try:
+			return await handler(event, data)
+		finally:
+			current_profile.reset(token)
+			self._profiler.end(profile)
+
+
+class ProfilerHandlerMiddleware(BaseMiddleware):
+	"""Inner middleware: names the profile after the handler that matched."""
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		profile = current_profile.get()
+		if profile is not None:
+			profile.handler = handler_name(data)
+		return await handler(event, data)
+
+
+def setup_profiler(dp: Dispatcher, profiler: QueryProfiler) -> None:
+	dp.update.outer_middleware(SqlProfilerMiddleware(profiler))
+	tagger = ProfilerHandlerMiddleware()
+	for name, observer in dp.observers.items():
+		if name not in ("update", "error"):
+			observer.middleware(tagger)
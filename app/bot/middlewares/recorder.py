@@ -0,0 +1,71 @@
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+from loguru import logger
+
+from app.bot.middlewares.metrics import current_update
+
+
+class UpdateRecorderMiddleware(BaseMiddleware):
+	"""Outer update middleware that appends every update to a JSONL file.
+
+	One line per update: arrival time ``t`` (unix seconds), the raw ``update``,
+	the handler that served it, its latency ``ms`` and the exception class in
+	``error``, so ``scripts/replay_updates.py`` can replay the traffic and
+	compare against production. Lines are written when the update finishes;
+	the replay orders them by ``t``. Writes are buffered and flushed at most
+	once per ``flush_interval`` seconds.
+	"""
+
+	def __init__(self, path: str, flush_interval: float = 1.0) -> None:
+		self._file = open(path, "a", encoding="utf-8")
+		self._flush_interval = flush_interval
+		self._flushed_at = time.monotonic()
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		arrived = time.time()
+		started = time.perf_counter()
+		error = None
+		try:
+			return await handler(event, data)
+		except Exception as e:
+			error = type(e).__name__
+			raise
+		finally:
+			stats = current_update.get()
+			self._write({
+				"t": round(arrived, 3),
+				"update": event.model_dump(mode="json", exclude_none=True, by_alias=True),
+				"handler": stats.handler if stats is not None else None,
+				"ms": round((time.perf_counter() - started) * 1000, 3),
+				"error": error,
+			})
+
+	def _write(self, record: dict) -> None:
+		try:
+			self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+			now = time.monotonic()
+			if now - self._flushed_at >= self._flush_interval:
+				self._file.flush()
+				self._flushed_at = now
+		except Exception as e:
+			logger.warning("Failed to record update: {}", e)
+
+	async def close(self) -> None:
+		self._file.close()
+
+
+def setup_recorder(dp: Dispatcher, path: str) -> UpdateRecorderMiddleware:
+	recorder = UpdateRecorderMiddleware(path)
+	dp.update.outer_middleware(recorder)
+	dp.shutdown.register(recorder.close)
+	logger.info("Recording updates to {}", path)
+	return recorder
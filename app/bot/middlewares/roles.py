@@ -0,0 +1,32 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from app.bot.services.roles import RoleService
+
+
+class RoleMiddleware(BaseMiddleware):
+	"""Puts ``is_admin`` and ``is_manager`` for the update's user into handler data.
+
+	Registered after ``DbSessionMiddleware``: a cold manager load reuses the
+	update's session, warm checks are two set lookups.
+	"""
+
+	def __init__(self, roles: RoleService) -> None:
+		self._roles = roles
+
+	async def __call__(
+		self,
+		handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+		event: TelegramObject,
+		data: dict[str, Any],
+	) -> Any:
+		user: User | None = data.get("event_from_user")
+		if user is None:
+			data["is_admin"] = data["is_manager"] = False
+		else:
+			await self._roles.managers(data.get("session"))
+			data["is_admin"] = self._roles.is_admin(user.id)
+			data["is_manager"] = self._roles.is_manager(user.id)
+		return await handler(event, data)
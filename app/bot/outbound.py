@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator
+
+from loguru import logger
+
+from app.core.config import settings
+from app.utils.metrics import registry
+from app.utils.ratelimit import TokenBucket
+
+
+class Priority(IntEnum):
+	INTERACTIVE = 0
+	BULK = 1
+
+
+# handlers run interactive; broadcast and other background senders switch to bulk
+outbound_priority: ContextVar[Priority] = ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+OUTBOUND_QUEUE = registry.gauge("telegram_outbound_queue_depth", "Bot API sends waiting for a rate limit slot", ["priority"])
+OUTBOUND_RETRIES = registry.counter("telegram_outbound_retries_total", "Sends retried after 429 Too Many Requests", ["priority"])
+
+
+@contextmanager
+def bulk() -> Iterator[None]:
+	token = outbound_priority.set(Priority.BULK)
+	try:
+		yield
+	finally:
+		outbound_priority.reset(token)
+
+
+def is_limited(api_method: str) -> bool:
+	"""Methods that post a new message into a chat; edits and callback answers are not queued."""
+	return api_method.startswith(("send", "copyMessage", "forwardMessage")) and api_method != "sendChatAction"
+
+
+class OutboundScheduler:
+	"""Shapes outgoing messages to Telegram's limits.
+
+	A send first waits for its chat's bucket (``chat_rate``/s with bursts of
+	``chat_burst`` in private chats, ``group_per_minute`` in groups and
+	channels), then for a slot of the global bucket. Global slots are handed out
+	by priority, so a reply to a user overtakes queued broadcast messages. A 429
+	pauses both the chat and the global bucket for ``retry_after`` before the
+	send is retried.
+	"""
+
+	# idle chat buckets are dropped once this many are tracked
+	MAX_CHATS = 10_000
+
+	def __init__(
+		self,
+		global_rate: float,
+		chat_rate: float,
+		chat_burst: int,
+		group_per_minute: int,
+		max_retries: int,
+		max_retry_after: float,
+	) -> None:
+		# no burst: Telegram counts the global limit over any one-second window
+		self._global = TokenBucket(global_rate, 1.0)
+		self._chat_rate = chat_rate
+		self._chat_burst = chat_burst
+		self._group_rate = group_per_minute / 60
+		self.max_retries = max_retries
+		self.max_retry_after = max_retry_after
+		self._chats: dict[int | str, TokenBucket] = {}
+		self._waiting: list[tuple[int, int, asyncio.Future]] = []
+		self._seq = itertools.count()
+		self._pump: asyncio.Task | None = None
+		self._depth = {p: 0 for p in Priority}
+
+	def depth(self) -> dict[str, int]:
+		return {p.name.lower(): n for p, n in self._depth.items()}
+
+	def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+		bucket = self._chats.get(chat_id)
+		if bucket is None:
+			if len(self._chats) >= self.MAX_CHATS:
+				self._chats = {k: b for k, b in self._chats.items() if not b.idle()}
+			group = not isinstance(chat_id, int) or chat_id < 0
+			bucket = TokenBucket(self._group_rate, 1.0) if group else TokenBucket(self._chat_rate, self._chat_burst)
+			self._chats[chat_id] = bucket
+		return bucket
+
+	async def acquire(self, chat_id: int | str | None) -> None:
+		priority = outbound_priority.get()
+		self._depth[priority] += 1
+		OUTBOUND_QUEUE.inc(priority=priority.name.lower())
+		try:
+			if chat_id is not None:
+				await self._chat_bucket(chat_id).acquire()
+			await self._global_slot(priority)
+		finally:
+			self._depth[priority] -= 1
+			OUTBOUND_QUEUE.dec(priority=priority.name.lower())
+
+	async def _global_slot(self, priority: Priority) -> None:
+		if not self._waiting and self._global.try_acquire():
+			return
+		future = asyncio.get_running_loop().create_future()
+		heapq.heappush(self._waiting, (priority, next(self._seq), future))
+		if self._pump is None or self._pump.done():
+			self._pump = asyncio.create_task(self._hand_out())
+		await future
+
+	async def _hand_out(self) -> None:
+		while self._waiting:
+			wait = self._global.delay()
+			if wait > 0:
+				await asyncio.sleep(wait)
+				continue
+			_, _, future = heapq.heappop(self._waiting)
+			if future.done():
+				# the sender was cancelled while queued
+				continue
+			self._global.try_acquire()
+			future.set_result(None)
+
+	def retry_after(self, chat_id: int | str | None, seconds: float) -> None:
+		logger.warning("Flood control: pausing sends for {}s (chat {})", seconds, chat_id)
+		OUTBOUND_RETRIES.inc(priority=outbound_priority.get().name.lower())
+		self._global.pause(seconds)
+		if chat_id is not None:
+			self._chat_bucket(chat_id).pause(seconds)
+
+
+outbound = OutboundScheduler(
+	global_rate=settings.outbound_global_rate,
+	chat_rate=settings.outbound_chat_rate,
+	chat_burst=settings.outbound_chat_burst,
+	group_per_minute=settings.outbound_group_per_minute,
+	max_retries=settings.outbound_max_retries,
+	max_retry_after=settings.outbound_max_retry_after,
+)
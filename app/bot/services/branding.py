@@ -0,0 +1,83 @@
+import asyncio
+from dataclasses import dataclass
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot.services.invalidation import FULL_RESYNC, ChangeEvent, invalidation_bus
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.branding import Branding
+
+
+DEFAULT_WELCOME_TEXT = "Добро пожаловать! Выберите раздел ниже, чтобы начать покупки."
+
+
+@dataclass(frozen=True, slots=True)
+class BrandingItem:
+	# as stored in the branding row, None when not set
+	stored_logo_file_id: str | None
+	stored_welcome_text: str | None
+	# what the home screen shows: the stored values with the settings as fallback
+	logo_file_id: str | None
+	welcome_text: str
+
+
+def _resolve(branding: Branding | None) -> BrandingItem:
+	logo = branding.logo_file_id if branding else None
+	text = branding.welcome_text if branding else None
+	return BrandingItem(
+		stored_logo_file_id=logo,
+		stored_welcome_text=text,
+		logo_file_id=logo or settings.logo_file_id,
+		welcome_text=text or settings.welcome_text or DEFAULT_WELCOME_TEXT,
+	)
+
+
+class BrandingCache:
+	"""Resolved logo and welcome text, loaded on first use and dropped on a ``branding`` change event."""
+
+	def __init__(self) -> None:
+		self._item: BrandingItem | None = None
+		self._version = 0
+		self._lock = asyncio.Lock()
+
+	def invalidate(self) -> None:
+		self._item = None
+		self._version += 1
+
+	async def get(self, session: AsyncSession | None = None) -> BrandingItem:
+		item = self._item
+		if item is not None:
+			return item
+		async with self._lock:
+			if self._item is not None:
+				return self._item
+			version = self._version
+			try:
+				if session is not None:
+					item = await self._load(session)
+				else:
+					async with SessionLocal() as own:
+						item = await self._load(own)
+			except Exception as e:
+				# the home screen must work without the branding table; retry on the next read
+				logger.warning("Failed to load branding, using settings: {}", e)
+				return _resolve(None)
+			if version == self._version:
+				self._item = item
+			return item
+
+	@staticmethod
+	async def _load(session: AsyncSession) -> BrandingItem:
+		res = await session.execute(select(Branding).where(Branding.id == 1))
+		return _resolve(res.scalars().first())
+
+	def on_change(self, event: ChangeEvent) -> None:
+		if event.entity == "branding" or event == FULL_RESYNC:
+			self.invalidate()
+
+
+branding_cache = BrandingCache()
+invalidation_bus.subscribe(branding_cache.on_change)
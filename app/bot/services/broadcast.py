@@ -0,0 +1,283 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from loguru import logger
+from sqlalchemy import func, or_, select, update
+
+from app.bot.outbound import Priority, outbound_priority
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.broadcast import Broadcast
+from app.models.user import User
+from app.utils.ratelimit import TokenBucket
+
+
+SENT, BLOCKED, FAILED = "sent", "blocked", "failed"
+
+# bad requests that mean the recipient can never be reached
+_UNREACHABLE = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+
+def _progress_text(job: Broadcast, done: bool = False) -> str:
+	head = "✅ Рассылка завершена" if done else "📣 Рассылка идёт…"
+	return (
+		f"{head}\n\n"
+		f"Отправлено: {job.sent} из {job.total}\n"
+		f"Заблокировали бота: {job.blocked}\n"
+		f"Ошибок: {job.failed}"
+	)
+
+
+class Broadcaster:
+	"""Sends a text to every reachable user without blocking the admin handler.
+
+	Jobs live in the ``broadcasts`` table. Recipients are walked in ``users.id``
+	order in batches that are sent concurrently through a shared token bucket; the
+	cursor is committed after each batch, so a restart resumes from the last
+	confirmed recipient (at most one batch may be re-sent). Users who blocked the
+	bot are flagged and skipped from then on. A 429 is retried by the outbound
+	scheduler behind the bot's session; a send it gives up on counts as failed.
+
+	A worker leases the job it runs. ``stop()`` releases its leases, and
+	``watch()`` resumes running jobs whose lease is free or expired, so a job
+	continues after a restart or after its worker died. A job that crashes is
+	marked ``failed`` and is not resumed.
+	"""
+
+	def __init__(
+		self,
+		rate: float,
+		concurrency: int,
+		batch_size: int,
+		progress_interval: float,
+		lease_ttl: float,
+		resume_interval: float,
+	) -> None:
+		self._bucket = TokenBucket(rate)
+		self._concurrency = concurrency
+		self._batch_size = batch_size
+		self._progress_interval = progress_interval
+		self._lease_ttl = timedelta(seconds=lease_ttl)
+		self._resume_interval = resume_interval
+		self._owner = uuid.uuid4().hex
+		self._tasks: dict[int, asyncio.Task] = {}
+		self._watcher: asyncio.Task | None = None
+
+	async def start(self, bot: Bot, admin_chat_id: int, progress_message_id: int | None, text: str) -> int:
+		async with SessionLocal() as session:
+			async with session.begin():
+				total = await session.scalar(select(func.count(User.id)).where(User.is_blocked == False))
+				job = Broadcast(
+					text=text,
+					admin_chat_id=admin_chat_id,
+					progress_message_id=progress_message_id,
+					total=int(total or 0),
+				)
+				session.add(job)
+		self._spawn(bot, job.id)
+		return job.id
+
+	async def resume_pending(self, bot: Bot) -> None:
+		"""Run every unfinished job that no live worker holds."""
+		async with SessionLocal() as session:
+			res = await session.execute(
+				select(Broadcast.id).where(
+					Broadcast.status == "running",
+					or_(Broadcast.lease_owner.is_(None), Broadcast.lease_until < datetime.utcnow()),
+				)
+			)
+			job_ids = [row[0] for row in res.all()]
+		for job_id in job_ids:
+			self._spawn(bot, job_id)
+
+	def watch(self, bot: Bot) -> None:
+		if self._watcher is None or self._watcher.done():
+			self._watcher = asyncio.create_task(self._watch(bot), name="broadcast-watch")
+
+	async def _watch(self, bot: Bot) -> None:
+		while True:
+			try:
+				await self.resume_pending(bot)
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				logger.exception("Resuming broadcasts failed")
+			await asyncio.sleep(self._resume_interval)
+
+	async def stop(self) -> None:
+		tasks = list(self._tasks.values())
+		if self._watcher is not None:
+			tasks.append(self._watcher)
+			self._watcher = None
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+		# let the next process pick our jobs up right away instead of after lease_ttl
+		async with SessionLocal() as session:
+			async with session.begin():
+				await session.execute(
+					update(Broadcast)
+					.where(Broadcast.lease_owner == self._owner)
+					.values(lease_owner=None, lease_until=None)
+				)
+
+	def _spawn(self, bot: Bot, job_id: int) -> None:
+		if job_id in self._tasks:
+			return
+		task = asyncio.create_task(self._run(bot, job_id), name=f"broadcast-{job_id}")
+		self._tasks[job_id] = task
+		task.add_done_callback(lambda _t: self._tasks.pop(job_id, None))
+
+	async def _claim(self, job_id: int) -> Broadcast | None:
+		now = datetime.utcnow()
+		async with SessionLocal() as session:
+			async with session.begin():
+				res = await session.execute(
+					update(Broadcast)
+					.where(
+						Broadcast.id == job_id,
+						Broadcast.status == "running",
+						or_(
+							Broadcast.lease_owner.is_(None),
+							Broadcast.lease_owner == self._owner,
+							Broadcast.lease_until < now,
+						),
+					)
+					.values(lease_owner=self._owner, lease_until=now + self._lease_ttl)
+					.returning(Broadcast.id)
+				)
+				if res.first() is None:
+					return None
+				return await session.get(Broadcast, job_id)
+
+	async def _run(self, bot: Bot, job_id: int) -> None:
+		# the job has its own task, so this only lets interactive replies overtake the broadcast
+		outbound_priority.set(Priority.BULK)
+		job = await self._claim(job_id)
+		if job is None:
+			# another worker holds the lease
+			return
+		logger.info("Broadcast #{} running from user {}", job.id, job.cursor_user_id)
+		last_progress = 0.0
+		try:
+			while True:
+				async with SessionLocal() as session:
+					res = await session.execute(
+						select(User.id)
+						.where(User.id > job.cursor_user_id, User.is_blocked == False)
+						.order_by(User.id)
+						.limit(self._batch_size)
+					)
+					batch = [row[0] for row in res.all()]
+				if not batch:
+					break
+				results = await self._send_batch(bot, batch, job.text)
+				blocked_ids = [uid for uid, r in results if r == BLOCKED]
+				job.cursor_user_id = batch[-1]
+				job.sent += sum(1 for _, r in results if r == SENT)
+				job.failed += sum(1 for _, r in results if r == FAILED)
+				job.blocked += len(blocked_ids)
+				await self._save_progress(job, blocked_ids)
+				if time.monotonic() - last_progress >= self._progress_interval:
+					last_progress = time.monotonic()
+					await self._edit_progress(bot, job)
+			job.status = "done"
+			job.finished_at = datetime.utcnow()
+			await self._save_progress(job, [])
+			await self._edit_progress(bot, job, done=True)
+			logger.info("Broadcast #{} done: sent={} blocked={} failed={}", job.id, job.sent, job.blocked, job.failed)
+		except asyncio.CancelledError:
+			logger.info("Broadcast #{} paused at user {}", job.id, job.cursor_user_id)
+			raise
+		except Exception:
+			logger.exception("Broadcast #{} crashed at user {}", job.id, job.cursor_user_id)
+			await self._fail(job.id)
+
+	async def _send_batch(self, bot: Bot, user_ids: list[int], text: str) -> list[tuple[int, str]]:
+		semaphore = asyncio.Semaphore(self._concurrency)
+
+		async def _one(uid: int) -> tuple[int, str]:
+			async with semaphore:
+				return uid, await self._send_one(bot, uid, text)
+
+		return list(await asyncio.gather(*(_one(uid) for uid in user_ids)))
+
+	async def _send_one(self, bot: Bot, user_id: int, text: str) -> str:
+		await self._bucket.acquire()
+		try:
+			await bot.send_message(user_id, text)
+			return SENT
+		except TelegramRetryAfter as e:
+			# the outbound scheduler already paused every sender and retried as often as allowed
+			logger.warning("Broadcast to {} gave up on flood control (retry after {}s)", user_id, e.retry_after)
+			return FAILED
+		except TelegramForbiddenError:
+			return BLOCKED
+		except TelegramBadRequest as e:
+			if any(marker in e.message.lower() for marker in _UNREACHABLE):
+				return BLOCKED
+			logger.debug("Broadcast to {} failed: {}", user_id, e.message)
+			return FAILED
+		except Exception as e:
+			logger.debug("Broadcast to {} failed: {}", user_id, e)
+			return FAILED
+
+	async def _save_progress(self, job: Broadcast, blocked_ids: list[int]) -> None:
+		async with SessionLocal() as session:
+			async with session.begin():
+				if blocked_ids:
+					await session.execute(update(User).where(User.id.in_(blocked_ids)).values(is_blocked=True))
+				await session.execute(
+					update(Broadcast)
+					.where(Broadcast.id == job.id)
+					.values(
+						cursor_user_id=job.cursor_user_id,
+						sent=job.sent,
+						failed=job.failed,
+						blocked=job.blocked,
+						status=job.status,
+						finished_at=job.finished_at,
+						lease_until=datetime.utcnow() + self._lease_ttl,
+					)
+				)
+
+	async def _fail(self, job_id: int) -> None:
+		try:
+			async with SessionLocal() as session:
+				async with session.begin():
+					await session.execute(
+						update(Broadcast)
+						.where(Broadcast.id == job_id, Broadcast.lease_owner == self._owner)
+						.values(status="failed", finished_at=datetime.utcnow(), lease_owner=None, lease_until=None)
+					)
+		except Exception:
+			# the lease still runs out, but watch() only resumes running jobs: it stays stuck until fixed by hand
+			logger.exception("Broadcast #{} could not be marked failed", job_id)
+
+	async def _edit_progress(self, bot: Bot, job: Broadcast, done: bool = False) -> None:
+		if not job.progress_message_id:
+			return
+		try:
+			await bot.edit_message_text(
+				text=_progress_text(job, done),
+				chat_id=job.admin_chat_id,
+				message_id=job.progress_message_id,
+			)
+		except TelegramBadRequest:
+			pass  # message not modified / deleted by the admin
+		except Exception as e:
+			logger.debug("Broadcast #{} progress edit failed: {}", job.id, e)
+
+
+broadcaster = Broadcaster(
+	rate=settings.broadcast_rate,
+	concurrency=settings.broadcast_concurrency,
+	batch_size=settings.broadcast_batch_size,
+	progress_interval=settings.broadcast_progress_interval,
+	lease_ttl=settings.broadcast_lease_ttl,
+	resume_interval=settings.broadcast_resume_interval,
+)
@@ -0,0 +1,167 @@
+from typing import Any
+
+from aiogram.types import InlineKeyboardMarkup
+
+from app.bot.callback_tokens import callback_tokens
+from app.bot.keyboards.inline import (
+	flavor_back_row,
+	flavor_stepper_rows,
+	freeze,
+	freeze_row,
+	product_nav_row,
+	product_stepper_rows,
+)
+from app.bot.services.catalog import FlavorItem, ProductItem, catalog_cache
+from app.bot.services.invalidation import FULL_RESYNC, ChangeEvent, invalidation_bus
+from app.models.product import Product
+
+
+# keyboards for quantities up to this are kept on the card, larger ones are built per render
+MEMO_MAX_QTY = 20
+
+
+def unit_price(product: Product | ProductItem, qty: int) -> float:
+	if product.bulk_threshold and product.bulk_price and qty >= product.bulk_threshold:
+		return float(product.bulk_price)
+	return float(product.price)
+
+
+def _price_lines(product: ProductItem) -> list[str]:
+	lines = [f"Цена: <b>{float(product.price):.2f}</b>"]
+	if product.bulk_threshold and product.bulk_price:
+		lines.append(f"От {product.bulk_threshold} шт: <b>{float(product.bulk_price):.2f}</b>")
+	avail = "Есть" if product.in_stock else "Нет"
+	lines.extend(["", f"Наличие: <b>{avail}</b>"])
+	return lines
+
+
+def _product_text(product: ProductItem) -> str:
+	lines = [f"<b>{product.title}</b>", ""]
+	if product.description:
+		lines.append(product.description)
+		lines.append("")
+	if product.flavors:
+		lines.append("🍃 <b>Доступные вкусы:</b>")
+		lines.extend(f"• {flavor.name}" for flavor in product.flavors)
+		lines.append("")
+		lines.append("Выберите вкус и количество, затем добавьте в корзину")
+		lines.append("")
+	lines.extend(_price_lines(product))
+	return "\n".join(lines)
+
+
+def _product_with_flavor_text(product: ProductItem, flavor: FlavorItem) -> str:
+	lines = [f"<b>{product.title}</b>", ""]
+	if product.description:
+		lines.append(product.description)
+		lines.append("")
+	lines.append("🍃 <b>Выбранный вкус:</b>")
+	lines.append(f"• {flavor.name}")
+	lines.append("")
+	lines.extend(_price_lines(product))
+	lines.append("")
+	lines.append("Выберите количество и добавьте в корзину:")
+	return "\n".join(lines)
+
+
+class ProductCard:
+	"""Rendered card of one catalog item, shared by all users.
+
+	The text does not depend on the quantity: the running total with the bulk
+	price applied lives on the counter button. A render only builds the stepper
+	rows for the requested quantity, the navigation rows are built once. Whole
+	keyboards for small quantities are kept too, unless callback tokens are on
+	(tokens expire, so they are issued per render). Tokens carry the card's
+	items and catalog version, so a press skips the catalog lookup while
+	nothing has changed. Everything shared between renders is frozen.
+	"""
+
+	__slots__ = ("product", "text", "_nav_row", "_back_row", "_flavor_texts", "_markups")
+
+	def __init__(self, product: ProductItem) -> None:
+		self.product = product
+		self.text = _product_text(product)
+		self._nav_row = freeze_row(product_nav_row(product.category_id))
+		self._back_row = freeze_row(flavor_back_row(product.id))
+		self._flavor_texts: dict[int, str] = {}
+		# (flavor_id or None, qty) -> keyboard
+		self._markups: dict[tuple[int | None, int], InlineKeyboardMarkup] = {}
+
+	def qty_label(self, qty: int) -> str:
+		# the running total lives on the counter button, so a step only edits the keyboard
+		if qty == 1:
+			return "1"
+		return f"{qty} шт · {unit_price(self.product, qty) * qty:.2f}"
+
+	def markup(self, qty: int = 1) -> InlineKeyboardMarkup:
+		markup = self._markups.get((None, qty))
+		if markup is None:
+			p = self.product
+			rows = product_stepper_rows(
+				p.id, qty, enabled=p.in_stock, has_flavors=bool(p.flavors), qty_label=self.qty_label(qty), context=self._context()
+			)
+			rows.append(self._nav_row)
+			markup = self._keep(None, qty, InlineKeyboardMarkup(inline_keyboard=rows))
+		return markup
+
+	def flavor_text(self, flavor: FlavorItem) -> str:
+		text = self._flavor_texts.get(flavor.id)
+		if text is None:
+			text = self._flavor_texts[flavor.id] = _product_with_flavor_text(self.product, flavor)
+		return text
+
+	def flavor_markup(self, flavor: FlavorItem, qty: int) -> InlineKeyboardMarkup:
+		markup = self._markups.get((flavor.id, qty))
+		if markup is None:
+			p = self.product
+			rows = flavor_stepper_rows(
+				p.id, flavor.id, qty, enabled=p.in_stock, qty_label=self.qty_label(qty), context=self._context(flavor=flavor)
+			)
+			rows.append(self._back_row)
+			markup = self._keep(flavor.id, qty, InlineKeyboardMarkup(inline_keyboard=rows))
+		return markup
+
+	def _context(self, **items: Any) -> dict[str, Any]:
+		if not callback_tokens.enabled:
+			return {}
+		return {"product": self.product, "catalog_version": catalog_cache.version_of(self.product), **items}
+
+	def _keep(self, flavor_id: int | None, qty: int, markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+		if qty <= MEMO_MAX_QTY and not callback_tokens.enabled:
+			self._markups[(flavor_id, qty)] = markup = freeze(markup)
+		return markup
+
+
+class CardCache:
+	"""Product cards per catalog item.
+
+	A card is valid for as long as the catalog snapshot holds the very item it
+	was built from: a partial rebuild replaces the items of changed products
+	only, so unchanged cards survive version bumps. Product and flavor change
+	events drop the affected cards right away, a full resync drops them all.
+	"""
+
+	def __init__(self) -> None:
+		self._cards: dict[int, ProductCard] = {}
+
+	def __len__(self) -> int:
+		return len(self._cards)
+
+	def get(self, product: ProductItem) -> ProductCard:
+		card = self._cards.get(product.id)
+		if card is None or card.product is not product:
+			card = self._cards[product.id] = ProductCard(product)
+		return card
+
+	def on_change(self, event: ChangeEvent) -> None:
+		if event == FULL_RESYNC or (event.entity in ("product", "flavor") and event.id is None):
+			self._cards.clear()
+		elif event.entity == "product":
+			self._cards.pop(event.id, None)  # type: ignore[arg-type]
+		elif event.entity == "flavor":
+			for pid in [pid for pid, card in self._cards.items() if any(f.id == event.id for f in card.product.flavors)]:
+				del self._cards[pid]
+
+
+card_cache = CardCache()
+invalidation_bus.subscribe(card_cache.on_change)
@@ -0,0 +1,237 @@
+import asyncio
+from dataclasses import dataclass
+
+from loguru import logger
+from sqlalchemy import or_, select
+
+from app.bot.services.invalidation import FULL_RESYNC, ChangeEvent, invalidation_bus
+from app.db.session import SessionLocal
+from app.models.flavor import Flavor
+from app.models.product import Category, Product
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryItem:
+	id: int
+	name: str
+
+
+@dataclass(frozen=True, slots=True)
+class FlavorItem:
+	id: int
+	product_id: int
+	name: str
+
+
+@dataclass(frozen=True, slots=True)
+class ProductItem:
+	id: int
+	title: str
+	description: str | None
+	price: float
+	bulk_threshold: int | None
+	bulk_price: float | None
+	stock_qty: int | None
+	in_stock: bool
+	photo_file_id: str | None
+	category_id: int | None
+	flavors: tuple[FlavorItem, ...] = ()
+
+
+@dataclass(slots=True)
+class CatalogSnapshot:
+	"""Immutable view of the catalog. Never mutate a published snapshot."""
+
+	version: int
+	categories: tuple[CategoryItem, ...]
+	categories_by_id: dict[int, CategoryItem]
+	products_by_id: dict[int, ProductItem]
+	products_by_category: dict[int, tuple[ProductItem, ...]]
+	flavors_by_id: dict[int, FlavorItem]
+
+	def products_in_category(self, category_id: int, in_stock_only: bool = False) -> tuple[ProductItem, ...]:
+		products = self.products_by_category.get(category_id, ())
+		if in_stock_only:
+			return tuple(p for p in products if p.in_stock)
+		return products
+
+	def flavor(self, product_id: int, flavor_id: int) -> FlavorItem | None:
+		flavor = self.flavors_by_id.get(flavor_id)
+		if flavor is None or flavor.product_id != product_id:
+			return None
+		return flavor
+
+
+def _product_item(p: Product, flavors: tuple[FlavorItem, ...]) -> ProductItem:
+	return ProductItem(
+		id=p.id,
+		title=p.title,
+		description=p.description,
+		price=float(p.price),
+		bulk_threshold=p.bulk_threshold,
+		bulk_price=float(p.bulk_price) if p.bulk_price is not None else None,
+		stock_qty=p.stock_qty,
+		in_stock=bool(p.in_stock),
+		photo_file_id=p.photo_file_id,
+		category_id=p.category_id,
+		flavors=flavors,
+	)
+
+
+def _product_items(products: list[Product], flavors: list[Flavor]) -> list[ProductItem]:
+	flavor_items: dict[int, list[FlavorItem]] = {}
+	for f in flavors:
+		flavor_items.setdefault(f.product_id, []).append(FlavorItem(id=f.id, product_id=f.product_id, name=f.name))
+	return [_product_item(p, tuple(flavor_items.get(p.id, ()))) for p in products]
+
+
+def build_snapshot(version: int, categories: list[CategoryItem], products: list[ProductItem]) -> CatalogSnapshot:
+	category_items = tuple(sorted(categories, key=lambda c: c.name))
+	products_by_id: dict[int, ProductItem] = {}
+	by_category: dict[int, list[ProductItem]] = {}
+	for item in sorted(products, key=lambda p: p.title):
+		products_by_id[item.id] = item
+		if item.category_id is not None:
+			by_category.setdefault(item.category_id, []).append(item)
+
+	return CatalogSnapshot(
+		version=version,
+		categories=category_items,
+		categories_by_id={c.id: c for c in category_items},
+		products_by_id=products_by_id,
+		products_by_category={cid: tuple(items) for cid, items in by_category.items()},
+		flavors_by_id={f.id: f for p in products_by_id.values() for f in p.flavors},
+	)
+
+
+class CatalogCache:
+	"""In-process catalog snapshot: categories, non-deleted products and available flavors.
+
+	Readers get the current snapshot without touching the DB. Change events from
+	the invalidation bus bump the version; the next reader reloads only the
+	affected rows under a lock and swaps a new snapshot in atomically, so
+	concurrent readers never see a half-built catalog.
+	"""
+
+	def __init__(self) -> None:
+		self._snapshot: CatalogSnapshot | None = None
+		self._version = 0
+		self._pending: set[ChangeEvent] = set()
+		self._full_reload = True
+		self._lock = asyncio.Lock()
+
+	@property
+	def version(self) -> int:
+		return self._version
+
+	def version_of(self, product: ProductItem) -> int | None:
+		"""Version of the current snapshot if it still holds ``product``; never reloads."""
+		snapshot = self._snapshot
+		if snapshot is None or snapshot.version != self._version or snapshot.products_by_id.get(product.id) is not product:
+			return None
+		return snapshot.version
+
+	def unchanged_since(self, version: int | None) -> bool:
+		"""True if no change arrived after snapshot ``version``, so its items are still current."""
+		return version is not None and version == self._version
+
+	def invalidate(self, event: ChangeEvent | None = None) -> None:
+		if event is None or event.entity not in _PARTIAL_ENTITIES or event.id is None:
+			self._full_reload = True
+		else:
+			self._pending.add(event)
+		self._version += 1
+
+	async def get(self) -> CatalogSnapshot:
+		snapshot = self._snapshot
+		if snapshot is not None and snapshot.version == self._version:
+			return snapshot
+		async with self._lock:
+			snapshot = self._snapshot
+			if snapshot is None or snapshot.version != self._version:
+				snapshot = await self._rebuild()
+		return snapshot
+
+	async def _rebuild(self) -> CatalogSnapshot:
+		# take the pending work first: events arriving while we query bump the
+		# version again and are picked up by the next reader
+		version = self._version
+		events, self._pending = self._pending, set()
+		full, self._full_reload = self._full_reload, False
+		try:
+			if full or self._snapshot is None:
+				snapshot = await self._load_all(version)
+			else:
+				snapshot = await self._load_changed(version, self._snapshot, events)
+		except BaseException:
+			self._pending |= events
+			self._full_reload = self._full_reload or full
+			raise
+		self._snapshot = snapshot
+		logger.debug("Catalog snapshot v{} built: {} categories, {} products", version, len(snapshot.categories), len(snapshot.products_by_id))
+		return snapshot
+
+	async def _load_all(self, version: int) -> CatalogSnapshot:
+		async with SessionLocal() as session:
+			cats = (await session.execute(select(Category))).scalars().all()
+			prods = (await session.execute(select(Product).where(Product.is_deleted == False))).scalars().all()
+			flavors = (await session.execute(
+				select(Flavor).where(Flavor.is_available == True).order_by(Flavor.id)
+			)).scalars().all()
+		return build_snapshot(
+			version,
+			[CategoryItem(id=c.id, name=c.name) for c in cats],
+			_product_items(list(prods), list(flavors)),
+		)
+
+	async def _load_changed(self, version: int, old: CatalogSnapshot, events: set[ChangeEvent]) -> CatalogSnapshot:
+		product_ids = {e.id for e in events if e.entity == "product"}
+		flavor_ids = {e.id for e in events if e.entity == "flavor"}
+		category_ids = {e.id for e in events if e.entity == "category"}
+		# products that sat in a changed category may have been detached from it
+		for cid in category_ids:
+			product_ids.update(p.id for p in old.products_by_category.get(cid, ()))
+
+		conditions = []
+		if product_ids:
+			conditions.append(Product.id.in_(product_ids))
+		if flavor_ids:
+			conditions.append(Product.id.in_(select(Flavor.product_id).where(Flavor.id.in_(flavor_ids))))
+		if category_ids:
+			conditions.append(Product.category_id.in_(category_ids))
+
+		async with SessionLocal() as session:
+			categories = old.categories
+			if category_ids:
+				cats = (await session.execute(select(Category))).scalars().all()
+				categories = tuple(CategoryItem(id=c.id, name=c.name) for c in cats)
+			prods: list[Product] = []
+			flavors: list[Flavor] = []
+			if conditions:
+				prods = list((await session.execute(select(Product).where(or_(*conditions)))).scalars().all())
+				live_ids = [p.id for p in prods if not p.is_deleted]
+				if live_ids:
+					flavors = list((await session.execute(
+						select(Flavor).where(Flavor.product_id.in_(live_ids), Flavor.is_available == True).order_by(Flavor.id)
+					)).scalars().all())
+
+		products = dict(old.products_by_id)
+		for pid in product_ids:
+			products.pop(pid, None)
+		for p in prods:
+			products.pop(p.id, None)
+		for item in _product_items([p for p in prods if not p.is_deleted], flavors):
+			products[item.id] = item
+		return build_snapshot(version, list(categories), list(products.values()))
+
+	def on_change(self, event: ChangeEvent) -> None:
+		if event.entity not in _CATALOG_ENTITIES:
+			return
+		self.invalidate(None if event == FULL_RESYNC else event)
+
+
+_PARTIAL_ENTITIES = frozenset({"product", "flavor", "category"})
+_CATALOG_ENTITIES = _PARTIAL_ENTITIES | {FULL_RESYNC.entity}
+
+catalog_cache = CatalogCache()
+invalidation_bus.subscribe(catalog_cache.on_change)
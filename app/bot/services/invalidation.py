@@ -0,0 +1,159 @@
+import asyncio
+import json
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class ChangeEvent:
+	"""A committed write to a cached entity. ``id=None`` means "everything of this kind"."""
+
+	entity: str
+	id: int | None = None
+
+
+# Sent to subscribers when events may have been missed (e.g. the listener reconnected).
+FULL_RESYNC = ChangeEvent("catalog")
+
+Subscriber = Callable[[ChangeEvent], None]
+
+
+class InvalidationBus(ABC):
+	def __init__(self) -> None:
+		self._subscribers: list[Subscriber] = []
+
+	def subscribe(self, callback: Subscriber) -> None:
+		self._subscribers.append(callback)
+
+	def _dispatch(self, event: ChangeEvent) -> None:
+		for callback in self._subscribers:
+			try:
+				callback(event)
+			except Exception:
+				logger.exception("Invalidation subscriber failed for {}", event)
+
+	@abstractmethod
+	async def publish(self, *events: ChangeEvent) -> None:
+		...
+
+	async def start(self) -> None:
+		pass
+
+	async def stop(self) -> None:
+		pass
+
+
+class LocalInvalidationBus(InvalidationBus):
+	"""Single-process bus: events are delivered synchronously to local subscribers."""
+
+	async def publish(self, *events: ChangeEvent) -> None:
+		for event in events:
+			self._dispatch(event)
+
+
+class PostgresInvalidationBus(InvalidationBus):
+	"""Fans events out to every bot process through Postgres LISTEN/NOTIFY.
+
+	Events are applied locally right away; other processes receive them on a
+	dedicated asyncpg connection. Each process tags its payloads with an origin id
+	so it doesn't apply its own notifications twice. If the listening connection
+	drops, subscribers get ``FULL_RESYNC`` because notifications may have been lost.
+	"""
+
+	def __init__(self, dsn: str, channel: str) -> None:
+		super().__init__()
+		self._dsn = dsn
+		self._channel = channel
+		self._origin = uuid.uuid4().hex
+		self._conn = None
+		self._send_lock = asyncio.Lock()
+		self._reconnect_task: asyncio.Task | None = None
+		self._closing = False
+
+	async def start(self) -> None:
+		self._closing = False
+		await self._connect()
+
+	async def stop(self) -> None:
+		self._closing = True
+		if self._reconnect_task:
+			self._reconnect_task.cancel()
+		if self._conn is not None:
+			await self._conn.close()
+			self._conn = None
+
+	async def publish(self, *events: ChangeEvent) -> None:
+		for event in events:
+			self._dispatch(event)
+		if self._conn is None or self._conn.is_closed():
+			logger.warning("Invalidation listener is down; {} event(s) not broadcast", len(events))
+			return
+		payload = json.dumps(
+			{"o": self._origin, "e": [[e.entity, e.id] for e in events]},
+			separators=(",", ":"),
+		)
+		try:
+			# asyncpg connections don't allow concurrent operations
+			async with self._send_lock:
+				await self._conn.execute("SELECT pg_notify($1, $2)", self._channel, payload)
+		except Exception:
+			logger.exception("Failed to broadcast invalidation events")
+
+	async def _connect(self) -> None:
+		import asyncpg
+
+		conn = await asyncpg.connect(self._dsn)
+		await conn.add_listener(self._channel, self._on_notify)
+		conn.add_termination_listener(self._on_terminated)
+		self._conn = conn
+		logger.info("Listening for cache invalidations on '{}'", self._channel)
+
+	def _on_notify(self, _conn, _pid: int, _channel: str, payload: str) -> None:
+		try:
+			data = json.loads(payload)
+		except ValueError:
+			logger.warning("Malformed invalidation payload: {!r}", payload)
+			return
+		if data.get("o") == self._origin:
+			return
+		for entity, entity_id in data.get("e", []):
+			self._dispatch(ChangeEvent(entity, entity_id))
+
+	def _on_terminated(self, _conn) -> None:
+		self._conn = None
+		if self._closing:
+			return
+		logger.warning("Invalidation listener connection lost, reconnecting")
+		self._dispatch(FULL_RESYNC)
+		self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+	async def _reconnect(self) -> None:
+		delay = 1.0
+		while not self._closing:
+			try:
+				await self._connect()
+			except Exception as exc:
+				logger.warning("Invalidation listener reconnect failed: {}", exc)
+				await asyncio.sleep(delay)
+				delay = min(delay * 2, 30.0)
+				continue
+			# anything published while we were away is lost
+			self._dispatch(FULL_RESYNC)
+			return
+
+
+def create_bus() -> InvalidationBus:
+	if settings.invalidation_backend == "postgres":
+		dsn = make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+		return PostgresInvalidationBus(dsn, settings.invalidation_channel)
+	return LocalInvalidationBus()
+
+
+invalidation_bus: InvalidationBus = create_bus()
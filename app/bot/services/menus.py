@@ -0,0 +1,49 @@
+from aiogram.types import InlineKeyboardMarkup
+
+from app.bot.keyboards.inline import categories_keyboard_with_nav, freeze, products_keyboard_with_nav
+from app.bot.services.catalog import CatalogSnapshot
+
+
+class CatalogMenus:
+	"""Category and product list keyboards of the current catalog version, shared by all users.
+
+	Markups are kept until a newer snapshot comes in; one built from an older
+	snapshot (a reader that got it just before a swap) is returned but not kept.
+	Kept markups are frozen.
+	"""
+
+	def __init__(self) -> None:
+		self._version = -1
+		self._categories: InlineKeyboardMarkup | None = None
+		# (category_id, in_stock_only) -> keyboard
+		self._products: dict[tuple[int, bool], InlineKeyboardMarkup] = {}
+
+	def _current(self, snapshot: CatalogSnapshot) -> bool:
+		if snapshot.version > self._version:
+			self._version = snapshot.version
+			self._categories = None
+			self._products = {}
+		return snapshot.version == self._version
+
+	def categories(self, snapshot: CatalogSnapshot) -> InlineKeyboardMarkup:
+		current = self._current(snapshot)
+		if current and self._categories is not None:
+			return self._categories
+		markup = categories_keyboard_with_nav([(c.id, c.name) for c in snapshot.categories]).as_markup()
+		if current:
+			self._categories = markup = freeze(markup)
+		return markup
+
+	def products(self, snapshot: CatalogSnapshot, category_id: int, in_stock_only: bool = False) -> InlineKeyboardMarkup:
+		current = self._current(snapshot)
+		key = (category_id, in_stock_only)
+		markup = self._products.get(key) if current else None
+		if markup is None:
+			products = snapshot.products_in_category(category_id, in_stock_only=in_stock_only)
+			markup = products_keyboard_with_nav([(p.id, p.title) for p in products], category_id).as_markup()
+			if current:
+				self._products[key] = markup = freeze(markup)
+		return markup
+
+
+catalog_menus = CatalogMenus()
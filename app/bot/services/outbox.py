@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+from sqlalchemy import Row, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.outbox import OutboxMessage
+from app.utils.metrics import registry
+
+
+OUTBOX_DELIVERIES = registry.counter("outbox_deliveries_total", "Outbox delivery attempts", ["result"])
+
+# bad requests that will fail the same way on every retry
+_PERMANENT = ("chat not found", "user is deactivated", "peer_id_invalid", "can't parse entities")
+
+
+def enqueue(session: AsyncSession, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup | None = None) -> None:
+	"""Queue a message in the caller's transaction; it is sent only if that transaction commits."""
+	session.add(
+		OutboxMessage(
+			chat_id=chat_id,
+			text=text,
+			reply_markup=reply_markup.model_dump_json(exclude_none=True) if reply_markup else None,
+		)
+	)
+
+
+class OutboxDispatcher:
+	"""Delivers ``outbox`` rows concurrently, retrying failures with exponential backoff.
+
+	Due rows are claimed with ``FOR UPDATE SKIP LOCKED`` and leased by pushing
+	``available_at`` forward, so several bot processes can share the table and a
+	crashed worker's rows become due again once the lease runs out. ``wake()``
+	starts a round right away; otherwise the table is polled.
+	"""
+
+	def __init__(
+		self,
+		concurrency: int,
+		batch_size: int,
+		poll_interval: float,
+		max_attempts: int,
+		backoff: float,
+		max_backoff: float,
+		lease: float,
+	) -> None:
+		self._concurrency = concurrency
+		self._batch_size = batch_size
+		self._poll_interval = poll_interval
+		self._max_attempts = max_attempts
+		self._backoff = backoff
+		self._max_backoff = max_backoff
+		self._lease = timedelta(seconds=lease)
+		self._wakeup = asyncio.Event()
+		# earliest retry scheduled by this worker in the last round, to wake up before the next poll
+		self._next_retry: float | None = None
+		self._task: asyncio.Task | None = None
+
+	def start(self, bot: Bot) -> None:
+		if self._task is None or self._task.done():
+			self._task = asyncio.create_task(self._run(bot), name="outbox")
+
+	async def stop(self) -> None:
+		if self._task is not None:
+			self._task.cancel()
+			await asyncio.gather(self._task, return_exceptions=True)
+			self._task = None
+
+	def wake(self) -> None:
+		self._wakeup.set()
+
+	async def _run(self, bot: Bot) -> None:
+		while True:
+			self._next_retry = None
+			try:
+				claimed = await self._claim()
+				if claimed:
+					await self._deliver(bot, claimed)
+					# a full batch means more may be due
+					if len(claimed) == self._batch_size:
+						continue
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				logger.exception("Outbox round failed")
+			timeout = self._poll_interval if self._next_retry is None else min(self._poll_interval, self._next_retry)
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout)
+			except asyncio.TimeoutError:
+				pass
+			self._wakeup.clear()
+
+	async def _claim(self) -> list[Row]:
+		now = datetime.utcnow()
+		async with SessionLocal() as session:
+			async with session.begin():
+				res = await session.execute(
+					select(
+						OutboxMessage.id,
+						OutboxMessage.chat_id,
+						OutboxMessage.text,
+						OutboxMessage.reply_markup,
+						OutboxMessage.attempts,
+					)
+					.where(OutboxMessage.status == "pending", OutboxMessage.available_at <= now)
+					.order_by(OutboxMessage.id)
+					.limit(self._batch_size)
+					.with_for_update(skip_locked=True)
+				)
+				rows = list(res.all())
+				if rows:
+					await session.execute(
+						update(OutboxMessage)
+						.where(OutboxMessage.id.in_([r.id for r in rows]))
+						.values(available_at=now + self._lease, attempts=OutboxMessage.attempts + 1)
+					)
+		return rows
+
+	async def _deliver(self, bot: Bot, rows: list[Row]) -> None:
+		semaphore = asyncio.Semaphore(self._concurrency)
+
+		async def _one(row: Row) -> None:
+			async with semaphore:
+				values = await self._send(bot, row)
+			async with SessionLocal() as session:
+				async with session.begin():
+					await session.execute(update(OutboxMessage).where(OutboxMessage.id == row.id).values(**values))
+
+		await asyncio.gather(*(_one(row) for row in rows))
+
+	async def _send(self, bot: Bot, row: Row) -> dict:
+		attempt = row.attempts + 1
+		markup = InlineKeyboardMarkup.model_validate_json(row.reply_markup) if row.reply_markup else None
+		try:
+			await bot.send_message(row.chat_id, row.text, reply_markup=markup)
+		except TelegramRetryAfter as e:
+			# flood control is not the message's fault: don't count the attempt
+			OUTBOX_DELIVERIES.inc(result="retry_after")
+			return {"available_at": datetime.utcnow() + timedelta(seconds=e.retry_after), "attempts": row.attempts}
+		except TelegramForbiddenError as e:
+			return self._failed(row, e.message)
+		except TelegramBadRequest as e:
+			if any(marker in e.message.lower() for marker in _PERMANENT):
+				return self._failed(row, e.message)
+			return self._retry(row, attempt, e.message)
+		except Exception as e:
+			return self._retry(row, attempt, f"{type(e).__name__}: {e}")
+		OUTBOX_DELIVERIES.inc(result="sent")
+		return {"status": "sent", "sent_at": datetime.utcnow(), "last_error": None}
+
+	def _retry(self, row: Row, attempt: int, error: str) -> dict:
+		if attempt >= self._max_attempts:
+			return self._failed(row, error)
+		OUTBOX_DELIVERIES.inc(result="retry")
+		delay = min(self._max_backoff, self._backoff * 2 ** (attempt - 1))
+		self._next_retry = delay if self._next_retry is None else min(self._next_retry, delay)
+		logger.debug("Outbox #{} to {} failed (attempt {}), retrying in {}s: {}", row.id, row.chat_id, attempt, delay, error)
+		return {"available_at": datetime.utcnow() + timedelta(seconds=delay), "last_error": error}
+
+	def _failed(self, row: Row, error: str) -> dict:
+		OUTBOX_DELIVERIES.inc(result="failed")
+		logger.warning("Outbox #{} to {} gave up: {}", row.id, row.chat_id, error)
+		return {"status": "failed", "last_error": error}
+
+
+outbox = OutboxDispatcher(
+	concurrency=settings.outbox_concurrency,
+	batch_size=settings.outbox_batch_size,
+	poll_interval=settings.outbox_poll_interval,
+	max_attempts=settings.outbox_max_attempts,
+	backoff=settings.outbox_backoff,
+	max_backoff=settings.outbox_max_backoff,
+	lease=settings.outbox_lease,
+)
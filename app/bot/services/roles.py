@@ -0,0 +1,95 @@
+import asyncio
+
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot.services.invalidation import FULL_RESYNC, ChangeEvent, invalidation_bus
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.manager import Manager
+
+
+def parse_ids(raw: str | None) -> frozenset[int]:
+	ids: set[int] = set()
+	for part in (raw or "").split(","):
+		part = part.strip()
+		if not part:
+			continue
+		try:
+			ids.add(int(part))
+		except ValueError:
+			logger.warning("Ignoring non-numeric ADMIN_IDS entry {!r}", part)
+	return frozenset(ids)
+
+
+class RoleService:
+	"""Admin and manager user ids for O(1) role checks.
+
+	Admins are ``settings.admin_ids``, parsed once (and again only if the setting
+	is reassigned). Managers are the ``Manager`` table, loaded on first use and
+	dropped on a ``manager`` change event; they have access to the admin panel
+	too. ``RoleMiddleware`` loads them and puts ``is_admin``/``is_manager`` into
+	handler data, so the sync checks below are current inside handlers.
+	"""
+
+	def __init__(self) -> None:
+		self._admins_raw: str | None = None
+		self._admins: frozenset[int] = frozenset()
+		self._managers: tuple[int, ...] | None = None
+		self._manager_set: frozenset[int] = frozenset()
+		self._version = 0
+		self._lock = asyncio.Lock()
+
+	@property
+	def admin_ids(self) -> frozenset[int]:
+		raw = settings.admin_ids
+		if raw != self._admins_raw:
+			self._admins_raw, self._admins = raw, parse_ids(raw)
+		return self._admins
+
+	def is_manager(self, user_id: int) -> bool:
+		return user_id in self._manager_set
+
+	def is_admin(self, user_id: int) -> bool:
+		return user_id in self.admin_ids or user_id in self._manager_set
+
+	def invalidate(self) -> None:
+		self._managers = None
+		self._version += 1
+
+	async def managers(self, session: AsyncSession | None = None) -> tuple[int, ...]:
+		"""Manager user ids in the order they were added.
+
+		Pass the handler's session when it already holds a connection, so a cold
+		load doesn't need a second one from the pool."""
+		ids = self._managers
+		if ids is not None:
+			return ids
+		async with self._lock:
+			if self._managers is not None:
+				return self._managers
+			version = self._version
+			if session is not None:
+				ids = await self._load(session)
+			else:
+				async with SessionLocal() as own:
+					ids = await self._load(own)
+			# a change that landed while we were loading wins; the next reader reloads
+			if version == self._version:
+				self._managers = ids
+				self._manager_set = frozenset(ids)
+			return ids
+
+	@staticmethod
+	async def _load(session: AsyncSession) -> tuple[int, ...]:
+		res = await session.execute(select(Manager.user_id).order_by(Manager.id))
+		return tuple(row[0] for row in res.all())
+
+	def on_change(self, event: ChangeEvent) -> None:
+		if event.entity == "manager" or event == FULL_RESYNC:
+			self.invalidate()
+
+
+roles = RoleService()
+invalidation_bus.subscribe(roles.on_change)
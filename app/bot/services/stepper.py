@@ -0,0 +1,76 @@
+import asyncio
+from typing import Callable
+
+from aiogram import Bot
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+from loguru import logger
+
+from app.core.config import settings
+from app.utils.metrics import registry
+
+
+STEPPER_PRESSES = registry.counter("qty_stepper_presses_total", "Quantity stepper presses", ["result"])
+
+Render = Callable[[int], InlineKeyboardMarkup]
+
+
+class _Window:
+	__slots__ = ("qty", "render")
+
+	def __init__(self, qty: int, render: Render) -> None:
+		self.qty = qty
+		self.render = render
+
+
+class QtyStepper:
+	"""Coalesces ➖/➕ presses on one message into few ``edit_message_reply_markup`` calls.
+
+	The first press edits the keyboard right away and opens a ``window``;
+	presses inside it only move the pending quantity, which is rendered once
+	when the window closes. While a window is open the quantity is tracked
+	here, because buttons pressed during it still carry the quantity they were
+	rendered with.
+	"""
+
+	def __init__(self, window: float) -> None:
+		self._window = window
+		self._open: dict[tuple[int, int], _Window] = {}
+		self._tasks: set[asyncio.Task] = set()
+
+	def step(self, callback: CallbackQuery, action: str, qty: int, render: Render) -> int:
+		"""Apply ``action`` ("inc"/"dec") and schedule the keyboard edit; returns the new quantity."""
+		message = callback.message
+		key = (message.chat.id, message.message_id)  # type: ignore[union-attr]
+		window = self._open.get(key)
+		base = window.qty if window is not None else qty
+		new_qty = base + 1 if action == "inc" else max(1, base - 1)
+		if window is not None:
+			window.qty, window.render = new_qty, render
+			STEPPER_PRESSES.inc(result="coalesced")
+		elif new_qty != base:
+			window = self._open[key] = _Window(new_qty, render)
+			task = asyncio.create_task(self._run(callback.bot, key, window))  # type: ignore[arg-type]
+			self._tasks.add(task)
+			task.add_done_callback(self._tasks.discard)
+			STEPPER_PRESSES.inc(result="edited")
+		else:
+			STEPPER_PRESSES.inc(result="unchanged")
+		return new_qty
+
+	async def _run(self, bot: Bot, key: tuple[int, int], window: _Window) -> None:
+		chat_id, message_id = key
+		rendered = None
+		try:
+			while window.qty != rendered:
+				rendered = window.qty
+				try:
+					await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=window.render(rendered))
+				except Exception as e:
+					# "message is not modified", a deleted message or flood control: the next press retries
+					logger.debug("Stepper edit of {}:{} failed: {}", chat_id, message_id, e)
+				await asyncio.sleep(self._window)
+		finally:
+			self._open.pop(key, None)
+
+
+stepper = QtyStepper(window=settings.qty_edit_window)
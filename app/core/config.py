@@ -8,15 +8,94 @@ class Settings(BaseSettings):
 	admin_ids: str | None = None
 
 	database_url: str
+	db_pool_size: int = 5
+	db_max_overflow: int = 10
+	db_pool_timeout: float = 30.0
+	db_pool_recycle: int = 1800
+	# asyncpg prepared statement cache per connection; set 0 behind pgbouncer in transaction mode
+	db_statement_cache_size: int = 100
+	# "pre_ping" checks each connection on checkout (one extra round-trip per checkout),
+	# "background" pings the pool every db_liveness_interval seconds instead: cheaper, but the
+	# first query on a connection the server dropped between pings fails
+	db_liveness: str = "pre_ping"
+	db_liveness_interval: float = 30.0
+	# SQL profiler: "off", "dev" (every update) or "sample" (sql_profile_sample_rate of updates)
+	sql_profile: str = "off"
+	sql_profile_sample_rate: float = 0.01
+	sql_statement_budget: int = 6
+	sql_slow_ms: float = 100.0
+	# append every incoming update to this JSONL file for scripts/replay_updates.py; off when unset
+	record_updates_path: str | None = None
 
 	# optional
+	# Bot API base URL, e.g. a local Bot API server or scripts/fake_bot_api.py; api.telegram.org when unset
+	telegram_api_url: str | None = None
 	webhook_url: str | None = None
 	webapp_host: str = "0.0.0.0"
 	webapp_port: int = 8080
+	# Prometheus /metrics on webapp_host; disabled when unset
+	metrics_port: int | None = None
+	webhook_secret: str | None = None
+	# keep False when several workers share one webhook, otherwise one worker stopping takes it down
+	webhook_delete_on_shutdown: bool = True
 
 	# messaging
 	manager_chat_id: int | None = None
 
+	# bot processes serving this token; per-process caches that other workers' writes can make
+	# stale are only kept when this is 1 or invalidation_backend is "postgres"
+	bot_workers: int = 1
+	# cache invalidation across bot processes: "local" (single process) or "postgres" (LISTEN/NOTIFY)
+	invalidation_backend: str = "local"
+	invalidation_channel: str = "shop_bot_invalidation"
+
+	# short "~token" callback_data backed by an in-process TTL store (single worker only);
+	# data over Telegram's 64 bytes is always tokenized
+	callback_tokens: bool = False
+	callback_token_ttl: float = 86400.0
+	callback_token_max: int = 200_000
+
+	# FSM storage: "memory" (per process, lost on restart) or "sql" (fsm_states table in the
+	# database_url database, shared by workers); states not written for fsm_state_ttl seconds
+	# are dropped, in batches of fsm_expire_batch every fsm_expire_interval seconds; the
+	# fsm_cache_size LRU is off when bot_workers > 1 without invalidation_backend "postgres"
+	fsm_storage: str = "memory"
+	fsm_state_ttl: float = 86400.0
+	fsm_cache_size: int = 10_000
+	fsm_expire_interval: float = 300.0
+	fsm_expire_batch: int = 500
+
+	# quantity stepper: presses on one message within this many seconds become one keyboard edit
+	qty_edit_window: float = 0.4
+
+	# outbound scheduler for every message the bot sends (Telegram: ~30 msg/s overall,
+	# ~1 msg/s per chat, 20 msg/min per group); 429s are retried up to outbound_max_retries
+	# times unless retry_after exceeds outbound_max_retry_after seconds
+	outbound_global_rate: float = 30.0
+	outbound_chat_rate: float = 1.0
+	outbound_chat_burst: int = 3
+	outbound_group_per_minute: int = 20
+	outbound_max_retries: int = 3
+	outbound_max_retry_after: float = 60.0
+
+	# outbox: manager notifications committed with the order, delivered in the background
+	outbox_concurrency: int = 10
+	outbox_batch_size: int = 50
+	outbox_poll_interval: float = 2.0
+	outbox_max_attempts: int = 8
+	outbox_backoff: float = 2.0
+	outbox_max_backoff: float = 300.0
+	outbox_lease: float = 60.0
+
+	# broadcasts: global send rate (Telegram allows ~30 msg/s), parallel sends, cursor batch;
+	# jobs whose worker died are resumed once their lease runs out, checked every broadcast_resume_interval seconds
+	broadcast_rate: float = 30.0
+	broadcast_concurrency: int = 20
+	broadcast_batch_size: int = 200
+	broadcast_progress_interval: float = 5.0
+	broadcast_lease_ttl: float = 300.0
+	broadcast_resume_interval: float = 60.0
+
 	# branding/welcome
 	logo_file_id: str | None = None
 	welcome_text: str | None = None
@@ -0,0 +1,152 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+# upper bounds in seconds, Prometheus-style (the last bucket is +Inf)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+	"""Checkout wait histogram and failure counters.
+
+	Kept at module level rather than on the pool, so the numbers survive
+	``engine.dispose()`` recreating the pool.
+	"""
+
+	def __init__(self) -> None:
+		self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+		self.wait_sum = 0.0
+		self.checkouts = 0
+		self.timeouts = 0
+		self.errors = 0
+
+	def observe_wait(self, seconds: float) -> None:
+		self.checkouts += 1
+		self.wait_sum += seconds
+		for i, bound in enumerate(WAIT_BUCKETS):
+			if seconds <= bound:
+				self.wait_counts[i] += 1
+				return
+		self.wait_counts[-1] += 1
+
+	def wait_quantile(self, q: float) -> float | None:
+		"""Upper bound of the bucket holding the q-quantile, ``inf`` past the last bucket."""
+		if not self.checkouts:
+			return None
+		rank = q * self.checkouts
+		seen = 0
+		for i, count in enumerate(self.wait_counts):
+			seen += count
+			if seen >= rank:
+				return WAIT_BUCKETS[i] if i < len(WAIT_BUCKETS) else float("inf")
+		return float("inf")
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+	"""Queue pool that times every checkout, including waits for a free slot
+	and connects of new connections, and counts checkouts that fail."""
+
+	def _do_get(self):
+		started = time.perf_counter()
+		try:
+			conn = super()._do_get()
+		except PoolTimeoutError:
+			pool_stats.timeouts += 1
+			raise
+		except Exception:
+			pool_stats.errors += 1
+			raise
+		pool_stats.observe_wait(time.perf_counter() - started)
+		return conn
+
+
+@dataclass(frozen=True, slots=True)
+class PoolSnapshot:
+	size: int
+	max_overflow: int
+	checked_out: int
+	checked_in: int
+	overflow: int
+	checkouts: int
+	timeouts: int
+	errors: int
+	wait_p50: float | None
+	wait_p95: float | None
+	wait_p99: float | None
+
+
+def pool_snapshot(engine: AsyncEngine) -> PoolSnapshot:
+	pool = engine.sync_engine.pool
+	is_queue = isinstance(pool, AsyncAdaptedQueuePool)
+	return PoolSnapshot(
+		size=pool.size() if is_queue else 0,
+		max_overflow=getattr(pool, "_max_overflow", 0),
+		checked_out=pool.checkedout() if is_queue else 0,
+		checked_in=pool.checkedin() if is_queue else 0,
+		# QueuePool counts overflow from -pool_size until the core slots are filled
+		overflow=max(0, pool.overflow()) if is_queue else 0,
+		checkouts=pool_stats.checkouts,
+		timeouts=pool_stats.timeouts,
+		errors=pool_stats.errors,
+		wait_p50=pool_stats.wait_quantile(0.5),
+		wait_p95=pool_stats.wait_quantile(0.95),
+		wait_p99=pool_stats.wait_quantile(0.99),
+	)
+
+
+async def keep_pool_alive(engine: AsyncEngine, interval: float) -> None:
+	"""Ping the database every ``interval`` seconds instead of on every checkout.
+
+	A ping that hits a dead connection makes SQLAlchemy invalidate the whole
+	pool, so after a database restart the following checkouts reconnect instead
+	of failing one by one. A connection the server drops between pings is still
+	handed out, and the query that gets it fails, so this is opt-in
+	(``DB_LIVENESS=background``).
+	"""
+	while True:
+		await asyncio.sleep(interval)
+		try:
+			async with engine.connect() as conn:
+				await conn.execute(text("SELECT 1"))
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			logger.warning("DB liveness check failed: {}", e)
+
+
+def prometheus_lines(engine: AsyncEngine) -> list[str]:
+	s = pool_snapshot(engine)
+	lines = []
+	for name, help, value in (
+		("db_pool_size", "Persistent connections the pool keeps", s.size),
+		("db_pool_max_overflow", "Extra connections allowed above the pool size", s.max_overflow),
+		("db_pool_checked_out", "Connections currently lent out", s.checked_out),
+		("db_pool_checked_in", "Idle connections in the pool", s.checked_in),
+		("db_pool_overflow", "Overflow connections currently open", s.overflow),
+	):
+		lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+	for name, help, value in (
+		("db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection", s.timeouts),
+		("db_pool_checkout_errors_total", "Checkouts that failed to connect", s.errors),
+	):
+		lines += [f"# HELP {name} {help}", f"# TYPE {name} counter", f"{name} {value}"]
+	name = "db_pool_checkout_wait_seconds"
+	lines += [f"# HELP {name} Time to get a connection from the pool", f"# TYPE {name} histogram"]
+	cumulative = 0
+	for bound, count in zip(WAIT_BUCKETS + (None,), pool_stats.wait_counts):
+		cumulative += count
+		le = "+Inf" if bound is None else repr(bound)
+		lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+	lines.append(f"{name}_sum {pool_stats.wait_sum!r}")
+	lines.append(f"{name}_count {pool_stats.checkouts}")
+	return lines
@@ -0,0 +1,166 @@
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)|\(__\[POSTCOMPILE_\w+\]\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str, limit: int = 300) -> str:
+	"""Strip literals and parameters so the same query always reads the same."""
+	sql = _SPACE.sub(" ", statement).strip()
+	sql = _STRING.sub("?", sql)
+	sql = _PARAM.sub("?", sql)
+	sql = _NUMBER.sub("?", sql)
+	sql = _IN_LIST.sub("IN (…)", sql)
+	return sql if len(sql) <= limit else sql[:limit] + "…"
+
+
+@dataclass(slots=True)
+class ProfiledUpdate:
+	sampled: bool
+	handler: str = "unknown"
+	statements: int = 0
+	db_time: float = 0.0
+	slow: int = 0
+	# normalized SQL of each statement, only kept for sampled updates
+	sql: list[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class HandlerReport:
+	updates: int = 0
+	statements: int = 0
+	max_statements: int = 0
+	db_time: float = 0.0
+	slow: int = 0
+	over_budget: int = 0
+	top_sql: Counter = field(default_factory=Counter)
+
+
+current_profile: ContextVar[ProfiledUpdate | None] = ContextVar("current_profile", default=None)
+
+
+class QueryProfiler:
+	"""Attributes DB statements to the aiogram handler that issued them.
+
+	Every update gets a cheap counter (statements, DB time); a sampled fraction
+	also keeps the normalized SQL. Statements slower than ``slow_ms`` and
+	updates over ``budget`` statements are logged as warnings, and totals are
+	aggregated per handler for ``report()``. ``sample_rate`` 1.0 is the dev
+	mode; production runs with a small rate.
+	"""
+
+	def __init__(self, budget: int, slow_ms: float, sample_rate: float) -> None:
+		self.budget = budget
+		self.slow = slow_ms / 1000
+		self.sample_rate = sample_rate
+		self.handlers: dict[str, HandlerReport] = {}
+		self.started_at = time.time()
+
+	def install(self, engine: AsyncEngine) -> None:
+		if event.contains(engine.sync_engine, "before_cursor_execute", self._before):
+			return
+		event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+		event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+		event.listen(engine.sync_engine, "handle_error", self._error)
+
+	def begin(self) -> ProfiledUpdate:
+		return ProfiledUpdate(sampled=random.random() < self.sample_rate)
+
+	def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+		conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+	def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+		elapsed = time.perf_counter() - conn.info["profiler_started"].pop()
+		profile = current_profile.get()
+		if profile is not None:
+			profile.statements += 1
+			profile.db_time += elapsed
+			if profile.sampled:
+				profile.sql.append(normalize_sql(statement))
+		if elapsed >= self.slow:
+			if profile is not None:
+				profile.slow += 1
+			logger.warning(
+				"Slow query in {}: {:.1f} ms: {}",
+				profile.handler if profile else "background",
+				elapsed * 1000,
+				normalize_sql(statement),
+			)
+
+	def _error(self, ctx) -> None:
+		# a failed statement never reaches after_cursor_execute
+		started = ctx.connection.info.get("profiler_started") if ctx.connection is not None else None
+		if started:
+			started.pop()
+
+	def end(self, profile: ProfiledUpdate) -> None:
+		report = self.handlers.get(profile.handler)
+		if report is None:
+			report = self.handlers[profile.handler] = HandlerReport()
+		report.updates += 1
+		report.statements += profile.statements
+		report.max_statements = max(report.max_statements, profile.statements)
+		report.db_time += profile.db_time
+		report.slow += profile.slow
+		report.top_sql.update(profile.sql)
+		if profile.statements > self.budget:
+			report.over_budget += 1
+			repeated = [f"{n}× {sql}" for sql, n in Counter(profile.sql).most_common(3) if n > 1]
+			logger.warning(
+				"{} ran {} statements (budget {}), {:.1f} ms in DB{}",
+				profile.handler,
+				profile.statements,
+				self.budget,
+				profile.db_time * 1000,
+				"; repeated: " + " | ".join(repeated) if repeated else "",
+			)
+
+	def reset(self) -> None:
+		self.handlers.clear()
+		self.started_at = time.time()
+
+	def report(self, limit: int = 10, top_sql: int = 2, max_chars: int = 3500) -> str:
+		"""HTML summary, heaviest handlers first, cut at whole lines to fit a message."""
+		if not self.handlers:
+			return "Нет данных"
+		ranked = sorted(self.handlers.items(), key=lambda kv: kv[1].statements, reverse=True)[:limit]
+		lines = []
+		for name, r in ranked:
+			lines.append(
+				f"<b>{_html(name)}</b>: {r.updates} upd, {r.statements / r.updates:.1f} SQL/upd (max {r.max_statements}), "
+				f"{r.db_time / r.updates * 1000:.1f} ms DB/upd, slow {r.slow}, over budget {r.over_budget}"
+			)
+			for sql, n in r.top_sql.most_common(top_sql):
+				lines.append(f"  {n}× <code>{_html(sql[:160])}</code>")
+		text = ""
+		for line in lines:
+			if len(text) + len(line) + 1 > max_chars:
+				break
+			text += line + "\n"
+		return text.rstrip("\n")
+
+
+def _html(text: str) -> str:
+	return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+profiler = QueryProfiler(
+	budget=settings.sql_statement_budget,
+	slow_ms=settings.sql_slow_ms,
+	sample_rate=1.0 if settings.sql_profile == "dev" else settings.sql_profile_sample_rate,
+)
@@ -1,6 +1,9 @@
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
+from app.db.pool import InstrumentedPool
+from app.db.profiler import profiler
 
 
 class Base(DeclarativeBase):
@@ -8,10 +11,29 @@ class Base(DeclarativeBase):
 
 
 def create_engine() -> AsyncEngine:
-	return create_async_engine(settings.database_url, echo=False, pool_pre_ping=True)
+	connect_args = {}
+	if make_url(settings.database_url).get_driver_name() == "asyncpg":
+		# SQLAlchemy's prepared statement cache and asyncpg's own cache
+		connect_args = {
+			"prepared_statement_cache_size": settings.db_statement_cache_size,
+			"statement_cache_size": settings.db_statement_cache_size,
+		}
+	return create_async_engine(
+		settings.database_url,
+		echo=False,
+		poolclass=InstrumentedPool,
+		pool_size=settings.db_pool_size,
+		max_overflow=settings.db_max_overflow,
+		pool_timeout=settings.db_pool_timeout,
+		pool_recycle=settings.db_pool_recycle,
+		pool_pre_ping=settings.db_liveness == "pre_ping",
+		connect_args=connect_args,
+	)
 
 
 engine: AsyncEngine = create_engine()
+if settings.sql_profile != "off":
+	profiler.install(engine)
 SessionLocal: async_sessionmaker[AsyncSession] = async_sessionmaker(
 	bind=engine,
 	expire_on_commit=False,
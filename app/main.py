@@ -1,18 +1,45 @@
 import asyncio
+import hashlib
 import sys
+from urllib.parse import urlparse
 from loguru import logger
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 from app.core.config import settings
-from app.db.session import engine, Base
+from app.db.session import engine, Base, SessionLocal
+from app.db.pool import keep_pool_alive
+from app.bot.client import ScheduledSession
+from app.bot.outbound import outbound
+from app.bot.callback_tokens import callback_tokens
+from app.bot.fsm_storage import SqlStorage
+from app.bot.middlewares.callback_tokens import CallbackTokenMiddleware
+from app.bot.middlewares.db import DbSessionMiddleware
+from app.bot.middlewares.fsm import FsmBatchMiddleware
+from app.bot.middlewares.metrics import setup_metrics
+from app.bot.middlewares.profiler import setup_profiler
+from app.bot.middlewares.recorder import setup_recorder
+from app.bot.middlewares.roles import RoleMiddleware
+from app.db.profiler import profiler
+from app.utils import metrics
+from app.bot.services.broadcast import broadcaster
+from app.bot.services.catalog import catalog_cache
+from app.bot.services.outbox import outbox
+from app.bot.services.roles import roles
+from app.bot.services.invalidation import invalidation_bus
 from sqlalchemy.ext.asyncio import AsyncEngine
 from app.bot.handlers.user.catalog import router as user_router
 from app.bot.handlers.admin.products import router as admin_router
 from app.bot.handlers.admin.reviews import router as admin_reviews_router
 from app.bot.handlers.admin.branding import router as admin_branding_router
 from app.bot.handlers.admin.managers import router as admin_managers_router
+from app.bot.handlers.admin.diagnostics import router as admin_diagnostics_router
 
 
 def setup_logging() -> None:
@@ -20,6 +47,107 @@ def setup_logging() -> None:
     logger.add(sys.stderr, level="INFO")
 
 
+def create_storage() -> BaseStorage:
+    if settings.fsm_storage != "sql":
+        return MemoryStorage()
+    cache_size = settings.fsm_cache_size
+    if cache_size and settings.bot_workers > 1 and settings.invalidation_backend != "postgres":
+        # the local bus never hears about other workers' writes, so a cached state could go stale
+        logger.warning(
+            "FSM_STORAGE=sql with BOT_WORKERS={} and INVALIDATION_BACKEND={}: FSM cache disabled, "
+            "states are read from the database on every update",
+            settings.bot_workers,
+            settings.invalidation_backend,
+        )
+        cache_size = 0
+    storage = SqlStorage(
+        engine,
+        invalidation_bus,
+        ttl=settings.fsm_state_ttl,
+        cache_size=cache_size,
+        expire_interval=settings.fsm_expire_interval,
+        expire_batch=settings.fsm_expire_batch,
+    )
+    invalidation_bus.subscribe(storage.on_change)
+    return storage
+
+
+def create_dispatcher() -> Dispatcher:
+    dp = Dispatcher(storage=create_storage())
+    # registered first so it is outermost and also counts the session's COMMIT
+    setup_metrics(dp, engine)
+    if settings.sql_profile != "off":
+        setup_profiler(dp, profiler)
+    if settings.record_updates_path:
+        setup_recorder(dp, settings.record_updates_path)
+    if isinstance(dp.storage, SqlStorage):
+        dp.update.outer_middleware(FsmBatchMiddleware(dp.storage))
+    dp.update.outer_middleware(DbSessionMiddleware(SessionLocal))
+    dp.update.outer_middleware(RoleMiddleware(roles))
+    dp.callback_query.outer_middleware(CallbackTokenMiddleware(callback_tokens))
+    dp.include_routers(user_router, admin_router, admin_reviews_router, admin_branding_router, admin_managers_router, admin_diagnostics_router)
+    return dp
+
+
+def api_server() -> TelegramAPIServer:
+    if settings.telegram_api_url:
+        return TelegramAPIServer.from_base(settings.telegram_api_url.rstrip("/"))
+    return PRODUCTION
+
+
+def webhook_secret() -> str:
+    # every worker must agree on the secret, so derive it from the token when not configured
+    if settings.webhook_secret:
+        return settings.webhook_secret
+    return hashlib.sha256(settings.bot_token.encode()).hexdigest()
+
+
+def webhook_path(webhook_url: str) -> str:
+    # Telegram posts to WEBHOOK_URL exactly as given, so serve the same path ("/" when it has none)
+    return urlparse(webhook_url).path or "/"
+
+
+async def run_polling(bot: Bot, dp: Dispatcher) -> None:
+    await bot.delete_webhook()
+    logger.info("Bot started (long polling)")
+    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    webhook_url = settings.webhook_url or ""
+    path = webhook_path(webhook_url)
+    secret = webhook_secret()
+
+    async def on_startup(bot: Bot) -> None:
+        await bot.set_webhook(
+            webhook_url,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    async def on_shutdown(bot: Bot) -> None:
+        if settings.webhook_delete_on_shutdown:
+            await bot.delete_webhook()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
+    app = web.Application()
+    # handle_in_background: ack Telegram with 200 right away, run handlers as tasks
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret, handle_in_background=True).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.webapp_host, port=settings.webapp_port)
+    await site.start()
+    logger.info("Bot started (webhook on {}:{}{})", settings.webapp_host, settings.webapp_port, path)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
 async def main() -> None:
     setup_logging()
     # ensure DB is up and metadata loaded; create tables if not exist
@@ -28,15 +156,40 @@ async def main() -> None:
             await conn.run_sync(Base.metadata.create_all)
 
     await _init_db(engine)
+    liveness = None
+    if settings.db_liveness == "background":
+        liveness = asyncio.create_task(keep_pool_alive(engine, settings.db_liveness_interval))
+    await invalidation_bus.start()
+    await catalog_cache.get()
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await metrics.serve(settings.webapp_host, settings.metrics_port)
+        logger.info("Metrics on {}:{}/metrics", settings.webapp_host, settings.metrics_port)
 
     async with Bot(
         token=settings.bot_token,
+        session=ScheduledSession(outbound, api=api_server()),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     ) as bot:
-        dp = Dispatcher()
-        dp.include_routers(user_router, admin_router, admin_reviews_router, admin_branding_router, admin_managers_router)
-        logger.info("Bot started")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        dp = create_dispatcher()
+        broadcaster.watch(bot)
+        outbox.start(bot)
+        if isinstance(dp.storage, SqlStorage):
+            dp.storage.start()
+        try:
+            if settings.webhook_url:
+                await run_webhook(bot, dp)
+            else:
+                await run_polling(bot, dp)
+        finally:
+            await broadcaster.stop()
+            await outbox.stop()
+            await dp.storage.close()
+            await invalidation_bus.stop()
+            if liveness:
+                liveness.cancel()
+            if metrics_runner:
+                await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
@@ -5,6 +5,9 @@ from .review import Review
 from .branding import Branding
 from .manager import Manager
 from .flavor import Flavor
+from .broadcast import Broadcast
+from .outbox import OutboxMessage
+from .fsm import FsmState
 
 __all__ = [
 	"User",
@@ -16,5 +19,8 @@ __all__ = [
     "Branding",
     "Manager",
     "Flavor",
+    "Broadcast",
+    "OutboxMessage",
+    "FsmState",
 ]
 
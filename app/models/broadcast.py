@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+
+class Broadcast(Base):
+	__tablename__ = "broadcasts"
+
+	id: Mapped[int] = mapped_column(primary_key=True)
+	text: Mapped[str] = mapped_column(Text())
+	status: Mapped[str] = mapped_column(String(16), default="running")  # 'running' | 'done' | 'failed'
+	admin_chat_id: Mapped[int] = mapped_column(BigInteger)
+	progress_message_id: Mapped[int | None] = mapped_column(nullable=True)
+	# recipients are walked in users.id order; everyone up to the cursor is confirmed
+	cursor_user_id: Mapped[int] = mapped_column(BigInteger, default=0)
+	total: Mapped[int] = mapped_column(default=0)
+	sent: Mapped[int] = mapped_column(default=0)
+	failed: Mapped[int] = mapped_column(default=0)
+	blocked: Mapped[int] = mapped_column(default=0)
+	# worker currently running the job; lets several bot processes share the table
+	lease_owner: Mapped[str | None] = mapped_column(String(64), nullable=True)
+	lease_until: Mapped[datetime | None] = mapped_column(nullable=True)
+	created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+	finished_at: Mapped[datetime | None] = mapped_column(nullable=True)
+
+
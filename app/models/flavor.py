@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -7,6 +7,12 @@ from app.db.session import Base
 
 class Flavor(Base):
     __tablename__ = "flavors"
+    __table_args__ = (
+        # storefront: available flavors of a product
+        Index("ix_flavors_product_available", "product_id", "id", postgresql_where=text("is_available = true")),
+        # admin flavor list / duplicate-name check
+        Index("ix_flavors_product_id_name", "product_id", "name"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
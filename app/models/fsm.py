@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Index, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+
+class FsmState(Base):
+	"""aiogram FSM state and data of one conversation, kept by ``app.bot.fsm_storage.SqlStorage``.
+
+	Rows with neither state nor data are deleted rather than stored, and rows not
+	written for ``FSM_STATE_TTL`` seconds are swept in batches.
+	"""
+
+	__tablename__ = "fsm_states"
+	__table_args__ = (
+		# TTL sweeper: expired rows first
+		Index("ix_fsm_states_expires_at", "expires_at"),
+	)
+
+	# "<bot_id>:<chat_id>:<user_id>" plus thread/business/destiny parts when set
+	key: Mapped[str] = mapped_column(String(255), primary_key=True)
+	state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+	# compact JSON, NULL when empty
+	data: Mapped[str | None] = mapped_column(Text(), nullable=True)
+	expires_at: Mapped[datetime] = mapped_column()
@@ -1,11 +1,18 @@
 from datetime import datetime
-from sqlalchemy import ForeignKey, Numeric
+from sqlalchemy import ForeignKey, Index, Numeric, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.session import Base
 
 
 class Order(Base):
 	__tablename__ = "orders"
+	__table_args__ = (
+		# at most one open cart per user; arbiter for the cart upsert
+		Index(
+			"uq_orders_user_open_cart", "user_id", unique=True,
+			postgresql_where=text("status = 'new'"), sqlite_where=text("status = 'new'"),
+		),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -19,6 +26,12 @@ class Order(Base):
 
 class OrderItem(Base):
 	__tablename__ = "order_items"
+	__table_args__ = (
+		# one line per product/flavor in a cart; NULL flavor folded to 0 so it participates
+		Index("uq_order_items_line", "order_id", "product_id", text("coalesce(flavor_id, 0)"), unique=True),
+		# FK lookups when a product is deleted for good
+		Index("ix_order_items_product_id", "product_id"),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"))
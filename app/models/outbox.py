@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Index, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+
+class OutboxMessage(Base):
+	"""A Telegram message committed together with the change it announces.
+
+	Rows are written in the caller's transaction and delivered afterwards by
+	``app.bot.services.outbox``.
+	"""
+
+	__tablename__ = "outbox"
+	__table_args__ = (
+		# dispatcher: due pending messages in id order
+		Index("ix_outbox_pending_due", "available_at", "id", postgresql_where=text("status = 'pending'")),
+	)
+
+	id: Mapped[int] = mapped_column(primary_key=True)
+	chat_id: Mapped[int] = mapped_column(BigInteger)
+	text: Mapped[str] = mapped_column(Text())
+	# InlineKeyboardMarkup as JSON
+	reply_markup: Mapped[str | None] = mapped_column(Text(), nullable=True)
+	status: Mapped[str] = mapped_column(String(16), default="pending")  # 'pending' | 'sent' | 'failed'
+	attempts: Mapped[int] = mapped_column(default=0)
+	# next delivery attempt; also the lease of the worker currently sending it
+	available_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+	last_error: Mapped[str | None] = mapped_column(Text(), nullable=True)
+	created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+	sent_at: Mapped[datetime | None] = mapped_column(nullable=True)
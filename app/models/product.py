@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, Numeric, String, Text
+from sqlalchemy import ForeignKey, Index, Numeric, String, Text, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.session import Base
 
@@ -15,6 +15,13 @@ class Category(Base):
 
 class Product(Base):
 	__tablename__ = "products"
+	__table_args__ = (
+		# category listings: live products of a category ordered by title
+		Index(
+			"ix_products_category_title_active", "category_id", "title",
+			postgresql_where=text("is_deleted = false"),
+		),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	title: Mapped[str] = mapped_column(String(255))
@@ -22,7 +29,8 @@ class Product(Base):
 	price: Mapped[float] = mapped_column(Numeric(10, 2))
 	bulk_threshold: Mapped[int | None] = mapped_column(nullable=True)
 	bulk_price: Mapped[float | None] = mapped_column(Numeric(10, 2), nullable=True)
-	stock_qty: Mapped[int] = mapped_column(default=0)
+	# None: stock is not tracked; otherwise checkout decrements it and clears in_stock at zero
+	stock_qty: Mapped[int | None] = mapped_column(nullable=True)
 	in_stock: Mapped[bool] = mapped_column(default=True)
 	is_deleted: Mapped[bool] = mapped_column(default=False)
 	photo_file_id: Mapped[str | None] = mapped_column(String(256), nullable=True)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String
+from sqlalchemy import Index, String
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.session import Base
 
@@ -14,3 +14,4 @@ class Review(Base):
 	created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
 
 
+Index("ix_reviews_created_at", Review.created_at.desc())
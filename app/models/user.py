@@ -11,5 +11,7 @@ class User(Base):
 	last_name: Mapped[str | None] = mapped_column(String(128), nullable=True)
 	phone: Mapped[str | None] = mapped_column(String(32), nullable=True)
 	is_admin: Mapped[bool] = mapped_column(default=False)
+	# set when Telegram reports the bot blocked or the account deactivated; skipped by broadcasts
+	is_blocked: Mapped[bool] = mapped_column(default=False)
 
 
@@ -0,0 +1,68 @@
+from sqlalchemy import Integer, and_, case, literal, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+
+
+# must match the unique indexes on orders / order_items literally, or Postgres
+# can't infer them as ON CONFLICT arbiters
+OPEN_CART_WHERE = text("status = 'new'")
+LINE_KEY = (OrderItem.order_id, OrderItem.product_id, text("coalesce(flavor_id, 0)"))
+# both spell ON CONFLICT the same way in SQLAlchemy
+_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+async def ensure_open_cart(session: AsyncSession, user_id: int) -> int:
+	"""Create the user and their open cart if missing; return the cart id. One statement on Postgres."""
+	dialect = session.get_bind().dialect.name
+	insert = _INSERTS[dialect]
+	new_user = insert(User).values(id=user_id).on_conflict_do_nothing(index_elements=[User.id])
+	stmt = insert(Order).values(user_id=user_id, status="new")
+	stmt = stmt.on_conflict_do_update(
+		index_elements=[Order.user_id],
+		index_where=OPEN_CART_WHERE,
+		# no-op update so RETURNING yields the existing cart id
+		set_={"status": stmt.excluded.status},
+	).returning(Order.id)
+	if dialect == "postgresql":
+		stmt = stmt.add_cte(new_user.cte("new_user"))
+	else:
+		# SQLite has no data-modifying CTEs
+		await session.execute(new_user)
+	return (await session.execute(stmt)).scalar_one()
+
+
+async def add_cart_line(session: AsyncSession, order_id: int, product_id: int, flavor_id: int | None, qty: int) -> int | None:
+	"""Insert or increment a cart line; return the new quantity, or None if the product is gone. One statement."""
+	unit_price = case(
+		(
+			and_(Product.bulk_threshold.is_not(None), Product.bulk_price.is_not(None), Product.bulk_threshold <= qty),
+			Product.bulk_price,
+		),
+		else_=Product.price,
+	)
+	source = select(
+		literal(order_id, Integer),
+		Product.id,
+		literal(flavor_id, Integer),
+		literal(qty, Integer),
+		unit_price,
+	).where(Product.id == product_id, Product.is_deleted == False)
+	stmt = _INSERTS[session.get_bind().dialect.name](OrderItem).from_select(
+		["order_id", "product_id", "flavor_id", "quantity", "unit_price"],
+		source,
+	)
+	stmt = stmt.on_conflict_do_update(
+		index_elements=LINE_KEY,
+		set_={"quantity": OrderItem.quantity + stmt.excluded.quantity},
+	).returning(OrderItem.quantity)
+	return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def add_to_cart(session: AsyncSession, user_id: int, product_id: int, flavor_id: int | None, qty: int) -> int | None:
+	order_id = await ensure_open_cart(session, user_id)
+	return await add_cart_line(session, order_id, product_id, flavor_id, qty)
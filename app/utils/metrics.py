@@ -0,0 +1,185 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable
+
+from aiohttp import web
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+	pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+	if extra:
+		pairs.append(extra)
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value: float) -> str:
+	if value == math.inf:
+		return "+Inf"
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+	kind = ""
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+		self.name = name
+		self.help = help
+		self.label_names = tuple(labels)
+
+	def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+		return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+	def header(self) -> list[str]:
+		return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+	@abstractmethod
+	def samples(self) -> list[str]:
+		...
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+		super().__init__(name, help, labels)
+		self._values: dict[tuple[str, ...], float] = {}
+
+	def inc(self, amount: float = 1, **labels: str) -> None:
+		key = self._key(labels)
+		self._values[key] = self._values.get(key, 0) + amount
+
+	def samples(self) -> list[str]:
+		return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+	kind = "gauge"
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = ()) -> None:
+		super().__init__(name, help, labels)
+		self._values: dict[tuple[str, ...], float] = {}
+
+	def set(self, value: float, **labels: str) -> None:
+		self._values[self._key(labels)] = value
+
+	def inc(self, amount: float = 1, **labels: str) -> None:
+		key = self._key(labels)
+		self._values[key] = self._values.get(key, 0) + amount
+
+	def dec(self, amount: float = 1, **labels: str) -> None:
+		self.inc(-amount, **labels)
+
+	def samples(self) -> list[str]:
+		return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+		super().__init__(name, help, labels)
+		self.buckets = tuple(sorted(buckets)) + (math.inf,)
+		# per label set: [bucket counts..., sum, count]
+		self._values: dict[tuple[str, ...], list[float]] = {}
+
+	def observe(self, value: float, **labels: str) -> None:
+		key = self._key(labels)
+		row = self._values.get(key)
+		if row is None:
+			row = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+		for i, bound in enumerate(self.buckets):
+			if value <= bound:
+				row[i] += 1
+				break
+		row[-2] += value
+		row[-1] += 1
+
+	def time(self, **labels: str) -> "_Timer":
+		return _Timer(self, labels)
+
+	def samples(self) -> list[str]:
+		lines = []
+		for key, row in self._values.items():
+			cumulative = 0
+			for bound, count in zip(self.buckets, row):
+				cumulative += count
+				le = 'le="' + _num(bound) + '"'
+				lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+			lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(row[-2])}")
+			lines.append(f"{self.name}_count{_labels(self.label_names, key)} {row[-1]}")
+		return lines
+
+
+class _Timer:
+	def __init__(self, histogram: Histogram, labels: dict[str, str]) -> None:
+		self._histogram = histogram
+		self._labels = labels
+
+	def __enter__(self) -> "_Timer":
+		self._started = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self._histogram.observe(time.perf_counter() - self._started, **self._labels)
+
+
+class Registry:
+	"""Holds metrics and renders them in the Prometheus text exposition format.
+
+	Collectors are callables run at scrape time that return ready-made lines,
+	for numbers owned elsewhere (e.g. the DB pool).
+	"""
+
+	def __init__(self) -> None:
+		self._metrics: list[_Metric] = []
+		self._collectors: list[Callable[[], Iterable[str]]] = []
+
+	def register(self, metric: _Metric) -> _Metric:
+		self._metrics.append(metric)
+		return metric
+
+	def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+		return self.register(Counter(name, help, labels))  # type: ignore[return-value]
+
+	def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+		return self.register(Gauge(name, help, labels))  # type: ignore[return-value]
+
+	def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+		return self.register(Histogram(name, help, labels, buckets))  # type: ignore[return-value]
+
+	def collector(self, fn: Callable[[], Iterable[str]]) -> Callable[[], Iterable[str]]:
+		self._collectors.append(fn)
+		return fn
+
+	def render(self) -> str:
+		lines: list[str] = []
+		for metric in self._metrics:
+			lines.extend(metric.header())
+			lines.extend(metric.samples())
+		for fn in self._collectors:
+			lines.extend(fn())
+		return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+async def serve(host: str, port: int, metrics: Registry = registry) -> web.AppRunner:
+	"""Serve ``GET /metrics`` on its own port; returns the runner to clean up."""
+	async def handle(_request: web.Request) -> web.Response:
+		return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+	app = web.Application()
+	app.router.add_get("/metrics", handle)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	await web.TCPSite(runner, host=host, port=port).start()
+	return runner
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+	"""Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``.
+
+	``pause()`` empties the bucket until a deadline, which is how a Telegram
+	``retry_after`` is applied to every sender sharing the bucket.
+	"""
+
+	def __init__(self, rate: float, capacity: float | None = None) -> None:
+		self.rate = rate
+		self.capacity = capacity if capacity is not None else max(rate, 1.0)
+		self._tokens = self.capacity
+		self._updated = time.monotonic()
+		self._paused_until = 0.0
+		self._lock = asyncio.Lock()
+
+	def _refill(self, now: float) -> None:
+		self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+		self._updated = now
+
+	def delay(self, tokens: float = 1.0) -> float:
+		"""Seconds until ``tokens`` are available, without taking them."""
+		now = time.monotonic()
+		if now < self._paused_until:
+			return self._paused_until - now
+		self._refill(now)
+		if self._tokens >= tokens:
+			return 0.0
+		return (tokens - self._tokens) / self.rate
+
+	def idle(self) -> bool:
+		"""Full and nobody waiting, i.e. indistinguishable from a fresh bucket."""
+		return not self._lock.locked() and self.delay(self.capacity) == 0
+
+	def try_acquire(self, tokens: float = 1.0) -> bool:
+		if self.delay(tokens) > 0:
+			return False
+		self._tokens -= tokens
+		return True
+
+	async def acquire(self, tokens: float = 1.0) -> None:
+		# the lock keeps waiters in FIFO order instead of racing for each refill
+		async with self._lock:
+			while True:
+				wait = self.delay(tokens)
+				if wait <= 0:
+					self._tokens -= tokens
+					return
+				await asyncio.sleep(wait)
+
+	def pause(self, seconds: float) -> None:
+		now = time.monotonic()
+		self._paused_until = max(self._paused_until, now + seconds)
+		self._tokens = 0.0
+		self._updated = max(self._updated, self._paused_until)
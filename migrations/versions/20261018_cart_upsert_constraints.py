@@ -0,0 +1,62 @@
+"""unique open cart per user and unique cart lines
+
+Revision ID: cart_upsert_20261018
+Revises: add_broadcasts_20261018
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "cart_upsert_20261018"
+down_revision = "add_broadcasts_20261018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The old add-to-cart path could race into duplicates; fold them before adding the constraints.
+    # Keep each user's oldest open cart (the one the bot showed) and park the rest.
+    op.execute(
+        """
+        UPDATE orders o SET status = 'abandoned'
+        WHERE o.status = 'new'
+          AND EXISTS (SELECT 1 FROM orders o2 WHERE o2.user_id = o.user_id AND o2.status = 'new' AND o2.id < o.id)
+        """
+    )
+    op.execute(
+        """
+        UPDATE order_items oi SET quantity = d.total
+        FROM (
+            SELECT min(id) AS keep_id, sum(quantity) AS total
+            FROM order_items
+            GROUP BY order_id, product_id, coalesce(flavor_id, 0)
+            HAVING count(*) > 1
+        ) d
+        WHERE oi.id = d.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM order_items oi USING order_items k
+        WHERE oi.order_id = k.order_id
+          AND oi.product_id = k.product_id
+          AND coalesce(oi.flavor_id, 0) = coalesce(k.flavor_id, 0)
+          AND oi.id > k.id
+        """
+    )
+    op.create_index(
+        "uq_orders_user_open_cart", "orders", ["user_id"], unique=True,
+        postgresql_where=sa.text("status = 'new'"),
+    )
+    op.create_index(
+        "uq_order_items_line", "order_items",
+        ["order_id", "product_id", sa.text("coalesce(flavor_id, 0)")], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_order_items_line", table_name="order_items")
+    op.drop_index("uq_orders_user_open_cart", table_name="orders")
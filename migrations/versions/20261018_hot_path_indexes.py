@@ -0,0 +1,49 @@
+"""hot-path composite and partial indexes
+
+Revision ID: hot_path_indexes_20261018
+Revises: cart_upsert_20261018
+Create Date: 2026-10-18
+
+Indexes are built with CREATE INDEX CONCURRENTLY outside the migration
+transaction, so writes to these tables keep flowing while they build.
+If a build fails, Postgres leaves an INVALID index behind; drop it and rerun.
+Open-cart lookups (orders.user_id + status = 'new') and order_items.order_id
+are already served by the unique indexes from cart_upsert_20261018, so orders
+gets no index of its own here: nothing filters it by user for other statuses.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "hot_path_indexes_20261018"
+down_revision = "cart_upsert_20261018"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_order_items_product_id", "order_items", ["product_id"], None),
+    ("ix_products_category_title_active", "products", ["category_id", "title"], "is_deleted = false"),
+    ("ix_flavors_product_available", "flavors", ["product_id", "id"], "is_available = true"),
+    ("ix_flavors_product_id_name", "flavors", ["product_id", "name"], None),
+    ("ix_reviews_created_at", "reviews", [sa.text("created_at DESC")], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""make products.stock_qty nullable: NULL means stock is not tracked
+
+Nothing maintained stock_qty before checkout started decrementing it, so the
+existing values are meaningless and are reset to NULL (untracked). Admins set
+real stock per product from the product edit menu.
+
+Revision ID: nullable_stock_qty_20261018
+Revises: add_outbox_20261018
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "nullable_stock_qty_20261018"
+down_revision = "add_outbox_20261018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.alter_column("stock_qty", existing_type=sa.Integer(), nullable=True)
+    op.execute("UPDATE products SET stock_qty = NULL")
+
+
+def downgrade() -> None:
+    op.execute("UPDATE products SET stock_qty = 0 WHERE stock_qty IS NULL")
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.alter_column("stock_qty", existing_type=sa.Integer(), nullable=False)
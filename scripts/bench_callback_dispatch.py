@@ -0,0 +1,115 @@
+"""Compare callback dispatch through the prefix trie with the old F.data filter chain.
+
+Takes every routed callback pattern from the routers in app/main.py and builds
+two dispatchers with the same routers in the same order and no-op handlers:
+one with ``CallbackRouter`` and one where each pattern becomes
+``F.data == ...`` or ``F.data.startswith(...)``, as before. State filters are
+kept in both. Then each dispatcher is fed one callback per pattern, so only
+routing is measured and no database is touched:
+
+    python -m scripts.bench_callback_dispatch
+    python -m scripts.bench_callback_dispatch --rounds 2000 --json dispatch.json
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+from datetime import datetime, timezone
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+from app.bot.callback_router import CallbackRouter
+from app.main import create_dispatcher
+from scripts.bench_handlers import FakeApiSession
+
+
+USER_ID = 1
+_SAMPLE = {"int": "42", "str": "inc", "tail": "about"}
+
+
+def _sample_data(pattern: str) -> str:
+	return re.sub(r"\{\w+(?::(\w+))?\}", lambda m: _SAMPLE[m.group(1) or "str"], pattern)
+
+
+def _chain_filter(pattern: str):
+	if "{" not in pattern:
+		return F.data == pattern
+	return F.data.startswith(pattern.split("{", 1)[0])
+
+
+async def _noop(callback: CallbackQuery) -> None:
+	return None
+
+
+def build() -> tuple[Dispatcher, Dispatcher, list[str]]:
+	"""Trie and filter-chain dispatchers mirroring the app's callback routes."""
+	trie, chain = Dispatcher(), Dispatcher()
+	samples = []
+	for router in create_dispatcher().sub_routers:
+		if not isinstance(router, CallbackRouter):
+			continue
+		trie_router, chain_router = CallbackRouter(name=router.name), Router(name=router.name)
+		for pattern, handler in router.callback_query.routes():
+			extra = [f.callback for f in handler.filters or []]
+			trie_router.callback(pattern, *extra)(_noop)
+			chain_router.callback_query(*extra, _chain_filter(pattern))(_noop)
+			if not extra:
+				# state-filtered routes never match without the state, skip them as samples
+				samples.append(_sample_data(pattern))
+		trie.include_router(trie_router)
+		chain.include_router(chain_router)
+	return trie, chain, samples
+
+
+def _update(bot: Bot, data: str, update_id: int) -> Update:
+	user = User(id=USER_ID, is_bot=False, first_name="bench")
+	message = Message(message_id=1, date=datetime.now(timezone.utc), chat=Chat(id=USER_ID, type="private"), text="menu")
+	callback = CallbackQuery(id=str(update_id), from_user=user, chat_instance="bench", message=message, data=data)
+	return Update(update_id=update_id, callback_query=callback).as_(bot)
+
+
+async def measure(dp: Dispatcher, bot: Bot, samples: list[str], rounds: int) -> dict[str, float]:
+	per_data: dict[str, list[float]] = {data: [] for data in samples}
+	updates = {data: _update(bot, data, i) for i, data in enumerate(samples)}
+	for data, update in updates.items():
+		# warm-up, and make sure every sample is actually routed
+		if await dp.feed_update(bot, update) is UNHANDLED:
+			raise SystemExit(f"{data!r} is not handled")
+	for _ in range(rounds):
+		for data, update in updates.items():
+			started = time.perf_counter()
+			await dp.feed_update(bot, update)
+			per_data[data].append((time.perf_counter() - started) * 1e6)
+	return {data: statistics.median(values) for data, values in per_data.items()}
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rounds", type=int, default=500, help="updates per pattern")
+	parser.add_argument("--json", help="write results to this file")
+	args = parser.parse_args()
+
+	trie, chain, samples = build()
+	bot = Bot("123:bench", session=FakeApiSession())
+	try:
+		chain_us = await measure(chain, bot, samples, args.rounds)
+		trie_us = await measure(trie, bot, samples, args.rounds)
+	finally:
+		await bot.session.close()
+
+	print(f"{'callback data':<36} {'chain µs':>9} {'trie µs':>9} {'speedup':>8}")
+	for data in samples:
+		print(f"{data[:36]:<36} {chain_us[data]:>9.1f} {trie_us[data]:>9.1f} {chain_us[data] / trie_us[data]:>7.2f}x")
+	chain_mean, trie_mean = statistics.mean(chain_us.values()), statistics.mean(trie_us.values())
+	print(f"{'MEAN over ' + str(len(samples)) + ' patterns':<36} {chain_mean:>9.1f} {trie_mean:>9.1f} {chain_mean / trie_mean:>7.2f}x")
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({"rounds": args.rounds, "chain_us": chain_us, "trie_us": trie_us}, f, indent=2)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
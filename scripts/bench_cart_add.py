@@ -0,0 +1,140 @@
+"""Compare the legacy add-to-cart path with the single-statement upsert.
+
+Runs against the database in DATABASE_URL (use a throwaway Postgres):
+
+    python -m scripts.bench_cart_add --iterations 2000 --users 200
+
+Seeds its own users/products in a high id range and removes them afterwards.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import delete, event, select
+
+from app.db.session import Base, SessionLocal, engine
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+from app.repositories.cart import add_to_cart
+
+
+USER_BASE = 9_000_000_000
+PRODUCT_TITLE = "__bench_cart_add__"
+
+_statements = 0
+
+
+def _count_statement(*_args) -> None:
+	global _statements
+	_statements += 1
+
+
+async def legacy_add(user_id: int, product_id: int, qty: int) -> None:
+	# the pre-upsert cart:add path: up to six sequential round-trips
+	async with SessionLocal() as session:
+		async with session.begin():
+			res_user = await session.execute(select(User).where(User.id == user_id))
+			if res_user.scalars().first() is None:
+				session.add(User(id=user_id))
+		result = await session.execute(select(Order).where(Order.user_id == user_id, Order.status == "new"))
+		order = result.scalars().first()
+		if not order:
+			order = Order(user_id=user_id, status="new")
+			session.add(order)
+			await session.flush()
+		prod_res = await session.execute(select(Product).where(Product.id == product_id))
+		product = prod_res.scalars().first()
+		item_res = await session.execute(
+			select(OrderItem).where(OrderItem.order_id == order.id, OrderItem.product_id == product_id, OrderItem.flavor_id.is_(None))
+		)
+		item = item_res.scalars().first()
+		if item:
+			item.quantity += qty
+		else:
+			session.add(OrderItem(order_id=order.id, product_id=product_id, quantity=qty, unit_price=product.price))
+		await session.commit()
+
+
+async def upsert_add(user_id: int, product_id: int, qty: int) -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			await add_to_cart(session, user_id, product_id, None, qty)
+
+
+async def _seed(products: int) -> list[int]:
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	async with SessionLocal() as session:
+		async with session.begin():
+			items = [Product(title=PRODUCT_TITLE, price=100, in_stock=True) for _ in range(products)]
+			session.add_all(items)
+	return [p.id for p in items]
+
+
+async def _cleanup() -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			order_ids = select(Order.id).where(Order.user_id >= USER_BASE)
+			await session.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+			await session.execute(delete(Order).where(Order.user_id >= USER_BASE))
+			await session.execute(delete(User).where(User.id >= USER_BASE))
+			await session.execute(delete(Product).where(Product.title == PRODUCT_TITLE))
+
+
+async def _run(name: str, fn, product_ids: list[int], iterations: int, users: int, concurrency: int) -> dict:
+	global _statements
+	rnd = random.Random(42)
+	calls = [(USER_BASE + rnd.randrange(users), rnd.choice(product_ids)) for _ in range(iterations)]
+	latencies: list[float] = []
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def one(uid: int, pid: int) -> None:
+		async with semaphore:
+			t0 = time.perf_counter()
+			await fn(uid, pid, 1)
+			latencies.append((time.perf_counter() - t0) * 1000)
+
+	_statements = 0
+	started = time.perf_counter()
+	await asyncio.gather(*(one(uid, pid) for uid, pid in calls))
+	elapsed = time.perf_counter() - started
+	latencies.sort()
+	return {
+		"path": name,
+		"ops_per_sec": round(iterations / elapsed, 1),
+		"p50_ms": round(statistics.median(latencies), 2),
+		"p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+		"statements_per_op": round(_statements / iterations, 2),
+	}
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=1000)
+	parser.add_argument("--users", type=int, default=100)
+	parser.add_argument("--products", type=int, default=20)
+	# the legacy path races into duplicate carts under concurrency, so default to serial
+	parser.add_argument("--concurrency", type=int, default=1)
+	args = parser.parse_args()
+
+	event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+	await _cleanup()
+	product_ids = await _seed(args.products)
+	try:
+		results = []
+		for name, fn in (("legacy", legacy_add), ("upsert", upsert_add)):
+			results.append(await _run(name, fn, product_ids, args.iterations, args.users, args.concurrency))
+			await _cleanup()
+			product_ids = await _seed(args.products)
+		for r in results:
+			print(f"{r['path']:>7}: {r['ops_per_sec']:>8} ops/s  p50 {r['p50_ms']:>7} ms  p95 {r['p95_ms']:>7} ms  {r['statements_per_op']} stmts/op")
+	finally:
+		await _cleanup()
+		await engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -0,0 +1,339 @@
+"""Measure handler throughput by feeding synthetic updates through the real Dispatcher.
+
+Builds the dispatcher from app/main.py, backs the Bot with a fake API session
+that returns canned responses, seeds its own catalog/users in the database
+from DATABASE_URL (SQLite or a throwaway Postgres) and removes them afterwards:
+
+    DATABASE_URL=sqlite+aiosqlite:///bench.db python -m scripts.bench_handlers
+    python -m scripts.bench_handlers --iterations 2000 --concurrency 20 --json bench.json
+    python -m scripts.bench_handlers --json new.json --compare bench.json
+
+Each scenario reports p50/p95/p99 latency, DB statements and Bot API calls per
+update and updates/sec. The admin broadcast goes through the real rate limiter,
+so its sends/sec tops out at BROADCAST_RATE.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import subprocess
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import get_origin
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, Message, Update
+from sqlalchemy import delete, event, select
+
+from app.bot.services.catalog import catalog_cache
+from app.core.config import settings
+from app.db.session import Base, SessionLocal, engine
+from app.main import create_dispatcher
+from app.models import Broadcast, Category, Flavor, Order, OrderItem, Product, User
+
+
+USER_BASE = 8_000_000_000
+ADMIN_ID = USER_BASE - 1
+MARK = "__bench_handlers__"
+
+
+class _UpdateStats:
+	__slots__ = ("statements", "api_calls")
+
+	def __init__(self) -> None:
+		self.statements = 0
+		self.api_calls = 0
+
+
+_current: ContextVar[_UpdateStats | None] = ContextVar("bench_update", default=None)
+
+
+def _count_statement(*_args) -> None:
+	stats = _current.get()
+	if stats is not None:
+		stats.statements += 1
+
+
+class FakeApiSession(BaseSession):
+	"""Answers every Bot API call locally with a minimal valid result."""
+
+	def __init__(self, latency: float = 0.0) -> None:
+		super().__init__()
+		self.latency = latency
+
+	async def make_request(self, bot, method, timeout=None):
+		stats = _current.get()
+		if stats is not None:
+			stats.api_calls += 1
+		if self.latency:
+			await asyncio.sleep(self.latency)
+		returning = method.__returning__
+		if returning is bool:
+			return True
+		chat_id = getattr(method, "chat_id", None)
+		message = Message(
+			message_id=1,
+			date=datetime.now(),
+			chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+			text="ok",
+		)
+		return [message] if get_origin(returning) is list else message
+
+	async def stream_content(self, *args, **kwargs):
+		yield b""
+
+	async def close(self) -> None:
+		pass
+
+
+class Updates:
+	def __init__(self, bot: Bot) -> None:
+		self._bot = bot
+		self._ids = itertools.count(1)
+
+	def _user(self, uid: int) -> dict:
+		return {"id": uid, "is_bot": False, "first_name": "Bench"}
+
+	def _chat_message(self, uid: int, text: str) -> dict:
+		return {"message_id": 1, "date": 0, "chat": {"id": uid, "type": "private"}, "from": self._user(uid), "text": text}
+
+	def callback(self, uid: int, data: str) -> Update:
+		n = next(self._ids)
+		raw = {
+			"update_id": n,
+			"callback_query": {
+				"id": str(n),
+				"chat_instance": "bench",
+				"from": self._user(uid),
+				"data": data,
+				"message": self._chat_message(uid, "x"),
+			},
+		}
+		return Update.model_validate(raw, context={"bot": self._bot})
+
+	def message(self, uid: int, text: str) -> Update:
+		raw = {"update_id": next(self._ids), "message": self._chat_message(uid, text)}
+		return Update.model_validate(raw, context={"bot": self._bot})
+
+
+async def _seed(categories: int, per_category: int, users: int) -> tuple[list[int], list[int], list[int]]:
+	"""Returns (category ids, product ids without flavors, user ids with an open cart)."""
+	async with SessionLocal() as session:
+		async with session.begin():
+			cats = [Category(name=f"{MARK} {i}") for i in range(categories)]
+			session.add_all(cats)
+			await session.flush()
+			products = [
+				Product(title=f"{MARK} {c.id}/{i}", description="bench", price=100, in_stock=True, category_id=c.id)
+				for c in cats
+				for i in range(per_category)
+			]
+			session.add_all(products)
+			await session.flush()
+			# every fourth product is sold by flavor
+			flavored = products[::4]
+			session.add_all(Flavor(name=f"flavor {i}", product_id=p.id) for p in flavored for i in range(3))
+			plain = [p.id for p in products if p not in flavored]
+			session.add_all(User(id=USER_BASE + i) for i in range(users))
+			session.add(User(id=ADMIN_ID))
+			await session.flush()
+			carts = [Order(user_id=USER_BASE + i, status="new") for i in range(users)]
+			session.add_all(carts)
+			await session.flush()
+			session.add_all(
+				OrderItem(order_id=o.id, product_id=plain[(o.user_id + k) % len(plain)], quantity=1, unit_price=100)
+				for o in carts
+				for k in range(3)
+			)
+	catalog_cache.invalidate()
+	return [c.id for c in cats], plain, [USER_BASE + i for i in range(users)]
+
+
+async def _cleanup() -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			bench_orders = select(Order.id).where(Order.user_id >= ADMIN_ID)
+			bench_products = select(Product.id).where(Product.title.startswith(MARK))
+			await session.execute(delete(OrderItem).where(OrderItem.order_id.in_(bench_orders)))
+			await session.execute(delete(OrderItem).where(OrderItem.product_id.in_(bench_products)))
+			await session.execute(delete(Order).where(Order.user_id >= ADMIN_ID))
+			await session.execute(delete(Broadcast).where(Broadcast.text.startswith(MARK)))
+			await session.execute(delete(User).where(User.id >= ADMIN_ID))
+			await session.execute(delete(Flavor).where(Flavor.product_id.in_(bench_products)))
+			await session.execute(delete(Product).where(Product.title.startswith(MARK)))
+			await session.execute(delete(Category).where(Category.name.startswith(MARK)))
+
+
+def _pct(values: list[float], q: float) -> float:
+	return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+
+async def _run(bot: Bot, dp, sequences: list[list[Update]], concurrency: int) -> dict:
+	latencies: list[float] = []
+	statements: list[int] = []
+	api_calls: list[int] = []
+	errors = 0
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def play(sequence: list[Update]) -> None:
+		nonlocal errors
+		async with semaphore:
+			# one user's updates stay in order, like Telegram delivers them
+			for update in sequence:
+				stats = _UpdateStats()
+				token = _current.set(stats)
+				started = time.perf_counter()
+				try:
+					await dp.feed_update(bot, update)
+				except Exception:
+					errors += 1
+				finally:
+					latencies.append((time.perf_counter() - started) * 1000)
+					statements.append(stats.statements)
+					api_calls.append(stats.api_calls)
+					_current.reset(token)
+
+	started = time.perf_counter()
+	await asyncio.gather(*(play(s) for s in sequences))
+	elapsed = time.perf_counter() - started
+	latencies.sort()
+	return {
+		"updates": len(latencies),
+		"updates_per_sec": round(len(latencies) / elapsed, 1),
+		"p50_ms": round(statistics.median(latencies), 3),
+		"p95_ms": round(_pct(latencies, 0.95), 3),
+		"p99_ms": round(_pct(latencies, 0.99), 3),
+		"statements_per_update": round(sum(statements) / len(statements), 2),
+		"api_calls_per_update": round(sum(api_calls) / len(api_calls), 2),
+		"errors": errors,
+	}
+
+
+async def _wait_broadcast(timeout: float) -> dict:
+	started = time.perf_counter()
+	while time.perf_counter() - started < timeout:
+		async with SessionLocal() as session:
+			job = (await session.execute(select(Broadcast).where(Broadcast.text.startswith(MARK)))).scalars().first()
+		if job is not None and job.status == "done":
+			elapsed = time.perf_counter() - started
+			return {"recipients": job.total, "sent": job.sent, "sends_per_sec": round(job.sent / elapsed, 1)}
+		await asyncio.sleep(0.05)
+	return {"recipients": None, "sent": None, "sends_per_sec": None, "timed_out": True}
+
+
+def _scenarios(u: Updates, cats: list[int], products: list[int], users: list[int], n: int) -> dict:
+	def user(i: int) -> int:
+		return users[i % len(users)]
+
+	scenarios = {
+		"catalog_browse": [
+			[
+				u.callback(user(i), "catalog:open"),
+				u.callback(user(i), f"category:{cats[i % len(cats)]}"),
+				u.callback(user(i), f"product:{products[i % len(products)]}"),
+				u.callback(user(i), "nav:categories"),
+			]
+			for i in range(max(1, n // 4))
+		],
+		"qty_step": [
+			[u.callback(user(i), f"qty:inc:{products[i % len(products)]}:{q}") for q in range(1, 6)]
+			for i in range(max(1, n // 5))
+		],
+		"cart_add": [[u.callback(user(i), f"cart:add:{products[i % len(products)]}:1")] for i in range(n)],
+		"cart_view": [[u.callback(user(i), "cart:view")] for i in range(n)],
+		# three updates per checkout; each user has exactly one open cart
+		"checkout": [
+			[u.callback(uid, "cart:checkout"), u.message(uid, "+70000000000"), u.message(uid, "Да")]
+			for uid in users[: max(1, n // 3)]
+		],
+		"admin_broadcast": [[u.callback(ADMIN_ID, "admin:notify"), u.message(ADMIN_ID, f"{MARK} hello")]],
+	}
+	return scenarios
+
+
+def _git_rev() -> str | None:
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+	except Exception:
+		return None
+
+
+def _print_compare(current: dict, baseline: dict) -> None:
+	print("\nvs baseline:")
+	for name, r in current["scenarios"].items():
+		b = baseline.get("scenarios", {}).get(name)
+		if not b or "p50_ms" not in r or "p50_ms" not in b:
+			continue
+		deltas = []
+		for key in ("updates_per_sec", "p50_ms", "p95_ms", "statements_per_update"):
+			if b[key]:
+				deltas.append(f"{key} {(r[key] - b[key]) / b[key] * 100:+.1f}%")
+			else:
+				deltas.append(f"{key} {b[key]} -> {r[key]}")
+		print(f"{name:>16}: " + ", ".join(deltas))
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--iterations", type=int, default=500, help="updates per scenario (roughly)")
+	parser.add_argument("--concurrency", type=int, default=1, help="users processed in parallel")
+	parser.add_argument("--api-latency-ms", type=float, default=0.0, help="simulated Bot API round-trip")
+	parser.add_argument("--scenario", action="append", help="run only these scenarios")
+	parser.add_argument("--json", help="write results to this file")
+	parser.add_argument("--compare", help="print deltas against a previous --json result")
+	args = parser.parse_args()
+
+	dialect = engine.dialect.name
+	settings.admin_ids = str(ADMIN_ID)
+	event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	await _cleanup()
+	cats, products, users = await _seed(categories=10, per_category=20, users=max(50, args.iterations))
+	bot = Bot(settings.bot_token, session=FakeApiSession(args.api_latency_ms / 1000))
+	dp = create_dispatcher()
+	result = {
+		"meta": {
+			"dialect": dialect,
+			"iterations": args.iterations,
+			"concurrency": args.concurrency,
+			"api_latency_ms": args.api_latency_ms,
+			"git_rev": _git_rev(),
+			"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		},
+		"scenarios": {},
+	}
+	try:
+		scenarios = _scenarios(Updates(bot), cats, products, users, args.iterations)
+		for name, sequences in scenarios.items():
+			if args.scenario and name not in args.scenario:
+				continue
+			r = await _run(bot, dp, sequences, args.concurrency)
+			if name == "admin_broadcast":
+				r.update(await _wait_broadcast(timeout=max(30.0, len(users) / settings.broadcast_rate * 2)))
+			result["scenarios"][name] = r
+			extra = f"  {r['sends_per_sec']} sends/s" if r.get("sends_per_sec") else ""
+			print(
+				f"{name:>16}: {r['updates']:>6} upd  {r['updates_per_sec']:>8} upd/s  "
+				f"p50 {r['p50_ms']:>7} ms  p95 {r['p95_ms']:>7} ms  p99 {r['p99_ms']:>7} ms  "
+				f"{r['statements_per_update']:>5} SQL/upd  {r['api_calls_per_update']:>4} API/upd  "
+				f"{r['errors']} err{extra}"
+			)
+	finally:
+		await _cleanup()
+		await bot.session.close()
+		await engine.dispose()
+
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(result, f, indent=2)
+	if args.compare:
+		with open(args.compare) as f:
+			_print_compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
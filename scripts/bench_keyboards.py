@@ -0,0 +1,101 @@
+"""Measure what prebuilt keyboards save per update compared to building them per call.
+
+For every static keyboard and for the category/product list keyboards of a
+synthetic catalog it times three things: building the markup the old way
+(``InlineKeyboardBuilder`` + ``.as_markup()``), getting the prebuilt or
+memoized markup, and encoding a ``sendMessage`` request that carries it, which
+is paid on every send either way. No database or network is touched:
+
+    python -m scripts.bench_keyboards
+    python -m scripts.bench_keyboards --rounds 20000 --categories 10 --per-category 50
+"""
+import argparse
+import statistics
+import time
+from typing import Any, Callable
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+
+from app.bot.keyboards import inline
+from app.bot.services.catalog import CategoryItem, ProductItem, build_snapshot
+from app.bot.services.menus import CatalogMenus
+from scripts.bench_handlers import FakeApiSession
+
+
+def _time(fn: Callable[[], Any], rounds: int) -> float:
+	"""Median µs per call over ``rounds`` calls, measured in batches of 100."""
+	batches = []
+	for _ in range(max(1, rounds // 100)):
+		started = time.perf_counter()
+		for _ in range(100):
+			fn()
+		batches.append((time.perf_counter() - started) * 1e4)
+	return statistics.median(batches)
+
+
+def _encode(bot: Bot, markup: Any) -> Callable[[], Any]:
+	method = SendMessage(chat_id=1, text="bench", reply_markup=markup)
+
+	def encode() -> Any:
+		files: dict[str, Any] = {}
+		return {key: bot.session.prepare_value(value, bot=bot, files=files) for key, value in method.model_dump(warnings=False).items()}
+
+	return encode
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--rounds", type=int, default=10000, help="calls per measurement")
+	parser.add_argument("--categories", type=int, default=10)
+	parser.add_argument("--per-category", type=int, default=20)
+	args = parser.parse_args()
+
+	categories = [CategoryItem(id=c, name=f"Категория {c}") for c in range(1, args.categories + 1)]
+	products = [
+		ProductItem(
+			id=c * 1000 + i, title=f"Товар {c}-{i}", description=None, price=10.0, bulk_threshold=None, bulk_price=None,
+			stock_qty=None, in_stock=True, photo_file_id=None, category_id=c,
+		)
+		for c in range(1, args.categories + 1)
+		for i in range(args.per_category)
+	]
+	snapshot = build_snapshot(1, categories, products)
+	menus = CatalogMenus()
+	category_rows = [(c.id, c.name) for c in snapshot.categories]
+	product_rows = [(p.id, p.title) for p in snapshot.products_in_category(1)]
+
+	cases: list[tuple[str, Callable[[], Any], Callable[[], Any]]] = [
+		("main_menu", lambda: inline.main_menu_keyboard(False).as_markup(), lambda: inline.main_menu_markup(False)),
+		("admin_menu", lambda: inline.admin_menu_keyboard().as_markup(), lambda: inline.ADMIN_MENU_MARKUP),
+		("cart_actions", lambda: inline.cart_actions_keyboard().as_markup(), lambda: inline.CART_ACTIONS_MARKUP),
+		("info_menu", lambda: inline.info_menu_keyboard().as_markup(), lambda: inline.INFO_MENU_MARKUP),
+		("info_item", lambda: inline.info_item_keyboard().as_markup(), lambda: inline.INFO_ITEM_MARKUP),
+		(
+			f"categories ({args.categories})",
+			lambda: inline.categories_keyboard_with_nav(category_rows).as_markup(),
+			lambda: menus.categories(snapshot),
+		),
+		(
+			f"products ({args.per_category})",
+			lambda: inline.products_keyboard_with_nav(product_rows, 1).as_markup(),
+			lambda: menus.products(snapshot, 1),
+		),
+	]
+
+	bot = Bot("123:bench", session=FakeApiSession())
+	print(f"{'keyboard':<18} {'build µs':>9} {'prebuilt µs':>12} {'encode µs':>10} {'saved/upd':>10}")
+	saved = []
+	for name, build, prebuilt in cases:
+		build_us = _time(build, args.rounds)
+		prebuilt_us = _time(prebuilt, args.rounds)
+		encode_us = _time(_encode(bot, prebuilt()), args.rounds)
+		# share of the keyboard work (build + encode) that is no longer paid per update
+		share = (build_us - prebuilt_us) / (build_us + encode_us)
+		saved.append(build_us - prebuilt_us)
+		print(f"{name:<18} {build_us:>9.1f} {prebuilt_us:>12.2f} {encode_us:>10.1f} {share:>9.0%}")
+	print(f"mean saved per keyboard: {statistics.mean(saved):.1f} µs")
+
+
+if __name__ == "__main__":
+	main()
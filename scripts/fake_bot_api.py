@@ -0,0 +1,286 @@
+"""Fake Telegram Bot API server for load and integration testing.
+
+Point the bot at it with TELEGRAM_API_URL and it answers the methods the bot
+uses (getUpdates, sendMessage, editMessageText, sendPhoto, answerCallbackQuery,
+deleteMessage, sendMediaGroup, setWebhook, ...) without touching Telegram:
+
+    python -m scripts.fake_bot_api --port 8081 --latency-ms 40 --global-limit 30 --blocked-ratio 0.05
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python -m app.main
+
+Faults: --latency-ms/--jitter-ms delay every call; --global-limit and
+--chat-limit answer 429 with retry_after once a send exceeds that many messages
+per second (globally / per chat), --flood-ratio injects 429s at random;
+--blocked-ratio makes a stable share of chats answer 403 "bot was blocked".
+
+Updates: --simulate-users N --simulate-rate R generates /start and catalog
+taps from N users at R updates/s; POST /_fake/updates injects a JSON list of
+updates. They are served to getUpdates, or POSTed to the webhook once
+setWebhook was called. GET /_fake/stats returns call, 429 and 403 counters
+and the peak sends per second observed.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+
+SEND_METHODS = {"sendMessage", "sendPhoto", "sendMediaGroup", "copyMessage", "forwardMessage", "sendDocument"}
+EDIT_METHODS = {"editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia"}
+BOT_ID = 1_000_000
+
+
+class SlidingWindow:
+	"""Counts events per key over the last second."""
+
+	def __init__(self) -> None:
+		self._events: dict[object, deque[float]] = defaultdict(deque)
+
+	def hit(self, key: object, now: float) -> int:
+		events = self._events[key]
+		while events and now - events[0] >= 1.0:
+			events.popleft()
+		events.append(now)
+		return len(events)
+
+
+class FakeBotApi:
+	def __init__(self, args: argparse.Namespace) -> None:
+		self.args = args
+		self.updates: asyncio.Queue[dict] = asyncio.Queue()
+		self.update_ids = itertools.count(1)
+		self.message_ids = itertools.count(1)
+		self.webhook_url: str | None = None
+		self.webhook_secret: str | None = None
+		self.calls: Counter = Counter()
+		self.flood: Counter = Counter()
+		self.blocked: Counter = Counter()
+		self.window = SlidingWindow()
+		self.peak_sends_per_sec = 0
+		self._http: ClientSession | None = None
+		self._tasks: list[asyncio.Task] = []
+
+	# -- faults ---------------------------------------------------------------
+
+	def _is_blocked(self, chat_id: object) -> bool:
+		if not isinstance(chat_id, int) or not self.args.blocked_ratio:
+			return False
+		# stable per chat, like a real user who blocked the bot
+		return (chat_id * 2654435761) % 10_000 < self.args.blocked_ratio * 10_000
+
+	def _fault(self, method: str, chat_id: object) -> web.Response | None:
+		if method not in SEND_METHODS and method not in EDIT_METHODS:
+			return None
+		if self._is_blocked(chat_id):
+			self.blocked[method] += 1
+			return _error(403, "Forbidden: bot was blocked by the user")
+		if self.args.flood_ratio and random.random() < self.args.flood_ratio:
+			return self._too_many(method, self.args.retry_after)
+		if method not in SEND_METHODS:
+			return None
+		now = time.monotonic()
+		per_second = self.window.hit("global", now)
+		self.peak_sends_per_sec = max(self.peak_sends_per_sec, per_second)
+		if self.args.global_limit and per_second > self.args.global_limit:
+			# the window frees up within a second
+			return self._too_many(method, 1)
+		if self.args.chat_limit and self.window.hit(chat_id, now) > self.args.chat_limit:
+			return self._too_many(method, 1)
+		return None
+
+	def _too_many(self, method: str, retry_after: int) -> web.Response:
+		self.flood[method] += 1
+		return _error(429, f"Too Many Requests: retry after {retry_after}", {"retry_after": retry_after})
+
+	# -- Bot API --------------------------------------------------------------
+
+	async def handle(self, request: web.Request) -> web.Response:
+		method = request.match_info["method"]
+		params = await _read_params(request)
+		self.calls[method] += 1
+		delay = self.args.latency_ms + random.uniform(0, self.args.jitter_ms)
+		if delay and method != "getUpdates":
+			await asyncio.sleep(delay / 1000)
+		chat_id = _int(params.get("chat_id"))
+		fault = self._fault(method, chat_id)
+		if fault is not None:
+			return fault
+		handler = getattr(self, f"_m_{method}", None)
+		result = await handler(params) if handler else True
+		return web.json_response({"ok": True, "result": result})
+
+	def _message(self, chat_id: object, **extra) -> dict:
+		chat = {"id": chat_id if isinstance(chat_id, int) else 0, "type": "private"}
+		return {"message_id": next(self.message_ids), "date": int(time.time()), "chat": chat, **extra}
+
+	async def _m_getMe(self, params: dict) -> dict:
+		return {"id": BOT_ID, "is_bot": True, "first_name": "Fake Shop", "username": "fake_shop_bot"}
+
+	async def _m_getUpdates(self, params: dict) -> list[dict]:
+		limit = _int(params.get("limit")) or 100
+		timeout = _int(params.get("timeout")) or 0
+		batch: list[dict] = []
+		# offset acknowledges delivered updates; the queue already dropped them
+		try:
+			batch.append(await asyncio.wait_for(self.updates.get(), timeout) if timeout else self.updates.get_nowait())
+		except (asyncio.TimeoutError, asyncio.QueueEmpty):
+			return []
+		while len(batch) < limit and not self.updates.empty():
+			batch.append(self.updates.get_nowait())
+		return batch
+
+	async def _m_sendMessage(self, params: dict) -> dict:
+		return self._message(_int(params.get("chat_id")), text=params.get("text", ""))
+
+	async def _m_editMessageText(self, params: dict) -> dict:
+		return self._message(_int(params.get("chat_id")), text=params.get("text", ""))
+
+	async def _m_sendPhoto(self, params: dict) -> dict:
+		photo = {"file_id": "fake-photo", "file_unique_id": "fake-photo", "width": 1, "height": 1}
+		return self._message(_int(params.get("chat_id")), photo=[photo], caption=params.get("caption"))
+
+	async def _m_sendMediaGroup(self, params: dict) -> list[dict]:
+		media = params.get("media") or "[]"
+		items = json.loads(media) if isinstance(media, str) else media
+		return [self._message(_int(params.get("chat_id")), text=item.get("caption") or "") for item in items]
+
+	async def _m_setWebhook(self, params: dict) -> bool:
+		self.webhook_url = params.get("url") or None
+		self.webhook_secret = params.get("secret_token")
+		return True
+
+	async def _m_deleteWebhook(self, params: dict) -> bool:
+		self.webhook_url = None
+		return True
+
+	async def _m_getWebhookInfo(self, params: dict) -> dict:
+		return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": self.updates.qsize()}
+
+	# -- updates --------------------------------------------------------------
+
+	async def push(self, update: dict) -> None:
+		update.setdefault("update_id", next(self.update_ids))
+		if self.webhook_url is None:
+			await self.updates.put(update)
+			return
+		headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+		try:
+			async with self._http.post(self.webhook_url, json=update, headers=headers) as resp:
+				self.calls[f"webhook:{resp.status}"] += 1
+		except Exception as e:
+			self.calls[f"webhook:{type(e).__name__}"] += 1
+
+	async def inject(self, request: web.Request) -> web.Response:
+		payload = await request.json()
+		updates = payload if isinstance(payload, list) else [payload]
+		for update in updates:
+			await self.push(update)
+		return web.json_response({"queued": len(updates)})
+
+	async def stats(self, request: web.Request) -> web.Response:
+		return web.json_response({
+			"calls": dict(self.calls),
+			"too_many_requests": dict(self.flood),
+			"blocked": dict(self.blocked),
+			"peak_sends_per_sec": self.peak_sends_per_sec,
+			"pending_updates": self.updates.qsize(),
+			"webhook_url": self.webhook_url,
+		})
+
+	async def simulate(self, users: int, rate: float) -> None:
+		"""Each simulated user sends /start, then keeps tapping through the catalog."""
+		user_base = 7_000_000_000
+		started = set()
+		taps = ("catalog:open", "cart:view", "nav:home", "info:open")
+		interval = 1.0 / rate
+		next_at = time.monotonic()
+		for n in itertools.count():
+			uid = user_base + random.randrange(users)
+			user = {"id": uid, "is_bot": False, "first_name": f"User{uid - user_base}"}
+			chat = {"id": uid, "type": "private"}
+			if uid not in started:
+				started.add(uid)
+				update = {"message": {"message_id": n, "date": int(time.time()), "chat": chat, "from": user, "text": "/start"}}
+			else:
+				update = {
+					"callback_query": {
+						"id": str(n),
+						"chat_instance": str(uid),
+						"from": user,
+						"data": random.choice(taps),
+						"message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "menu"},
+					}
+				}
+			await self.push(update)
+			next_at += interval
+			await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+	async def on_startup(self, app: web.Application) -> None:
+		self._http = ClientSession(timeout=ClientTimeout(total=30))
+		if self.args.simulate_users:
+			self._tasks.append(asyncio.create_task(self.simulate(self.args.simulate_users, self.args.simulate_rate)))
+
+	async def on_cleanup(self, app: web.Application) -> None:
+		for task in self._tasks:
+			task.cancel()
+		if self._http:
+			await self._http.close()
+
+
+def _error(code: int, description: str, parameters: dict | None = None) -> web.Response:
+	body = {"ok": False, "error_code": code, "description": description}
+	if parameters:
+		body["parameters"] = parameters
+	return web.json_response(body, status=code)
+
+
+def _int(value: object) -> object:
+	try:
+		return int(value)  # type: ignore[arg-type]
+	except (TypeError, ValueError):
+		return value
+
+
+async def _read_params(request: web.Request) -> dict:
+	if request.content_type == "application/json":
+		return await request.json()
+	form = await request.post()
+	# uploaded files arrive as FileField; the fake only needs the scalar fields
+	return {k: v for k, v in form.items() if isinstance(v, str)}
+
+
+def create_app(args: argparse.Namespace) -> web.Application:
+	api = FakeBotApi(args)
+	app = web.Application(client_max_size=50 * 1024 * 1024)
+	app.router.add_post("/bot{token}/{method}", api.handle)
+	app.router.add_get("/bot{token}/{method}", api.handle)
+	app.router.add_post("/_fake/updates", api.inject)
+	app.router.add_get("/_fake/stats", api.stats)
+	app.on_startup.append(api.on_startup)
+	app.on_cleanup.append(api.on_cleanup)
+	return app
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8081)
+	parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every call")
+	parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random delay, 0..jitter")
+	parser.add_argument("--global-limit", type=int, default=0, help="sends per second before 429, 0 = unlimited")
+	parser.add_argument("--chat-limit", type=int, default=0, help="sends per second per chat before 429, 0 = unlimited")
+	parser.add_argument("--flood-ratio", type=float, default=0.0, help="share of sends/edits answered with a random 429")
+	parser.add_argument("--retry-after", type=int, default=3, help="retry_after for --flood-ratio 429s")
+	parser.add_argument("--blocked-ratio", type=float, default=0.0, help="share of chats that blocked the bot")
+	parser.add_argument("--simulate-users", type=int, default=0, help="generate updates from this many users")
+	parser.add_argument("--simulate-rate", type=float, default=10.0, help="generated updates per second")
+	args = parser.parse_args()
+	web.run_app(create_app(args), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,227 @@
+"""Replay updates recorded with RECORD_UPDATES_PATH through the real Dispatcher.
+
+Feeds each recorded update to ``feed_update`` at its original pace scaled by
+--speed (1, 10, ... or max), against the database in DATABASE_URL (use a copy
+of production). Bot API calls are answered in-process, or by the server in
+TELEGRAM_API_URL (e.g. scripts/fake_bot_api.py) when it is set:
+
+    python -m scripts.replay_updates friday.jsonl --speed 10 --remap-users --json after.json
+    python -m scripts.replay_updates friday.jsonl --speed max --compare before.json
+
+Reports latency percentiles and errors per handler next to the numbers
+recorded in production, and the deltas against a previous --json run.
+--remap-users replaces user and private chat ids with synthetic ones (admins
+from ADMIN_IDS are kept so admin flows still match).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram.types import Update
+
+from app.bot.client import ScheduledSession
+from app.bot.middlewares.metrics import current_update
+from app.bot.outbound import outbound
+from app.bot.services.catalog import catalog_cache
+from app.core.config import settings
+from app.db.session import engine
+from app.main import api_server, create_dispatcher
+from scripts.bench_handlers import FakeApiSession
+
+
+SYNTHETIC_BASE = 6_000_000_000
+_ID_KEYS = ("from", "chat", "user", "sender_chat")
+
+_served_by: ContextVar[dict | None] = ContextVar("served_by", default=None)
+
+
+def load(path: str) -> list[dict]:
+	with open(path, encoding="utf-8") as f:
+		records = [json.loads(line) for line in f if line.strip()]
+	# lines are written when an update finishes; replay in arrival order
+	records.sort(key=lambda r: r["t"])
+	return records
+
+
+class UserRemapper:
+	def __init__(self, keep: set[int]) -> None:
+		self._keep = keep
+		self._ids: dict[int, int] = {}
+
+	def _map(self, uid: int) -> int:
+		# groups and channels have negative ids and stay as they are
+		if uid <= 0 or uid in self._keep:
+			return uid
+		if uid not in self._ids:
+			self._ids[uid] = SYNTHETIC_BASE + len(self._ids)
+		return self._ids[uid]
+
+	def __call__(self, obj: Any, key: str | None = None) -> Any:
+		if isinstance(obj, dict):
+			out = {k: self(v, k) for k, v in obj.items()}
+			if key in _ID_KEYS and isinstance(out.get("id"), int):
+				out["id"] = self._map(out["id"])
+			if key == "contact" and isinstance(out.get("user_id"), int):
+				out["user_id"] = self._map(out["user_id"])
+			return out
+		if isinstance(obj, list):
+			return [self(v, key) for v in obj]
+		return obj
+
+
+async def _capture_handler(handler, event, data):
+	# outermost-but-one: runs inside the metrics middleware, which names the handler
+	result = await handler(event, data)
+	holder, stats = _served_by.get(), current_update.get()
+	if holder is not None and stats is not None:
+		holder["handler"] = stats.handler
+	return result
+
+
+def _pct(values: list[float], q: float) -> float | None:
+	if not values:
+		return None
+	values = sorted(values)
+	return round(values[min(len(values) - 1, max(0, round(q * len(values)) - 1))], 3)
+
+
+def _summary(latencies: list[float], errors: int) -> dict:
+	return {
+		"updates": len(latencies),
+		"errors": errors,
+		"p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+		"p95_ms": _pct(latencies, 0.95),
+		"p99_ms": _pct(latencies, 0.99),
+	}
+
+
+async def replay(records: list[dict], bot: Bot, speed: float | None, concurrency: int) -> dict:
+	dp = create_dispatcher()
+	dp.update.outer_middleware(_capture_handler)
+	latencies: dict[str, list[float]] = defaultdict(list)
+	errors: dict[str, int] = defaultdict(int)
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def play(raw: dict) -> None:
+		async with semaphore:
+			update = Update.model_validate(raw, context={"bot": bot})
+			holder: dict = {"handler": None}
+			token = _served_by.set(holder)
+			started = time.perf_counter()
+			failed = False
+			try:
+				await dp.feed_update(bot, update)
+			except Exception:
+				failed = True
+			finally:
+				elapsed = (time.perf_counter() - started) * 1000
+				_served_by.reset(token)
+			name = holder["handler"] or "unhandled"
+			latencies[name].append(elapsed)
+			errors[name] += failed
+
+	t0 = records[0]["t"]
+	started = time.monotonic()
+	tasks = []
+	for record in records:
+		if speed is not None:
+			delay = (record["t"] - t0) / speed - (time.monotonic() - started)
+			if delay > 0:
+				await asyncio.sleep(delay)
+		tasks.append(asyncio.create_task(play(record["update"])))
+	await asyncio.gather(*tasks)
+	elapsed = time.monotonic() - started
+	everything = [v for values in latencies.values() for v in values]
+	total = _summary(everything, sum(errors.values()))
+	total["updates_per_sec"] = round(len(everything) / elapsed, 1) if elapsed else None
+	return {
+		"total": total,
+		"handlers": {name: _summary(values, errors[name]) for name, values in sorted(latencies.items())},
+	}
+
+
+def recorded(records: list[dict]) -> dict:
+	latencies: dict[str, list[float]] = defaultdict(list)
+	errors: dict[str, int] = defaultdict(int)
+	for r in records:
+		name = r.get("handler") or "unhandled"
+		latencies[name].append(r["ms"])
+		errors[name] += r.get("error") is not None
+	everything = [v for values in latencies.values() for v in values]
+	return {
+		"total": _summary(everything, sum(errors.values())),
+		"handlers": {name: _summary(values, errors[name]) for name, values in sorted(latencies.items())},
+	}
+
+
+def _delta(new: float | None, old: float | None) -> str:
+	if new is None or old is None:
+		return "-"
+	if not old:
+		return f"{old}->{new}"
+	return f"{(new - old) / old * 100:+.0f}%"
+
+
+def print_report(result: dict, reference: dict, label: str) -> None:
+	print(f"{'handler':<44} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}   {label}: p95 Δ, err Δ")
+	rows = [("TOTAL", result["total"], reference.get("total", {}))]
+	rows += [(name, r, reference.get("handlers", {}).get(name, {})) for name, r in result["handlers"].items()]
+	for name, r, ref in rows:
+		err_delta = r["errors"] - ref["errors"] if "errors" in ref else "-"
+		print(
+			f"{name[:44]:<44} {r['updates']:>6} {r['p50_ms'] or 0:>8.2f} {r['p95_ms'] or 0:>8.2f} {r['p99_ms'] or 0:>8.2f} {r['errors']:>5}"
+			f"   {_delta(r['p95_ms'], ref.get('p95_ms')):>7}, {err_delta}"
+		)
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("path", help="JSONL written by RECORD_UPDATES_PATH")
+	parser.add_argument("--speed", default="1", help="time scale: 1, 10, ... or max")
+	parser.add_argument("--concurrency", type=int, default=100, help="updates processed at once")
+	parser.add_argument("--remap-users", action="store_true", help="replace user ids with synthetic ones")
+	parser.add_argument("--limit", type=int, help="replay only the first N updates")
+	parser.add_argument("--json", help="write results to this file")
+	parser.add_argument("--compare", help="show deltas against a previous --json result instead of the recording")
+	args = parser.parse_args()
+
+	records = load(args.path)[: args.limit]
+	if not records:
+		raise SystemExit("nothing to replay")
+	if args.remap_users:
+		admins = {int(x) for x in (settings.admin_ids or "").replace(" ", "").split(",") if x}
+		remap = UserRemapper(keep=admins)
+		for record in records:
+			record["update"] = remap(record["update"])
+	speed = None if args.speed == "max" else float(args.speed)
+
+	session = ScheduledSession(outbound, api=api_server()) if settings.telegram_api_url else FakeApiSession()
+	bot = Bot(settings.bot_token, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+	await catalog_cache.get()
+	try:
+		result = await replay(records, bot, speed, args.concurrency)
+	finally:
+		await bot.session.close()
+		await engine.dispose()
+	result["meta"] = {"source": args.path, "updates": len(records), "speed": args.speed, "remap_users": args.remap_users}
+
+	if args.compare:
+		with open(args.compare) as f:
+			print_report(result, json.load(f), "vs baseline")
+	else:
+		print_report(result, recorded(records), "vs recorded")
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
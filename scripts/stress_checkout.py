@@ -0,0 +1,129 @@
+"""Fire hundreds of concurrent checkouts at one SKU and check nothing is oversold.
+
+Seeds a product with --stock units and --buyers users whose carts each hold
+--qty of it, puts every buyer at the confirmation step and sends all the "Да"
+messages through the real Dispatcher at once. Passes when exactly
+stock // qty orders went through, the remaining stock is never negative and
+in_stock flipped to false at zero. Use a throwaway Postgres (SQLite serializes
+writers, so it can't show the race):
+
+    python -m scripts.stress_checkout --stock 50 --buyers 300
+
+tests/test_checkout_concurrency.py runs the same check under pytest.
+"""
+import argparse
+import asyncio
+import functools
+import sys
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import delete, func, select
+
+from app.bot.handlers.user.catalog import CheckoutStates
+from app.core.config import settings
+from app.db.session import Base, SessionLocal, engine
+from app.main import create_dispatcher
+from app.models import Order, OrderItem, Product, User
+from scripts.bench_handlers import FakeApiSession, Updates
+
+
+USER_BASE = 7_500_000_000
+TITLE = "__stress_checkout__"
+
+
+async def _cleanup() -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			orders = select(Order.id).where(Order.user_id >= USER_BASE)
+			await session.execute(delete(OrderItem).where(OrderItem.order_id.in_(orders)))
+			await session.execute(delete(Order).where(Order.user_id >= USER_BASE))
+			await session.execute(delete(User).where(User.id >= USER_BASE))
+			await session.execute(delete(Product).where(Product.title == TITLE))
+
+
+async def _seed(stock: int, buyers: int, qty: int) -> int:
+	async with SessionLocal() as session:
+		async with session.begin():
+			product = Product(title=TITLE, price=100, stock_qty=stock, in_stock=True)
+			session.add(product)
+			session.add_all(User(id=USER_BASE + i) for i in range(buyers))
+			await session.flush()
+			carts = [Order(user_id=USER_BASE + i, status="new") for i in range(buyers)]
+			session.add_all(carts)
+			await session.flush()
+			session.add_all(OrderItem(order_id=o.id, product_id=product.id, quantity=qty, unit_price=100) for o in carts)
+	return product.id
+
+
+@functools.cache
+def _dispatcher() -> Dispatcher:
+	# the app's routers can be attached to one dispatcher only
+	return create_dispatcher()
+
+
+async def stress(stock: int, buyers: int, qty: int) -> list[str]:
+	"""Run the race once; returns what went wrong, empty when nothing was oversold."""
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.create_all)
+	await _cleanup()
+	product_id = await _seed(stock, buyers, qty)
+	bot = Bot(settings.bot_token, session=FakeApiSession())
+	dp = _dispatcher()
+	updates = Updates(bot)
+	failures: list[str] = []
+	try:
+		for i in range(buyers):
+			uid = USER_BASE + i
+			key = StorageKey(bot_id=bot.id, chat_id=uid, user_id=uid)
+			await dp.storage.set_state(key, CheckoutStates.confirm)
+			await dp.storage.set_data(key, {"phone": "+70000000000"})
+
+		results = await asyncio.gather(
+			*(dp.feed_update(bot, updates.message(USER_BASE + i, "Да")) for i in range(buyers)),
+			return_exceptions=True,
+		)
+		errors = [r for r in results if isinstance(r, Exception)]
+		async with SessionLocal() as session:
+			submitted = await session.scalar(
+				select(func.count(Order.id)).where(Order.user_id >= USER_BASE, Order.status == "submitted")
+			)
+			product = await session.get(Product, product_id)
+		expected = min(buyers, stock // qty)
+		print(f"buyers {buyers}, stock {stock}, {qty} per cart")
+		print(f"submitted {submitted} (expected {expected}), stock left {product.stock_qty}, in_stock {product.in_stock}, errors {len(errors)}")
+		for e in errors[:5]:
+			print(f"  {type(e).__name__}: {e}")
+		if errors:
+			failures.append(f"{len(errors)} checkout(s) raised")
+		if submitted != expected:
+			failures.append("wrong number of orders")
+		if product.stock_qty != stock - submitted * qty or product.stock_qty < 0:
+			failures.append("stock does not match the orders")
+		if product.in_stock != (product.stock_qty > 0):
+			failures.append("in_stock out of sync")
+	finally:
+		await _cleanup()
+		await bot.session.close()
+	return failures
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--stock", type=int, default=50)
+	parser.add_argument("--buyers", type=int, default=300)
+	parser.add_argument("--qty", type=int, default=1, help="units of the SKU in every cart")
+	args = parser.parse_args()
+
+	try:
+		failures = await stress(args.stock, args.buyers, args.qty)
+	finally:
+		await engine.dispose()
+	if failures:
+		print("FAIL: " + ", ".join(failures))
+		sys.exit(1)
+	print("OK")
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
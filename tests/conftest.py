@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+# Settings() is built on import, so point the app at a scratch database first: a
+# throwaway Postgres from TEST_DATABASE_URL, or a temporary SQLite file.
+os.environ["BOT_TOKEN"] = "123:test"
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or (
+	f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(prefix='shop-bot-tests-'), 'test.db')}"
+)
+
+import pytest  # noqa: E402
+
+from app.db.session import Base, engine  # noqa: E402
+
+
+def pytest_collection_modifyitems(config, items):
+	if engine.dialect.name == "postgresql":
+		return
+	skip = pytest.mark.skip(reason="needs a throwaway Postgres in TEST_DATABASE_URL")
+	for item in items:
+		if "postgres" in item.keywords:
+			item.add_marker(skip)
+
+
+@pytest.fixture
+async def db():
+	"""Fresh tables for one test; the engine's connections are dropped afterwards."""
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.drop_all)
+		await conn.run_sync(Base.metadata.create_all)
+	yield engine
+	async with engine.begin() as conn:
+		await conn.run_sync(Base.metadata.drop_all)
+	await engine.dispose()
@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from sqlalchemy import select
+
+from app.bot.services.broadcast import Broadcaster
+from app.db.session import SessionLocal
+from app.models import Broadcast, User
+from scripts.bench_handlers import FakeApiSession
+
+
+class RecordingSession(FakeApiSession):
+	"""Records broadcast recipients; sends to ``hold`` block until ``release`` is set."""
+
+	def __init__(self, hold: int | None = None) -> None:
+		super().__init__()
+		self.recipients: list[int] = []
+		self.hold = hold
+		self.held = asyncio.Event()
+		self.release = asyncio.Event()
+
+	async def make_request(self, bot, method, timeout=None):
+		if isinstance(method, SendMessage):
+			if method.chat_id == self.hold:
+				self.held.set()
+				await self.release.wait()
+			self.recipients.append(method.chat_id)
+		return await super().make_request(bot, method, timeout)
+
+
+def _broadcaster() -> Broadcaster:
+	return Broadcaster(rate=1000, concurrency=1, batch_size=2, progress_interval=60, lease_ttl=300, resume_interval=0.05)
+
+
+async def _seed_users(count: int) -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			session.add_all(User(id=uid) for uid in range(1, count + 1))
+
+
+async def _job(job_id: int) -> Broadcast:
+	async with SessionLocal() as session:
+		return (await session.execute(select(Broadcast).where(Broadcast.id == job_id))).scalar_one()
+
+
+async def _add_job(**values) -> int:
+	async with SessionLocal() as session:
+		async with session.begin():
+			job = Broadcast(text="hi", admin_chat_id=1, total=5, **values)
+			session.add(job)
+	return job.id
+
+
+async def _wait_done(job_id: int) -> Broadcast:
+	for _ in range(200):
+		job = await _job(job_id)
+		if job.status != "running":
+			return job
+		await asyncio.sleep(0.01)
+	raise AssertionError("broadcast did not finish")
+
+
+async def test_stopped_broadcast_resumes_in_the_next_process(db):
+	await _seed_users(5)
+	session = RecordingSession(hold=3)
+	bot = Bot("123:test", session=session)
+	first = _broadcaster()
+	job_id = await first.start(bot, admin_chat_id=1, progress_message_id=None, text="hi")
+	await asyncio.wait_for(session.held.wait(), 5)
+
+	await first.stop()
+	stopped = await _job(job_id)
+	assert stopped.status == "running"
+	assert stopped.lease_owner is None and stopped.lease_until is None
+
+	session.hold = None
+	second = _broadcaster()
+	await second.resume_pending(bot)
+	done = await _wait_done(job_id)
+
+	assert done.status == "done"
+	assert set(session.recipients) == {1, 2, 3, 4, 5}
+	await second.stop()
+
+
+async def test_watch_resumes_a_job_once_its_lease_expires(db):
+	await _seed_users(3)
+	expired = await _add_job(lease_owner="dead", lease_until=datetime.utcnow() - timedelta(seconds=1))
+	held = await _add_job(lease_owner="alive", lease_until=datetime.utcnow() + timedelta(minutes=5))
+	session = RecordingSession()
+	broadcaster = _broadcaster()
+
+	broadcaster.watch(Bot("123:test", session=session))
+	done = await _wait_done(expired)
+	await broadcaster.stop()
+
+	assert done.status == "done"
+	assert sorted(session.recipients) == [1, 2, 3]
+	still_held = await _job(held)
+	assert (still_held.status, still_held.lease_owner) == ("running", "alive")
+
+
+async def test_crashed_broadcast_is_marked_failed_and_released(db):
+	await _seed_users(3)
+	broadcaster = _broadcaster()
+
+	async def crash(*_args):
+		raise RuntimeError("boom")
+
+	broadcaster._send_batch = crash
+	job_id = await broadcaster.start(Bot("123:test", session=RecordingSession()), admin_chat_id=1, progress_message_id=None, text="hi")
+	job = await _wait_done(job_id)
+
+	assert job.status == "failed"
+	assert job.lease_owner is None and job.lease_until is None
+	await broadcaster.stop()
+
+
+class FloodedSession(FakeApiSession):
+	"""Answers every send to ``flooded`` with a 429, as the outbound scheduler does once it gives up."""
+
+	def __init__(self, flooded: int) -> None:
+		super().__init__()
+		self.flooded = flooded
+		self.attempts: list[int] = []
+
+	async def make_request(self, bot, method, timeout=None):
+		if isinstance(method, SendMessage):
+			self.attempts.append(method.chat_id)
+			if method.chat_id == self.flooded:
+				raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1)
+		return await super().make_request(bot, method, timeout)
+
+
+async def test_flood_control_is_not_retried_again_by_the_broadcast(db):
+	await _seed_users(3)
+	session = FloodedSession(flooded=2)
+	broadcaster = _broadcaster()
+
+	job_id = await broadcaster.start(Bot("123:test", session=session), admin_chat_id=999, progress_message_id=None, text="hi")
+	job = await _wait_done(job_id)
+	await broadcaster.stop()
+
+	assert (job.status, job.sent, job.failed) == ("done", 2, 1)
+	# one attempt per user: the 429 was the scheduler's last word
+	assert sorted(uid for uid in session.attempts if uid != 999) == [1, 2, 3]
@@ -0,0 +1,111 @@
+import pytest
+from aiogram import Bot, Dispatcher, F
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import CallbackQuery
+
+from app.bot.callback_router import CallbackRouter, _compile
+from scripts.bench_handlers import FakeApiSession, Updates
+
+
+def test_compile_splits_prefix_typed_arguments_and_tail():
+	prefix, params, tail = _compile("cart:add:{product_id:int}:{note}:{rest:tail}")
+
+	assert prefix == ["cart", "add"]
+	assert [(name, convert) for name, convert in params] == [("product_id", int), ("note", str)]
+	assert tail == "rest"
+
+
+@pytest.mark.parametrize(
+	"pattern",
+	[
+		"cart:{product_id:int}:add",  # literal after an argument
+		"ref:{code:tail}:{n:int}",  # tail not last
+		"cart:{qty:float}",  # unknown type
+	],
+)
+def test_compile_rejects_bad_patterns(pattern):
+	with pytest.raises(ValueError):
+		_compile(pattern)
+
+
+@pytest.fixture
+def calls():
+	return []
+
+
+@pytest.fixture
+def router(calls):
+	router = CallbackRouter(name="test")
+
+	@router.callback("cart:add:{product_id:int}:{qty:int}")
+	async def cart_add(callback: CallbackQuery, product_id: int, qty: int) -> None:
+		calls.append(("cart_add", product_id, qty))
+
+	@router.callback("admin:edit:{field}:{product_id:int}")
+	async def edit_any(callback: CallbackQuery, field: str, product_id: int) -> None:
+		calls.append(("edit_any", field, product_id))
+
+	@router.callback("admin:edit:title:{product_id:int}")
+	async def edit_title(callback: CallbackQuery, product_id: int) -> None:
+		calls.append(("edit_title", product_id))
+
+	@router.callback("ref:{code:tail}")
+	async def ref(callback: CallbackQuery, code: str) -> None:
+		calls.append(("ref", code))
+
+	@router.callback_query(F.data.startswith("legacy"))
+	async def legacy(callback: CallbackQuery) -> None:
+		calls.append(("legacy", callback.data))
+
+	return router
+
+
+def test_match_prefers_the_most_specific_prefix(router):
+	handlers = [(handler.callback.__name__, args) for handler, args in router.callback_query.match("admin:edit:title:7")]
+
+	assert handlers == [("edit_title", {"product_id": 7}), ("edit_any", {"field": "title", "product_id": 7})]
+
+
+@pytest.fixture
+def feed(router, calls):
+	dp = Dispatcher()
+	dp.include_router(router)
+	bot = Bot("123:test", session=FakeApiSession())
+	updates = Updates(bot)
+
+	async def feed(data: str):
+		calls.clear()
+		result = await dp.feed_update(bot, updates.callback(1, data))
+		return UNHANDLED if result is UNHANDLED else calls[:]
+
+	return feed
+
+
+@pytest.mark.parametrize(
+	("data", "expected"),
+	[
+		("cart:add:5:2", [("cart_add", 5, 2)]),
+		("admin:edit:title:3", [("edit_title", 3)]),
+		("admin:edit:price:3", [("edit_any", "price", 3)]),
+		("ref:a:b:c", [("ref", "a:b:c")]),
+		("ref", [("ref", "")]),
+		("legacy:1", [("legacy", "legacy:1")]),
+	],
+)
+async def test_callback_reaches_its_handler_with_typed_arguments(feed, data, expected):
+	assert await feed(data) == expected
+
+
+@pytest.mark.parametrize(
+	"data",
+	[
+		"cart:add:x:2",  # not an int
+		"cart:add:5",  # argument missing
+		"cart:add:5:2:9",  # extra segment
+		"cart",  # prefix only
+		"unknown:1",
+		"",
+	],
+)
+async def test_bad_or_unknown_data_is_unhandled(feed, data):
+	assert await feed(data) is UNHANDLED
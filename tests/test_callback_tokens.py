@@ -0,0 +1,183 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery
+from sqlalchemy import update
+
+from app.bot import callback_tokens as tokens_module
+from app.bot.callback_router import CallbackRouter
+from app.bot.callback_tokens import MAX_CALLBACK_DATA, CallbackTokenStore, callback_tokens, is_token
+from app.bot.handlers.user.catalog import _product
+from app.bot.middlewares.callback_tokens import CallbackTokenMiddleware
+from app.bot.services.cards import ProductCard
+from app.bot.services.catalog import catalog_cache
+from app.bot.services.invalidation import ChangeEvent
+from app.db.session import SessionLocal
+from app.models import Category, Product
+from scripts.bench_handlers import FakeApiSession, Updates
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = SimpleNamespace(now=1000.0)
+	monkeypatch.setattr(tokens_module, "time", SimpleNamespace(monotonic=lambda: clock.now))
+	return clock
+
+
+def test_pack_returns_short_data_as_is_when_disabled():
+	store = CallbackTokenStore(enabled=False, ttl=60, max_size=10)
+
+	assert store.pack("qty:inc:5:1") == "qty:inc:5:1"
+	assert len(store) == 0
+
+
+def test_pack_tokenizes_data_over_telegram_limit_even_when_disabled():
+	store = CallbackTokenStore(enabled=False, ttl=60, max_size=10)
+	data = "x:" + "y" * MAX_CALLBACK_DATA
+
+	token = store.pack(data)
+
+	assert is_token(token) and len(token.encode()) <= MAX_CALLBACK_DATA
+	assert store.resolve(token).data == data
+
+
+def test_resolve_returns_data_and_context(clock):
+	store = CallbackTokenStore(enabled=True, ttl=60, max_size=10)
+
+	token = store.pack("reviews:page:2", total=40)
+	entry = store.resolve(token)
+
+	assert (entry.data, entry.context) == ("reviews:page:2", {"total": 40})
+	assert store.resolve("~unknown") is None
+
+
+def test_tokens_expire_after_ttl(clock):
+	store = CallbackTokenStore(enabled=True, ttl=60, max_size=10)
+	token = store.pack("cart:view")
+
+	clock.now += 59
+	assert store.resolve(token) is not None
+	clock.now += 2
+	assert store.resolve(token) is None
+
+	# expired entries are pruned on the next pack
+	store.pack("cart:view")
+	assert len(store) == 1
+
+
+def test_oldest_tokens_are_evicted_at_max_size(clock):
+	store = CallbackTokenStore(enabled=True, ttl=60, max_size=2)
+
+	first, second, third = (store.pack(f"p:{i}") for i in range(3))
+
+	assert store.resolve(first) is None
+	assert store.resolve(second).data == "p:1"
+	assert store.resolve(third).data == "p:2"
+	assert len(store) == 2
+
+
+class RecordingSession(FakeApiSession):
+	def __init__(self) -> None:
+		super().__init__()
+		self.answers: list[AnswerCallbackQuery] = []
+
+	async def make_request(self, bot, method, timeout=None):
+		if isinstance(method, AnswerCallbackQuery):
+			self.answers.append(method)
+		return await super().make_request(bot, method, timeout)
+
+
+@pytest.fixture
+def bot_setup():
+	store = CallbackTokenStore(enabled=True, ttl=60, max_size=10)
+	calls = []
+	router = CallbackRouter(name="tokens")
+
+	@router.callback("cart:add:{product_id:int}")
+	async def cart_add(callback: CallbackQuery, product_id: int, page: int = 0) -> None:
+		calls.append((product_id, page))
+
+	dp = Dispatcher()
+	dp.callback_query.outer_middleware(CallbackTokenMiddleware(store))
+	dp.include_router(router)
+	session = RecordingSession()
+	bot = Bot("123:test", session=session)
+	return SimpleNamespace(store=store, calls=calls, dp=dp, bot=bot, session=session, updates=Updates(bot))
+
+
+async def test_known_token_is_routed_by_its_data_with_context(bot_setup):
+	s = bot_setup
+	token = s.store.pack("cart:add:5", page=3)
+
+	await s.dp.feed_update(s.bot, s.updates.callback(1, token))
+
+	assert s.calls == [(5, 3)]
+
+
+async def test_plain_data_passes_through(bot_setup):
+	s = bot_setup
+
+	await s.dp.feed_update(s.bot, s.updates.callback(1, "cart:add:5"))
+
+	assert s.calls == [(5, 0)]
+
+
+async def test_unknown_token_is_answered_and_not_routed(bot_setup):
+	s = bot_setup
+
+	await s.dp.feed_update(s.bot, s.updates.callback(1, "~nosuchtoken"))
+
+	assert s.calls == []
+	assert [a.show_alert for a in s.session.answers] == [True]
+
+
+@pytest.fixture
+async def catalog(db, monkeypatch):
+	monkeypatch.setattr(callback_tokens, "enabled", True)
+	lookups = []
+	get = catalog_cache.get
+
+	async def counted_get():
+		lookups.append(1)
+		return await get()
+
+	monkeypatch.setattr(catalog_cache, "get", counted_get)
+	yield lookups
+	# the tables are dropped after the test: nothing of this catalog may survive it
+	catalog_cache.invalidate()
+
+
+async def _seed_product() -> int:
+	async with SessionLocal() as session:
+		async with session.begin():
+			category = Category(name="Жидкости")
+			session.add(category)
+			await session.flush()
+			product = Product(title="A", price=100, category_id=category.id)
+			session.add(product)
+	return product.id
+
+
+async def test_card_tokens_carry_the_product_until_the_catalog_changes(catalog):
+	lookups = catalog
+	product_id = await _seed_product()
+	catalog_cache.invalidate()
+	product = (await catalog_cache.get()).products_by_id[product_id]
+	lookups.clear()
+
+	plus = ProductCard(product).markup(1).inline_keyboard[0][2]
+	entry = callback_tokens.resolve(plus.callback_data)
+
+	assert entry.data == f"qty:inc:{product_id}:1"
+	assert await _product(product_id, **entry.context) is product
+	assert lookups == []
+
+	async with SessionLocal() as session:
+		async with session.begin():
+			await session.execute(update(Product).where(Product.id == product_id).values(title="B"))
+	catalog_cache.invalidate(ChangeEvent("product", product_id))
+
+	assert (await _product(product_id, **entry.context)).title == "B"
+	assert lookups == [1]
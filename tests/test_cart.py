@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, update
+
+from app.db.session import SessionLocal
+from app.models import Category, Flavor, Order, OrderItem, Product
+from app.repositories.cart import add_to_cart
+
+USER = 42
+
+
+async def _seed() -> tuple[int, int]:
+	async with SessionLocal() as session:
+		async with session.begin():
+			category = Category(name="Жидкости")
+			session.add(category)
+			await session.flush()
+			product = Product(title="A", price=100, bulk_threshold=5, bulk_price=80, category_id=category.id)
+			session.add(product)
+			await session.flush()
+			flavor = Flavor(name="Mint", product_id=product.id)
+			session.add(flavor)
+		return product.id, flavor.id
+
+
+async def _add(product_id: int, flavor_id: int | None = None, qty: int = 1, user_id: int = USER) -> int | None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			return await add_to_cart(session, user_id, product_id, flavor_id, qty)
+
+
+async def _lines() -> list[tuple[int, int, int | None, int, float]]:
+	async with SessionLocal() as session:
+		res = await session.execute(
+			select(OrderItem.order_id, OrderItem.product_id, OrderItem.flavor_id, OrderItem.quantity, OrderItem.unit_price)
+			.order_by(OrderItem.id)
+		)
+		return [tuple(row) for row in res.all()]
+
+
+async def test_adding_twice_increments_one_line(db):
+	product, _ = await _seed()
+
+	assert await _add(product) == 1
+	assert await _add(product, qty=2) == 3
+
+	[(_, line_product, flavor, qty, price)] = await _lines()
+	assert (line_product, flavor, qty, price) == (product, None, 3, 100)
+
+
+async def test_flavors_get_their_own_lines_and_no_flavor_is_one_line(db):
+	product, flavor = await _seed()
+
+	await _add(product)
+	await _add(product, flavor)
+	await _add(product)
+	await _add(product, flavor)
+
+	assert [(flavor_id, qty) for _, _, flavor_id, qty, _ in await _lines()] == [(None, 2), (flavor, 2)]
+
+
+async def test_bulk_price_applies_from_the_threshold(db):
+	product, _ = await _seed()
+
+	await _add(product, qty=5)
+
+	[(*_, price)] = await _lines()
+	assert price == 80
+
+
+async def test_deleted_product_is_not_added(db):
+	product, _ = await _seed()
+	async with SessionLocal() as session:
+		async with session.begin():
+			await session.execute(update(Product).where(Product.id == product).values(is_deleted=True))
+
+	assert await _add(product) is None
+	assert await _lines() == []
+
+
+async def test_checked_out_cart_is_left_alone_and_a_new_one_opened(db):
+	product, _ = await _seed()
+	await _add(product)
+	[(first_cart, *_)] = await _lines()
+	async with SessionLocal() as session:
+		async with session.begin():
+			await session.execute(update(Order).where(Order.id == first_cart).values(status="pending"))
+
+	await _add(product, qty=2)
+
+	lines = await _lines()
+	assert [(order_id == first_cart, qty) for order_id, _, _, qty, _ in lines] == [(True, 1), (False, 2)]
+	async with SessionLocal() as session:
+		statuses = (await session.execute(select(Order.status).order_by(Order.id))).scalars().all()
+	assert statuses == ["pending", "new"]
+
+
+@pytest.mark.postgres
+async def test_concurrent_adds_share_one_cart_and_line(db):
+	product, _ = await _seed()
+
+	await asyncio.gather(*(_add(product) for _ in range(10)))
+
+	[(_, _, _, qty, _)] = await _lines()
+	assert qty == 10
+	async with SessionLocal() as session:
+		assert len((await session.execute(select(Order.id))).all()) == 1
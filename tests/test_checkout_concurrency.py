@@ -0,0 +1,9 @@
+import pytest
+
+from scripts.stress_checkout import stress
+
+
+@pytest.mark.postgres
+@pytest.mark.parametrize(("stock", "buyers", "qty"), [(20, 100, 1), (20, 60, 3)])
+async def test_concurrent_checkouts_never_oversell(db, stock, buyers, qty):
+	assert await stress(stock, buyers, qty) == []
@@ -0,0 +1,80 @@
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import event
+
+from app import main
+from app.bot.fsm_storage import SqlStorage
+from app.bot.services.invalidation import LocalInvalidationBus
+from app.db.session import engine
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+def _storage(cache_size: int) -> SqlStorage:
+	# each storage gets its own bus, like two workers without LISTEN/NOTIFY
+	return SqlStorage(engine, LocalInvalidationBus(), ttl=3600, cache_size=cache_size, expire_interval=300, expire_batch=100)
+
+
+@pytest.fixture
+def sql_fsm(monkeypatch):
+	monkeypatch.setattr(main.settings, "fsm_storage", "sql")
+	monkeypatch.setattr(main.settings, "fsm_cache_size", 100)
+	return main.settings
+
+
+@pytest.fixture
+def statements():
+	executed: list[str] = []
+
+	def record(conn, cursor, statement, *args):
+		executed.append(statement)
+
+	event.listen(engine.sync_engine, "before_cursor_execute", record)
+	yield executed
+	event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def test_single_worker_reads_a_state_from_the_db_once(db, sql_fsm, statements):
+	storage = main.create_storage()
+
+	assert await storage.get_data(KEY) == {}
+	read = len(statements)
+	assert await storage.get_data(KEY) == {}
+
+	assert read == 1
+	assert len(statements) == read
+
+
+@pytest.mark.parametrize(
+	("workers", "backend", "cache_size"),
+	[(1, "local", 100), (4, "local", 0), (4, "postgres", 100)],
+)
+def test_cache_is_off_for_several_workers_without_a_shared_bus(sql_fsm, monkeypatch, workers, backend, cache_size):
+	monkeypatch.setattr(sql_fsm, "bot_workers", workers)
+	monkeypatch.setattr(sql_fsm, "invalidation_backend", backend)
+
+	assert main.create_storage()._cache_size == cache_size
+
+
+async def test_uncached_storage_sees_other_workers_writes(db):
+	first, second = _storage(cache_size=0), _storage(cache_size=0)
+	assert await second.get_state(KEY) is None
+
+	await first.set_state(KEY, "checkout:address")
+	assert await second.get_state(KEY) == "checkout:address"
+
+	await first.set_state(KEY, None)
+	assert await second.get_state(KEY) is None
+
+
+async def test_batched_writes_are_stored_on_flush(db):
+	storage = _storage(cache_size=0)
+
+	token = storage.batch()
+	await storage.update_data(KEY, {"qty": 2})
+	await storage.set_state(KEY, "checkout:address")
+	assert await _storage(cache_size=0).get_state(KEY) is None
+	await storage.flush(token)
+
+	other = _storage(cache_size=0)
+	assert (await other.get_state(KEY), await other.get_data(KEY)) == ("checkout:address", {"qty": 2})
@@ -0,0 +1,107 @@
+import pytest
+from sqlalchemy import update
+
+from app.bot.services.catalog import CatalogCache
+from app.bot.services.invalidation import FULL_RESYNC, ChangeEvent, InvalidationBus, LocalInvalidationBus
+from app.db.session import SessionLocal
+from app.models import Category, Product
+
+
+async def test_local_bus_delivers_every_event_to_every_subscriber():
+	bus = LocalInvalidationBus()
+	first: list[ChangeEvent] = []
+	second: list[ChangeEvent] = []
+	bus.subscribe(first.append)
+	bus.subscribe(second.append)
+
+	await bus.publish(ChangeEvent("product", 1), ChangeEvent("category"))
+
+	assert first == second == [ChangeEvent("product", 1), ChangeEvent("category")]
+
+
+async def test_failing_subscriber_does_not_stop_delivery():
+	bus = LocalInvalidationBus()
+	received: list[ChangeEvent] = []
+
+	def broken(_event: ChangeEvent) -> None:
+		raise RuntimeError("boom")
+
+	bus.subscribe(broken)
+	bus.subscribe(received.append)
+
+	await bus.publish(ChangeEvent("flavor", 7))
+
+	assert received == [ChangeEvent("flavor", 7)]
+
+
+def test_bus_without_publish_cannot_be_created():
+	class Incomplete(InvalidationBus):
+		pass
+
+	with pytest.raises(TypeError):
+		Incomplete()
+
+
+async def _seed() -> tuple[int, int]:
+	async with SessionLocal() as session:
+		async with session.begin():
+			category = Category(name="Жидкости")
+			session.add(category)
+			await session.flush()
+			first = Product(title="A", price=100, category_id=category.id)
+			second = Product(title="B", price=200, category_id=category.id)
+			session.add_all([first, second])
+		return first.id, second.id
+
+
+async def _rename(product_id: int, title: str) -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			await session.execute(update(Product).where(Product.id == product_id).values(title=title))
+
+
+@pytest.fixture
+async def catalog(db):
+	bus = LocalInvalidationBus()
+	cache = CatalogCache()
+	bus.subscribe(cache.on_change)
+	return bus, cache
+
+
+async def test_catalog_reloads_only_the_changed_product(catalog):
+	bus, cache = catalog
+	first, second = await _seed()
+	before = await cache.get()
+
+	await _rename(first, "A2")
+	await _rename(second, "B2")
+	await bus.publish(ChangeEvent("product", first))
+	after = await cache.get()
+
+	assert after.version == before.version + 1
+	assert after.products_by_id[first].title == "A2"
+	# no event for the second product: the old item is kept as is
+	assert after.products_by_id[second] is before.products_by_id[second]
+
+
+async def test_catalog_full_resync_reloads_everything(catalog):
+	bus, cache = catalog
+	first, second = await _seed()
+	await cache.get()
+
+	await _rename(first, "A2")
+	await _rename(second, "B2")
+	await bus.publish(FULL_RESYNC)
+	snapshot = await cache.get()
+
+	assert {p.title for p in snapshot.products_by_id.values()} == {"A2", "B2"}
+
+
+async def test_catalog_ignores_other_entities(catalog):
+	bus, cache = catalog
+	await _seed()
+	before = await cache.get()
+
+	await bus.publish(ChangeEvent("branding"), ChangeEvent("manager", 5))
+
+	assert await cache.get() is before
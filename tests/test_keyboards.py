@@ -0,0 +1,53 @@
+import pytest
+from aiogram.types import InlineKeyboardButton
+from pydantic import ValidationError
+
+from app.bot.keyboards.inline import CATALOG_MARKUP, catalog_keyboard, freeze
+from app.bot.services.cards import ProductCard
+from app.bot.services.catalog import ProductItem
+
+
+def test_shared_markup_rows_cannot_be_changed():
+	row = CATALOG_MARKUP.inline_keyboard[0]
+
+	with pytest.raises(TypeError):
+		CATALOG_MARKUP.inline_keyboard.append([])
+	with pytest.raises(TypeError):
+		row.append(InlineKeyboardButton(text="x", callback_data="x"))
+	with pytest.raises(TypeError):
+		row[0] = InlineKeyboardButton(text="x", callback_data="x")
+
+
+def test_shared_markup_buttons_cannot_be_changed():
+	with pytest.raises(ValidationError):
+		CATALOG_MARKUP.inline_keyboard[0][0].text = "changed"
+	with pytest.raises(ValidationError):
+		CATALOG_MARKUP.inline_keyboard = []
+
+
+def test_frozen_markup_serializes_like_the_original():
+	markup = catalog_keyboard().as_markup()
+
+	assert freeze(markup).model_dump_json(exclude_none=True) == markup.model_dump_json(exclude_none=True)
+
+
+def test_copy_of_a_frozen_markup_is_editable():
+	copy = CATALOG_MARKUP.model_copy(deep=True)
+
+	copy.inline_keyboard.append([InlineKeyboardButton(text="x", callback_data="x")])
+
+	assert len(copy.inline_keyboard) == len(CATALOG_MARKUP.inline_keyboard) + 1
+
+
+def test_kept_card_markups_are_frozen():
+	product = ProductItem(
+		id=1, title="A", description=None, price=100, bulk_threshold=None, bulk_price=None,
+		stock_qty=None, in_stock=True, photo_file_id=None, category_id=2,
+	)
+	card = ProductCard(product)
+
+	markup = card.markup(1)
+
+	assert card.markup(1) is markup
+	with pytest.raises(TypeError):
+		markup.inline_keyboard[-1].append(InlineKeyboardButton(text="x", callback_data="x"))
@@ -0,0 +1,181 @@
+import asyncio
+import math
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+
+from app.bot import client
+from app.bot.client import ScheduledSession
+from app.bot.outbound import OutboundScheduler, Priority, outbound_priority
+from app.utils import ratelimit
+from app.utils.ratelimit import TokenBucket
+
+
+class FakeClock:
+	"""Monotonic time that only moves when someone sleeps."""
+
+	def __init__(self) -> None:
+		self.now = 1000.0
+		self._sleep = asyncio.sleep
+
+	def monotonic(self) -> float:
+		return self.now
+
+	async def sleep(self, seconds: float) -> None:
+		# always move forward: refill rounding can ask for a sleep shorter than the clock's resolution
+		self.now = max(self.now + seconds, math.nextafter(self.now, math.inf))
+		await self._sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = FakeClock()
+	# the module's own reference only: the event loop keeps the real clock
+	monkeypatch.setattr(ratelimit, "time", SimpleNamespace(monotonic=clock.monotonic))
+	monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+	return clock
+
+
+def _scheduler(**overrides) -> OutboundScheduler:
+	options = dict(global_rate=30, chat_rate=1, chat_burst=3, group_per_minute=20, max_retries=3, max_retry_after=60)
+	return OutboundScheduler(**{**options, **overrides})
+
+
+def test_bucket_allows_a_burst_then_refills_at_rate(clock):
+	bucket = TokenBucket(rate=2, capacity=3)
+
+	assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+	assert bucket.delay() == pytest.approx(0.5)
+	clock.now += 0.5
+	assert bucket.try_acquire()
+
+
+async def test_bucket_acquire_waits_for_tokens(clock):
+	bucket = TokenBucket(rate=1, capacity=1)
+	started = clock.now
+
+	for _ in range(5):
+		await bucket.acquire()
+
+	assert clock.now - started == pytest.approx(4)
+
+
+def test_bucket_pause_empties_it_until_the_deadline(clock):
+	bucket = TokenBucket(rate=2, capacity=5)
+
+	bucket.pause(10)
+
+	assert bucket.delay() == pytest.approx(10)
+	clock.now += 10
+	# paused buckets restart empty
+	assert bucket.delay() == pytest.approx(0.5)
+
+
+async def test_interactive_sends_overtake_queued_bulk_sends(clock):
+	scheduler = _scheduler(global_rate=1)
+	await scheduler.acquire(None)
+	served: list[Priority] = []
+
+	async def send(priority: Priority) -> None:
+		outbound_priority.set(priority)
+		await scheduler.acquire(None)
+		served.append(priority)
+
+	await asyncio.gather(send(Priority.BULK), send(Priority.BULK), send(Priority.INTERACTIVE))
+
+	assert served == [Priority.INTERACTIVE, Priority.BULK, Priority.BULK]
+
+
+async def test_private_chats_burst_and_groups_are_limited_per_minute(clock):
+	# a global limit high enough not to matter here
+	scheduler = _scheduler(global_rate=1000)
+	started = clock.now
+	for _ in range(3):
+		await scheduler.acquire(42)
+	assert clock.now - started == pytest.approx(0, abs=0.01)
+
+	await scheduler.acquire(42)
+	assert clock.now - started == pytest.approx(1, abs=0.01)
+
+	started = clock.now
+	await scheduler.acquire(-100)
+	await scheduler.acquire(-100)
+	assert clock.now - started == pytest.approx(3, abs=0.01)
+
+
+async def test_retry_after_pauses_the_chat_and_every_other_sender(clock):
+	scheduler = _scheduler()
+	scheduler.retry_after(42, 5)
+	started = clock.now
+
+	await scheduler.acquire(7)
+
+	assert clock.now - started >= 5
+
+
+class FlakyApi:
+	"""Stands in for the HTTP call: answers 429 ``failures`` times, then succeeds."""
+
+	def __init__(self, failures: int, retry_after: int = 5) -> None:
+		self.failures = failures
+		self.retry_after = retry_after
+		self.calls = 0
+
+	async def __call__(self, session, bot, method, timeout=None):
+		self.calls += 1
+		if self.calls <= self.failures:
+			raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=self.retry_after)
+		return True
+
+
+@pytest.fixture
+def api(monkeypatch):
+	def install(failures: int, retry_after: int = 5) -> FlakyApi:
+		flaky = FlakyApi(failures, retry_after)
+		monkeypatch.setattr(client.InstrumentedSession, "make_request", flaky.__call__)
+		return flaky
+
+	return install
+
+
+async def test_send_is_retried_after_429(clock, api):
+	flaky = api(failures=2)
+	session = ScheduledSession(_scheduler())
+	started = clock.now
+
+	assert await session.make_request(None, SendMessage(chat_id=42, text="hi")) is True
+
+	assert flaky.calls == 3
+	assert clock.now - started >= 10
+
+
+async def test_send_gives_up_after_max_retries(clock, api):
+	flaky = api(failures=10)
+	session = ScheduledSession(_scheduler(max_retries=2))
+
+	with pytest.raises(TelegramRetryAfter):
+		await session.make_request(None, SendMessage(chat_id=42, text="hi"))
+	assert flaky.calls == 3
+
+
+async def test_long_retry_after_is_not_waited_out(clock, api):
+	flaky = api(failures=1, retry_after=600)
+	session = ScheduledSession(_scheduler())
+
+	with pytest.raises(TelegramRetryAfter):
+		await session.make_request(None, SendMessage(chat_id=42, text="hi"))
+	assert flaky.calls == 1
+
+
+async def test_callback_answers_bypass_the_scheduler(clock, api):
+	api(failures=0)
+	scheduler = _scheduler(global_rate=1)
+	await scheduler.acquire(None)
+	session = ScheduledSession(scheduler)
+	started = clock.now
+
+	await session.make_request(None, AnswerCallbackQuery(callback_query_id="1"))
+
+	assert clock.now == started
@@ -0,0 +1,177 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+from sqlalchemy import select
+
+from app.bot.keyboards.inline import CART_ACTIONS_MARKUP
+from app.bot.services import outbox as outbox_module
+from app.bot.services.outbox import OutboxDispatcher, enqueue
+from app.db.session import SessionLocal
+from app.models import OutboxMessage
+from scripts.bench_handlers import FakeApiSession
+
+
+class RecordingSession(FakeApiSession):
+	"""Records sent messages; the first ``failures`` sends raise ``error``."""
+
+	def __init__(self, failures: int = 0, error: Exception | None = None) -> None:
+		super().__init__()
+		self.sent: list[SendMessage] = []
+		self.failures = failures
+		self.error = error or RuntimeError("network down")
+
+	async def make_request(self, bot, method, timeout=None):
+		if isinstance(method, SendMessage):
+			if self.failures:
+				self.failures -= 1
+				raise self.error
+			self.sent.append(method)
+		return await super().make_request(bot, method, timeout)
+
+
+class Clock:
+	"""Stands in for ``datetime`` in the outbox module: ``utcnow()`` only moves when told to."""
+
+	def __init__(self) -> None:
+		# a little ahead, so messages enqueued by the test (stamped with the real time) are due
+		self.now = datetime.utcnow() + timedelta(seconds=1)
+
+	def utcnow(self) -> datetime:
+		return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(outbox_module, "datetime", clock)
+	return clock
+
+
+def _dispatcher(**overrides) -> OutboxDispatcher:
+	options = dict(concurrency=2, batch_size=10, poll_interval=60, max_attempts=3, backoff=10, max_backoff=300, lease=60)
+	return OutboxDispatcher(**{**options, **overrides})
+
+
+async def _enqueue(chat_id: int, text: str = "new order") -> None:
+	async with SessionLocal() as session:
+		async with session.begin():
+			enqueue(session, chat_id, text, reply_markup=CART_ACTIONS_MARKUP)
+
+
+async def _messages() -> list[OutboxMessage]:
+	async with SessionLocal() as session:
+		return list((await session.execute(select(OutboxMessage).order_by(OutboxMessage.id))).scalars())
+
+
+async def _round(dispatcher: OutboxDispatcher, bot: Bot) -> int:
+	claimed = await dispatcher._claim()
+	await dispatcher._deliver(bot, claimed)
+	return len(claimed)
+
+
+async def test_committed_message_is_delivered(db):
+	session = RecordingSession()
+	dispatcher = _dispatcher()
+	await _enqueue(42)
+
+	dispatcher.start(Bot("123:test", session=session))
+	dispatcher.wake()
+	for _ in range(200):
+		[message] = await _messages()
+		if message.status != "pending":
+			break
+		await asyncio.sleep(0.01)
+	await dispatcher.stop()
+
+	assert (message.status, message.attempts) == ("sent", 1)
+	[sent] = session.sent
+	assert (sent.chat_id, sent.text) == (42, "new order")
+	assert sent.reply_markup.model_dump(exclude_none=True) == CART_ACTIONS_MARKUP.model_dump(exclude_none=True)
+
+
+async def test_message_enqueued_in_a_rolled_back_transaction_is_never_sent(db):
+	session = RecordingSession()
+
+	with pytest.raises(RuntimeError):
+		async with SessionLocal() as db_session:
+			async with db_session.begin():
+				enqueue(db_session, 42, "new order")
+				await db_session.flush()
+				raise RuntimeError("checkout failed")
+
+	assert await _round(_dispatcher(), Bot("123:test", session=session)) == 0
+	assert await _messages() == []
+	assert session.sent == []
+
+
+async def test_failed_send_is_retried_with_backoff_then_given_up(db, clock):
+	session = RecordingSession(failures=3)
+	bot = Bot("123:test", session=session)
+	dispatcher = _dispatcher()
+	await _enqueue(42)
+
+	delays = []
+	for _ in range(2):
+		started = clock.now
+		assert await _round(dispatcher, bot) == 1
+		[message] = await _messages()
+		assert message.status == "pending" and message.last_error == "RuntimeError: network down"
+		delays.append((message.available_at - started).total_seconds())
+		# not due before the backoff runs out
+		assert await _round(dispatcher, bot) == 0
+		clock.now = message.available_at
+	assert delays == [10, 20]
+
+	assert await _round(dispatcher, bot) == 1
+	[message] = await _messages()
+	assert (message.status, message.attempts) == ("failed", 3)
+	assert session.sent == []
+
+
+async def test_blocked_chat_fails_without_retries(db, clock):
+	error = TelegramForbiddenError(method=SendMessage(chat_id=42, text="x"), message="bot was blocked by the user")
+	dispatcher = _dispatcher()
+	await _enqueue(42)
+
+	await _round(dispatcher, Bot("123:test", session=RecordingSession(failures=1, error=error)))
+
+	[message] = await _messages()
+	assert (message.status, message.attempts) == ("failed", 1)
+
+
+async def test_claimed_message_is_leased_until_its_worker_is_presumed_dead(db, clock):
+	session = RecordingSession()
+	bot = Bot("123:test", session=session)
+	await _enqueue(42)
+
+	# claimed by a worker that dies before sending
+	assert len(await _dispatcher()._claim()) == 1
+
+	other = _dispatcher()
+	assert await _round(other, bot) == 0
+	clock.now += timedelta(seconds=61)
+	assert await _round(other, bot) == 1
+
+	[message] = await _messages()
+	assert (message.status, message.attempts) == ("sent", 2)
+	assert len(session.sent) == 1
+
+
+@pytest.mark.postgres
+async def test_rows_locked_by_another_worker_are_skipped(db):
+	await _enqueue(1)
+	await _enqueue(2)
+
+	async with SessionLocal() as session:
+		async with session.begin():
+			# another worker's claim transaction, still open
+			locked = (
+				await session.execute(select(OutboxMessage.id).order_by(OutboxMessage.id).limit(1).with_for_update())
+			).scalar_one()
+			claimed = await asyncio.wait_for(_dispatcher()._claim(), 5)
+
+	assert [row.id for row in claimed] == [locked + 1]
@@ -0,0 +1,98 @@
+"""No hot storefront query may plan a sequential scan.
+
+Seeds a production-sized dataset into a scratch schema of the Postgres in
+TEST_DATABASE_URL and runs EXPLAIN on each hot query the user handlers issue.
+The schema is dropped afterwards.
+"""
+import json
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.session import Base
+from app.models import Flavor, Order, OrderItem, Product, Review
+
+
+SCHEMA = "plan_check"
+
+SEED = [
+	"INSERT INTO categories (id, name) SELECT g, 'cat ' || g FROM generate_series(1, 200) g",
+	"""INSERT INTO products (id, title, price, stock_qty, in_stock, is_deleted, category_id)
+	SELECT g, 'product ' || g, 100, 10, true, g % 10 = 0, g % 200 + 1 FROM generate_series(1, 20000) g""",
+	"""INSERT INTO flavors (name, product_id, is_available)
+	SELECT 'flavor ' || f, p, f <> 3 FROM generate_series(1, 20000) p, generate_series(1, 3) f""",
+	"INSERT INTO users (id, is_admin, is_blocked) SELECT g, false, false FROM generate_series(1, 50000) g",
+	"""INSERT INTO orders (user_id, created_at, status)
+	SELECT g % 50000 + 1, now(), CASE WHEN g <= 50000 THEN 'new' ELSE 'submitted' END FROM generate_series(1, 150000) g""",
+	"""INSERT INTO order_items (order_id, product_id, flavor_id, quantity, unit_price)
+	SELECT o, (o * 7 + i) % 20000 + 1, NULL, 1, 100 FROM generate_series(1, 150000) o, generate_series(1, 3) i""",
+	"INSERT INTO reviews (media_type, file_id, created_at) SELECT 'photo', 'f' || g, now() - g * interval '1 minute' FROM generate_series(1, 20000) g",
+]
+
+# (name, statement) — mirrors the queries in app/bot/handlers/user/catalog.py
+HOT_QUERIES = [
+	("open cart", select(Order).where(Order.user_id == 4242, Order.status == "new")),
+	(
+		"cart lines",
+		select(OrderItem, Product, Flavor)
+		.join(Product, Product.id == OrderItem.product_id)
+		.outerjoin(Flavor, Flavor.id == OrderItem.flavor_id)
+		.where(OrderItem.order_id == 4242),
+	),
+	("cart clear", delete(OrderItem).where(OrderItem.order_id == 4242)),
+	("product", select(Product).where(Product.id == 4242, Product.is_deleted == False)),
+	(
+		"category products",
+		select(Product).where(Product.category_id == 42, Product.is_deleted == False).order_by(Product.title),
+	),
+	("available flavors", select(Flavor).where(Flavor.product_id == 4242, Flavor.is_available == True)),
+	("flavor", select(Flavor).where(Flavor.id == 4242, Flavor.product_id == 1414)),
+	("admin flavors", select(Flavor).where(Flavor.product_id == 4242).order_by(Flavor.name)),
+	("latest reviews", select(Review).order_by(Review.created_at.desc()).limit(10)),
+]
+
+
+def _seq_scans(plan: dict) -> list[str]:
+	found = []
+	if plan.get("Node Type") == "Seq Scan":
+		found.append(plan.get("Relation Name", "?"))
+	for child in plan.get("Plans", []):
+		found.extend(_seq_scans(child))
+	return found
+
+
+@pytest.mark.postgres
+async def test_hot_queries_use_indexes():
+	engine = create_async_engine(
+		settings.database_url,
+		connect_args={"server_settings": {"search_path": SCHEMA}},
+	)
+	dialect = postgresql.dialect()
+	failures = []
+	try:
+		async with engine.begin() as conn:
+			await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+			await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+			await conn.run_sync(Base.metadata.create_all)
+			for stmt in SEED:
+				await conn.execute(text(stmt))
+			for table in Base.metadata.sorted_tables:
+				await conn.execute(text(f"ANALYZE {table.name}"))
+
+		async with engine.connect() as conn:
+			for name, stmt in HOT_QUERIES:
+				sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+				raw = (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar_one()
+				plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+				scans = _seq_scans(plan)
+				if scans:
+					failures.append(f"{name}: seq scan on {', '.join(scans)}")
+			await conn.rollback()
+	finally:
+		async with engine.begin() as conn:
+			await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+		await engine.dispose()
+	assert not failures, "\n".join(failures)
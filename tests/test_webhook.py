@@ -0,0 +1,16 @@
+import pytest
+
+from app.main import webhook_path
+
+
+@pytest.mark.parametrize(
+	("url", "path"),
+	[
+		("https://shop.example.com", "/"),
+		("https://shop.example.com/", "/"),
+		("https://shop.example.com/hook", "/hook"),
+		("https://shop.example.com:8443/bot/updates?x=1", "/bot/updates"),
+	],
+)
+def test_handler_is_served_on_the_path_telegram_posts_to(url, path):
+	assert webhook_path(url) == path